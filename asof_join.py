@@ -0,0 +1,346 @@
+import os
+import re
+import json
+import operator
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from xctrace_parser import XCTraceParser, make_trace_id, duration_to_seconds, seconds_to_hms
+
+# 帧中的列 -> (save() 的目录/后缀, 字段)，时间轴为 FPS 的采样时间
+# frame column -> (save() suffix, field). The time axis is the FPS sample time
+FRAME_COLUMNS = {
+    "fps": ("fps", "fps"),
+    "gpu": ("gpu", "gpu"),
+    "cpu": ("cpu", "cpu"),
+    "mem": ("mem", "memory"),
+    "resident_size": ("mem", "resident_size"),
+}
+
+DIRECTIONS = ("backward", "forward", "nearest")
+
+_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+_CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(-?[\d.]+(?:e-?\d+)?)\s*$")
+
+
+def main():
+    for d in ("./temp/parse", "./temp/visualize"):
+        Path(d).mkdir(parents=True, exist_ok=True)
+
+    parser = argparse.ArgumentParser(description="多指标按时间对齐 As-of join FPS, GPU, CPU and memory")
+    parser.add_argument(
+        "-trace_path",
+        default=None,
+        help="Path to .trace file to parse",
+    )
+    parser.add_argument(
+        "-target_process_name",
+        default=None,
+        help="Target process name to analyze (e.g. Steam)",
+    )
+    parser.add_argument(
+        "-save_dir",
+        default=None,
+        help="load an existing save() output directory instead of parsing (with -trace_id)",
+    )
+    parser.add_argument(
+        "-trace_id",
+        default=None,
+        help="trace id of the saved json files",
+    )
+    parser.add_argument(
+        "-tolerance_ms",
+        type=float,
+        default=1000.0,
+        help="samples further apart than this are not joined",
+    )
+    parser.add_argument(
+        "-direction",
+        choices=DIRECTIONS,
+        default="backward",
+        help="backward: last sample at or before, forward: first at or after, nearest: closest",
+    )
+    parser.add_argument(
+        "-where",
+        default=None,
+        help='row filter, e.g. "fps < 30" or "fps < 30 and gpu > 80"',
+    )
+    parser.add_argument(
+        "-select",
+        nargs="+",
+        choices=list(FRAME_COLUMNS),
+        default=list(FRAME_COLUMNS),
+        help="columns to summarize and chart",
+    )
+    parser.add_argument(
+        "-chart",
+        choices=["default", "compact", "large"],
+        default=None,
+        help="also render the selected columns as one overlay chart",
+    )
+    args = parser.parse_args()
+
+    tolerance_ns = int(args.tolerance_ms * 1_000_000)
+    if args.save_dir:
+        if not args.trace_id:
+            parser.error("-save_dir 需要同时指定 -trace_id  -save_dir requires -trace_id")
+        trace_id = args.trace_id
+        frame = AlignedFrame.from_save_dir(args.save_dir, trace_id, tolerance_ns, args.direction)
+        title = trace_id
+    else:
+        if not args.trace_path or not args.target_process_name:
+            parser.error("需要 -trace_path 与 -target_process_name, 或 -save_dir  "
+                         "-trace_path and -target_process_name, or -save_dir, are required")
+        trace_id = make_trace_id(args.trace_path)
+        xml_parser = XCTraceParser(
+            trace_path=args.trace_path,
+            log_path=f"./temp/parse/{trace_id}_parse.log",
+            target_process_name=args.target_process_name,
+            trace_id=trace_id,
+        )
+        xml_parser.parse()
+        frame = AlignedFrame.from_parser(xml_parser, tolerance_ns, args.direction)
+        title = os.path.splitext(os.path.basename(args.trace_path))[0]
+
+    mask = frame.mask(args.where) if args.where else None
+    selected = int(mask.sum()) if mask is not None else len(frame)
+    print(f"对齐 {len(frame)} 行 Aligned {len(frame)} rows, {selected} selected" + (f" where {args.where}" if args.where else ""))
+    print(f"{'column':<14}{'count':>8}{'mean':>10}{'p50':>10}{'p90':>10}{'min':>10}{'max':>10}")
+    for name in args.select:
+        stats = frame.describe(name, mask)
+        if stats["count"] == 0:
+            print(f"{name:<14}{0:>8}")
+            continue
+        print(
+            f"{name:<14}{stats['count']:>8}{stats['mean']:>10.2f}{stats['p50']:>10.2f}"
+            f"{stats['p90']:>10.2f}{stats['min']:>10.2f}{stats['max']:>10.2f}"
+        )
+
+    if args.chart:
+        from data_visualizer import DataVisualizer, CompactDataVisualizer
+
+        v_path = f"./temp/visualize/{title}"
+        Path(v_path).mkdir(parents=True, exist_ok=True)
+        html_path = v_path + f"/{trace_id}_overlay.html"
+        if args.chart == "default":
+            dv = DataVisualizer(html_path=html_path)
+        else:
+            dv = CompactDataVisualizer(html_path=html_path, large=args.chart == "large")
+        dv.add_multi_line_parsed_data(frame.overlay_data(args.select, nan_as_none=args.chart == "default"))
+        dv.render_html()
+        print(f"叠加图已生成 Overlay chart saved to: {html_path}")
+
+
+def fmt_to_ns(fmt_time):
+    """
+    将 xctrace 的时间格式 (MM:SS.mmm.uuu) 精确转换为整数纳秒
+
+    Convert an xctrace fmt time (MM:SS.mmm.uuu) to integer nanoseconds exactly.
+    """
+    head, _, rest = str(fmt_time).partition(".")
+    fraction = rest.replace(".", "")[:9]
+    return duration_to_seconds(head) * 1_000_000_000 + int(fraction.ljust(9, "0") or 0)
+
+
+def to_ns_columns(values, fields):
+    """
+    save() 格式的数据 -> 按时间升序的 (ts_ns, {field: values}) numpy 列，已升序时不排序
+
+    save() rows -> (ts_ns, {field: values}) numpy columns sorted by time,
+    without a sort when the input is already ascending.
+    """
+    n = len(values)
+    ts = np.fromiter((fmt_to_ns(item["time"]) for item in values), np.int64, n)
+    columns = {field: np.fromiter((item[field] for item in values), np.float64, n) for field in fields}
+    if n > 1 and np.any(ts[1:] < ts[:-1]):
+        order = np.argsort(ts, kind="stable")
+        ts = ts[order]
+        columns = {field: column[order] for field, column in columns.items()}
+    return ts, columns
+
+
+def asof_indices(left_ts, right_ts, tolerance_ns=None, direction="backward"):
+    """
+    为每个 left 时间找到 right 中的匹配下标，超出容忍度或不存在时为 -1。
+    两列都须按升序排列；对有序列做向量化二分查找，比逐个双指针合并快得多。
+
+    For every left timestamp find the matching index in right, -1 when there
+    is none within the tolerance. Both columns must be ascending; a vectorized
+    binary search over the sorted columns replaces a per-row two-pointer merge.
+    :param direction: backward 取之前（含相等）最近的样本, forward 取之后（含相等）最近的样本,
+                      nearest 取距离最近的（相等时取之前的）
+                      backward: last sample at or before, forward: first sample at or after,
+                      nearest: the closest one (ties go backward)
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"未知的 direction Unknown direction: {direction}")
+    left_ts = np.asarray(left_ts, dtype=np.int64)
+    right_ts = np.asarray(right_ts, dtype=np.int64)
+    m = len(right_ts)
+    if m == 0:
+        return np.full(len(left_ts), -1, dtype=np.intp)
+
+    before = np.searchsorted(right_ts, left_ts, side="right") - 1
+    after = np.searchsorted(right_ts, left_ts, side="left")
+    if direction == "backward":
+        index = before
+    elif direction == "forward":
+        index = after
+    else:
+        gap_before = np.where(before >= 0, left_ts - right_ts[np.maximum(before, 0)], np.iinfo(np.int64).max)
+        gap_after = np.where(after < m, right_ts[np.minimum(after, m - 1)] - left_ts, np.iinfo(np.int64).max)
+        index = np.where(gap_after < gap_before, after, before)
+
+    valid = (index >= 0) & (index < m)
+    safe = np.clip(index, 0, m - 1)
+    if tolerance_ns is not None:
+        valid &= np.abs(right_ts[safe] - left_ts) <= tolerance_ns
+    return np.where(valid, safe, -1)
+
+
+def asof_take(values, index):
+    """按 asof_indices 的结果取值，未匹配处为 NaN Take values by asof_indices, NaN where unmatched"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.full(len(index), np.nan)
+    return np.where(index >= 0, values[np.maximum(index, 0)], np.nan)
+
+
+class AlignedFrame:
+    """
+    以 FPS 采样时间为时间轴，把 GPU、CPU 与内存按 as-of 规则对齐到同一帧中的列式数据。
+    FPS/GPU 来自 core-animation-fps-estimate，CPU/内存来自 sysmon-process，采样频率不同，
+    超出容忍度的样本不参与对齐（值为 NaN）。
+
+    Columnar frame that aligns GPU, CPU and memory to the FPS sample times
+    with an as-of join. FPS/GPU come from core-animation-fps-estimate and
+    CPU/memory from sysmon-process at different rates; samples further apart
+    than the tolerance are left unjoined (NaN).
+
+        frame = AlignedFrame.from_parser(parser, tolerance_ns=500_000_000)
+        frame.describe("cpu", frame.mask("fps < 30"))
+    """
+
+    def __init__(self, columns):
+        # {"ts_ns": int64, 列名: float64} {"ts_ns": int64, column: float64}
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["ts_ns"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @classmethod
+    def from_values(
+        cls,
+        fps_values,
+        gpu_values,
+        cpu_values,
+        mem_values,
+        tolerance_ns=1_000_000_000,
+        direction="backward",
+    ):
+        """由 XCTraceParser 格式的四组数据构建 Build from the four XCTraceParser series"""
+        series = {"fps": fps_values, "gpu": gpu_values, "cpu": cpu_values, "mem": mem_values}
+        ts, fps = to_ns_columns(series["fps"] or [], ["fps"])
+        columns = {"ts_ns": ts, "fps": fps["fps"]}
+        for suffix in ("gpu", "cpu", "mem"):
+            fields = [field for column_suffix, field in FRAME_COLUMNS.values() if column_suffix == suffix]
+            right_ts, right = to_ns_columns(series[suffix] or [], fields)
+            index = asof_indices(ts, right_ts, tolerance_ns, direction)
+            for name, (column_suffix, field) in FRAME_COLUMNS.items():
+                if column_suffix == suffix:
+                    columns[name] = asof_take(right[field], index)
+        return cls(columns)
+
+    @classmethod
+    def from_parser(cls, parser, tolerance_ns=1_000_000_000, direction="backward"):
+        """由 parse() 之后的 XCTraceParser 构建 Build from an XCTraceParser after parse()"""
+        return cls.from_values(
+            parser.fps_values, parser.gpu_values, parser.cpu_values, parser.mem_values, tolerance_ns, direction
+        )
+
+    @classmethod
+    def from_save_dir(cls, save_dir, trace_id, tolerance_ns=1_000_000_000, direction="backward"):
+        """读取 save() 输出的 {suffix}/{trace_id}_{suffix}.json Read the save() json files of one trace"""
+        series = {}
+        for suffix in ("fps", "gpu", "cpu", "mem"):
+            path = os.path.join(save_dir, suffix, f"{trace_id}_{suffix}.json")
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"文件不存在: {path}")
+            with open(path, "r") as f:
+                series[suffix] = json.load(f)
+        return cls.from_values(
+            series["fps"], series["gpu"], series["cpu"], series["mem"], tolerance_ns, direction
+        )
+
+    def mask(self, where):
+        """
+        由 "fps < 30 and gpu > 80" 这样的条件生成布尔掩码，NaN 不满足任何条件
+
+        Boolean mask of a filter such as "fps < 30 and gpu > 80". NaN never matches.
+        """
+        result = np.ones(len(self), dtype=bool)
+        for condition in re.split(r"\s+and\s+", where.strip()):
+            match = _CONDITION.match(condition)
+            if not match:
+                raise ValueError(f"无法解析条件 Cannot parse condition: {condition!r}")
+            name, op, value = match.groups()
+            if name not in self.columns:
+                raise ValueError(f"未知的列 Unknown column: {name}")
+            result &= _OPERATORS[op](self.columns[name], float(value))
+        return result
+
+    def describe(self, name, mask=None):
+        """
+        某列（可选掩码内）非 NaN 值的数量、均值、分位数与最值
+
+        Count, mean, percentiles and min/max of the non-NaN values of a column,
+        optionally within a mask.
+        """
+        values = self.columns[name]
+        if mask is not None:
+            values = values[mask]
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return {"count": 0, "mean": None, "p50": None, "p90": None, "min": None, "max": None}
+        p50, p90 = np.percentile(values, [50, 90])
+        return {
+            "count": len(values),
+            "mean": float(values.mean()),
+            "p50": float(p50),
+            "p90": float(p90),
+            "min": float(values.min()),
+            "max": float(values.max()),
+        }
+
+    def overlay_data(self, names, title="FPS / GPU / CPU / MEM", nan_as_none=False):
+        """
+        叠加图数据，共享毫秒精度的时间轴 FMParsedData for one overlay chart on a shared ms time axis
+        :param nan_as_none: DataVisualizer 需要 None 表示缺失值 DataVisualizer needs None for gaps
+        """
+        from data_visualizer import FMParsedData
+
+        ms = self.columns["ts_ns"] // 1_000_000
+        x_seq = [f"{seconds_to_hms(v // 1000)}.{v % 1000:03d}" for v in ms.tolist()]
+        y_seq = {}
+        for name in names:
+            values = np.round(self.columns[name], 2).tolist()
+            if nan_as_none:
+                values = [None if v != v else v for v in values]
+            y_seq[name] = values
+        return FMParsedData(title=title, file_names=list(names), y_label="value", y_seq=y_seq, x_seq=x_seq)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import asyncio
+
+from xctrace_parser import XCTraceParser, reverse_order, xcrun_path
+
+
+class AsyncXCTraceParser(XCTraceParser):
+    """
+    XCTraceParser 的 asyncio 版本：export 通过 asyncio 子进程执行，
+    CPU 密集的 XML 解析交给 executor，不会阻塞事件循环。
+    每次 export 可单独设置超时，超时或任务被取消时会结束对应的 xctrace 子进程。
+
+    asyncio variant of XCTraceParser. Exports run as asyncio subprocesses and
+    the CPU-bound XML parse is handed to an executor, so the event loop is
+    never blocked. Every export has its own timeout, and a timeout or a
+    cancellation kills the matching xctrace subprocess.
+
+        async def handle(trace_path):
+            parser = AsyncXCTraceParser(trace_path, log_path, "Steam", export_timeout=300)
+            await parser.parse_async()
+            await parser.save_async()
+
+    executor 为 None 时使用事件循环默认的线程池；传入 ProcessPoolExecutor
+    可以让多个 trace 的解析真正并行（已开始的解析无法被取消）。
+    With executor None the loop's default thread pool is used. Pass a
+    ProcessPoolExecutor to parse many traces in parallel (a parse that has
+    already started in a worker cannot be cancelled).
+    """
+
+    def __init__(
+        self,
+        trace_path,
+        log_path,
+        target_process_name,
+        trace_id=None,
+        executor=None,
+        export_timeout=None,
+    ):
+        super().__init__(trace_path, log_path, target_process_name, trace_id=trace_id)
+        self.executor = executor
+        self.export_timeout = export_timeout
+
+    def __getstate__(self):
+        # executor 不可序列化，提交到进程池时去掉
+        # Executors are not picklable, drop it when sent to a process pool
+        state = self.__dict__.copy()
+        state["executor"] = None
+        return state
+
+    async def parse_async(self):
+        self.print_log("启动解析进程 Starting trace parsing")
+
+        try:
+            await self._export_toc_async()
+            fps_xml_path, sysmon_xml_path = await asyncio.gather(
+                self._export_xml_async("core-animation-fps-estimate", "core-animation-fps"),
+                self._export_xml_async("sysmon-process", "sysmon-process"),
+            )
+
+            loop = asyncio.get_running_loop()
+            fps_result, sysmon_result = await asyncio.gather(
+                loop.run_in_executor(
+                    self.executor, self._read_in_worker, "_read_gpu_fps", fps_xml_path, ("fps", "gpu")
+                ),
+                loop.run_in_executor(
+                    self.executor, self._read_in_worker, "_read_cpu_mem", sysmon_xml_path, ("cpu", "mem")
+                ),
+            )
+            (fps_data, gpu_data), fps_orders, _ = fps_result
+            (cpu_data, mem_data), cpu_orders, pid = sysmon_result
+            self.time_orders.update(fps_orders)
+            self.time_orders.update(cpu_orders)
+            if pid is not None:
+                self.target_pid = pid
+            self.fps_values = fps_data
+            self.gpu_values = gpu_data
+            self.cpu_values = cpu_data
+            self.mem_values = mem_data
+
+            # 反转时间序列（原始数据为倒序），原地反转不复制，并同步排序元数据
+            # Reverse in place (the raw data is in reverse order) and flip the order metadata
+            for suffix, values in (
+                ("fps", self.fps_values),
+                ("gpu", self.gpu_values),
+                ("cpu", self.cpu_values),
+                ("mem", self.mem_values),
+            ):
+                values.reverse()
+                self.time_orders[suffix] = reverse_order(self.time_orders.get(suffix))
+
+            self.print_log("解析成功完成 Parsing completed successfully")
+        except asyncio.CancelledError:
+            self.print_log("解析已取消 Parsing cancelled")
+            raise
+        except Exception as e:
+            self.print_log(f"解析失败! 错误信息: {str(e)}")
+            raise
+
+    def _read_in_worker(self, reader, xml_path, suffixes):
+        """
+        在 executor 中读取一个导出表，连同排序元数据与 pid 一起返回：
+        ProcessPoolExecutor 的工作进程里对 self 的修改不会传回主进程
+
+        Read one exported table in the executor and return its order metadata
+        and the pid along with the data, since changes a ProcessPoolExecutor
+        worker makes to self never reach the main process.
+        """
+        data = getattr(self, reader)(xml_path)
+        return data, {suffix: self.time_orders.get(suffix) for suffix in suffixes}, self.target_pid
+
+    async def save_async(self, output_dir="./temp/save"):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.save, output_dir)
+
+    async def _export_xml_async(self, schema_name, output_suffix):
+        """通用XML导出方法（asyncio 子进程）"""
+        output_path = os.path.join(self.temp_path, f"{self.trace_id}_{output_suffix}.xml")
+        await self._run_export(
+            "--output",
+            output_path,
+            "--xpath",
+            f'/trace-toc/run[@number="1"]/data/table[@schema="{schema_name}"]',
+        )
+        return output_path
+
+    async def _export_toc_async(self):
+        """导出目录结构"""
+        output_path = os.path.join(self.temp_path, f"{self.trace_id}_toc.xml")
+        await self._run_export("--output", output_path, "--toc", check=False)
+        return output_path
+
+    async def _run_export(self, *args, check=True):
+        cmd = [xcrun_path(), "xctrace", "export", "--input", self.trace_path, *args]
+        self.print_log(f"执行命令: {' '.join(cmd)}")
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), self.export_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            self.print_log(f"导出中止 Export aborted: {' '.join(cmd)}")
+            raise
+        if check and proc.returncode != 0:
+            raise RuntimeError(
+                f"命令执行失败，退出码: {proc.returncode} {stderr.decode(errors='replace').strip()}"
+            )
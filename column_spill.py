@@ -0,0 +1,426 @@
+import os
+import glob
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from xctrace_parser import XCTraceParser, CompactElement, RefCache, make_trace_id, seconds_to_hms, process_pid
+
+# 全进程 sysmon-process 的列 Columns of the all-process sysmon-process table
+PROCESS_COLUMNS = {
+    "ts_ns": np.int64,
+    "process": np.int32,
+    "pid": np.int32,
+    "cpu": np.float64,
+    "memory": np.float64,
+    "resident_size": np.float64,
+}
+
+
+def main():
+    for d in ("./temp/parse", "./temp/save"):
+        Path(d).mkdir(parents=True, exist_ok=True)
+
+    parser = argparse.ArgumentParser(description="全进程解析（内存受限） Out-of-core all-process parse")
+    parser.add_argument(
+        "-trace_path",
+        required=True,
+        help="Path to .trace file to analyze",
+    )
+    parser.add_argument(
+        "-xml_path",
+        default=None,
+        help="use an already exported sysmon-process xml instead of exporting",
+    )
+    parser.add_argument(
+        "-memory_budget_mb",
+        type=int,
+        default=256,
+        help="max megabytes of column data held in memory at once",
+    )
+    parser.add_argument(
+        "-spill_dir",
+        default=None,
+        help="directory for the column chunk files (default: a temp directory)",
+    )
+    args = parser.parse_args()
+
+    trace_id = make_trace_id(args.trace_path)
+    out_of_core = OutOfCoreParser(
+        trace_path=args.trace_path,
+        log_path=f"./temp/parse/{trace_id}_parse.log",
+        trace_id=trace_id,
+        memory_budget=args.memory_budget_mb * 1024 * 1024,
+        spill_dir=args.spill_dir,
+    )
+    try:
+        out_of_core.parse_all_processes(xml_path=args.xml_path)
+        out_of_core.save_all_processes()
+    finally:
+        out_of_core.cleanup()
+
+
+class SpillColumns:
+    """
+    落盘的列式数据：行先写入固定大小的 numpy 缓冲区，满 chunk_rows 行即把每一列
+    写成 directory/{chunk}.{column}.npy，读取时用 mmap 逐块加载，内存中最多只有一个块。
+
+    Column data spilled to disk. Rows go into fixed-size numpy buffers and every
+    chunk_rows rows each column is written as directory/{chunk}.{column}.npy.
+    Chunks are read back through mmap one at a time, so at most one chunk is
+    held in memory.
+
+        spill = SpillColumns({"ts_ns": np.int64, "cpu": np.float64}, chunk_rows=1 << 20)
+        spill.append(ts, cpu)
+        for chunk in spill.chunks():
+            chunk["cpu"].mean()
+    """
+
+    def __init__(self, dtypes, chunk_rows, directory=None):
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in dtypes.items()}
+        self.names = list(self.dtypes)
+        self.chunk_rows = max(1, int(chunk_rows))
+        self._own_directory = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix="xctrace_spill_")
+        Path(self.directory).mkdir(parents=True, exist_ok=True)
+        self.chunk_count = 0
+        self.rows = 0
+        self._buffers = [np.empty(self.chunk_rows, dtype) for dtype in self.dtypes.values()]
+        self._fill = 0
+
+    @staticmethod
+    def rows_for_budget(dtypes, memory_budget, copies=4):
+        """
+        内存预算对应的块行数：写缓冲、排序的 argsort 与归并的窗口各占一份
+        Chunk rows for a memory budget: the write buffer, argsort while sorting
+        and the merge windows each take a copy
+        """
+        row_bytes = sum(np.dtype(dtype).itemsize for dtype in dtypes.values()) + 8
+        return max(1024, memory_budget // (row_bytes * copies))
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, *values):
+        i = self._fill
+        for buf, value in zip(self._buffers, values):
+            buf[i] = value
+        self._fill = i + 1
+        self.rows += 1
+        if self._fill == self.chunk_rows:
+            self.flush()
+
+    def extend(self, columns):
+        """按块追加 {列名: 数组} Append a block of {column: array}"""
+        n = len(columns[self.names[0]])
+        begin = 0
+        while begin < n:
+            take = min(self.chunk_rows - self._fill, n - begin)
+            for name, buf in zip(self.names, self._buffers):
+                buf[self._fill:self._fill + take] = columns[name][begin:begin + take]
+            self._fill += take
+            self.rows += take
+            begin += take
+            if self._fill == self.chunk_rows:
+                self.flush()
+
+    def flush(self):
+        if not self._fill:
+            return
+        for name, buf in zip(self.names, self._buffers):
+            np.save(self._chunk_path(self.chunk_count, name), buf[:self._fill])
+        self.chunk_count += 1
+        self._fill = 0
+
+    def chunks(self):
+        """按写入顺序逐块产出 {列名: mmap 数组} Yield {column: mmap array} per chunk in write order"""
+        self.flush()
+        for k in range(self.chunk_count):
+            yield self.load_chunk(k)
+
+    def load_chunk(self, k):
+        return {name: np.load(self._chunk_path(k, name), mmap_mode="r") for name in self.names}
+
+    def cleanup(self):
+        """删除块文件 Delete the chunk files"""
+        if self._own_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        else:
+            for path in glob.glob(os.path.join(self.directory, "*.npy")):
+                os.remove(path)
+        self.chunk_count = 0
+        self.rows = 0
+        self._fill = 0
+
+    def _chunk_path(self, k, name):
+        return os.path.join(self.directory, f"{k:06d}.{name}.npy")
+
+
+def external_sort(spill, key, directory=None):
+    """
+    按 key 列稳定排序的外部归并排序：每个块在内存中排序成一个有序段，
+    再对所有段做 k 路归并。归并时每段只在内存中保留 chunk_rows // (段数 + 1) 行的窗口，
+    每轮输出所有窗口中不大于各窗口末尾最小键的行（这些行的位置已确定），合并后稳定排序。
+
+    Stable external merge sort on the key column. Each chunk is sorted in memory
+    into a run, then all runs are k-way merged. During the merge every run keeps
+    a window of chunk_rows // (runs + 1) rows, and each round emits the rows not
+    greater than the smallest window tail (their final position is settled),
+    stably sorted together.
+    :return: 新的 SpillColumns The sorted SpillColumns
+    """
+    runs = SpillColumns(spill.dtypes, spill.chunk_rows)
+    try:
+        for chunk in spill.chunks():
+            order = np.argsort(chunk[key], kind="stable")
+            runs.extend({name: chunk[name][order] for name in spill.names})
+            # 每个段单独成块 Every run is flushed as its own chunk
+            runs.flush()
+        result = SpillColumns(spill.dtypes, spill.chunk_rows, directory)
+        if runs.chunk_count <= 1:
+            for chunk in runs.chunks():
+                result.extend(chunk)
+        else:
+            window = max(1, spill.chunk_rows // (runs.chunk_count + 1))
+            _merge_runs(runs, key, runs.chunk_count, window, result)
+        result.flush()
+        return result
+    finally:
+        runs.cleanup()
+
+
+def _merge_runs(runs, key, run_count, window, result):
+    # 每个段正好是 runs 的一个块 Each run is exactly one chunk of `runs`
+    sources = [runs.load_chunk(k) for k in range(run_count)]
+    positions = [0] * run_count
+    names = runs.names
+    while True:
+        live = [k for k in range(run_count) if positions[k] < len(sources[k][key])]
+        if not live:
+            break
+        windows = {}
+        for k in live:
+            p = positions[k]
+            windows[k] = {name: sources[k][name][p:p + window] for name in names}
+        # 所有窗口中最小的末尾键以内的行可以安全输出。为保持稳定，等于该键的行只从
+        # 第一个以它结尾的段及其之前的段输出，之后的段要等这个段的同键行全部输出
+        # Rows up to the smallest window tail are safe to emit. To stay stable, rows
+        # equal to it only come from runs up to the first run whose window ends
+        # with it; later runs wait until that run has emitted all of its equal rows
+        bound = min(windows[k][key][-1] for k in live)
+        first = next(k for k in live if windows[k][key][-1] == bound)
+        parts = []
+        for k in live:
+            side = "right" if k <= first else "left"
+            take = int(np.searchsorted(windows[k][key], bound, side=side))
+            parts.append({name: windows[k][name][:take] for name in names})
+            positions[k] += take
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in names}
+        order = np.argsort(merged[key], kind="stable")
+        result.extend({name: merged[name][order] for name in names})
+
+
+def aggregate_per_second(spill, value_fields, group="process", key="ts_ns"):
+    """
+    在按时间排序的 SpillColumns 上逐块按 (秒, group) 聚合，输出同样落盘的聚合列：
+    second、group、count，以及每个值列的 mean/max/last。last 与 XCTraceVisualizer
+    的同秒去重（保留最后一个值）一致。块尾最后一秒的行会带到下一块一起聚合。
+
+    Aggregate a time-sorted SpillColumns per (second, group) chunk by chunk.
+    The output is spilled as well: second, group, count and mean/max/last of
+    every value column. last matches the same-second dedup of
+    XCTraceVisualizer (the last value wins). Rows of the last second of a
+    chunk are carried into the next chunk.
+    """
+    dtypes = {"second": np.int64, group: spill.dtypes[group], "count": np.int64}
+    for field in value_fields:
+        dtypes[f"{field}_mean"] = np.float64
+        dtypes[f"{field}_max"] = np.float64
+        dtypes[f"{field}_last"] = np.float64
+    result = SpillColumns(dtypes, spill.chunk_rows)
+    names = [key, group] + list(value_fields)
+    carry = None
+    for chunk in spill.chunks():
+        block = {name: np.asarray(chunk[name]) for name in names}
+        if carry is not None:
+            block = {name: np.concatenate((carry[name], block[name])) for name in names}
+        seconds = block[key] // 1_000_000_000
+        tail = int(np.searchsorted(seconds, seconds[-1], side="left"))
+        carry = {name: block[name][tail:] for name in names}
+        if tail:
+            _aggregate_block({name: block[name][:tail] for name in names}, seconds[:tail], group, value_fields, result)
+    if carry is not None and len(carry[key]):
+        _aggregate_block(carry, carry[key] // 1_000_000_000, group, value_fields, result)
+    result.flush()
+    return result
+
+
+def _aggregate_block(block, seconds, group, value_fields, result):
+    groups = block[group].astype(np.int64)
+    width = int(groups.max()) + 1
+    keys = seconds * width + groups
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], len(keys))
+    counts = ends - starts
+    columns = {
+        "second": keys[starts] // width,
+        group: keys[starts] % width,
+        "count": counts,
+    }
+    for field in value_fields:
+        values = block[field][order]
+        columns[f"{field}_mean"] = np.add.reduceat(values, starts) / counts
+        columns[f"{field}_max"] = np.maximum.reduceat(values, starts)
+        columns[f"{field}_last"] = values[ends - 1]
+    result.extend(columns)
+
+
+class OutOfCoreParser(XCTraceParser):
+    """
+    全进程 sysmon-process 的内存受限解析：解码后的列按块写入 SpillColumns，
+    之后的排序与按秒聚合都是逐块的外部算法，内存上限由 memory_budget 决定，与数据量无关。
+    进程名以 string_pool 的整数 id 存储，只在输出时还原。
+
+    Out-of-core parse of the all-process sysmon-process table. Decoded columns
+    are written to SpillColumns in chunks, and the later sort and per-second
+    aggregation run chunk-wise as external algorithms, so memory is capped by
+    memory_budget no matter how much data there is. Process names are stored
+    as string_pool ids and only resolved for output.
+
+        parser = OutOfCoreParser(trace_path, log_path, memory_budget=256 << 20)
+        parser.parse_all_processes()
+        parser.save_all_processes()
+        parser.cleanup()
+    """
+
+    def __init__(self, trace_path, log_path, trace_id=None, memory_budget=256 * 1024 * 1024, spill_dir=None):
+        super().__init__(trace_path, log_path, target_process_name=None, trace_id=trace_id)
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        # 3/4 的预算给列缓冲区，其余给 id 缓存 3/4 of the budget for the column buffers, the rest for the id cache
+        self.chunk_rows = SpillColumns.rows_for_budget(PROCESS_COLUMNS, memory_budget * 3 // 4)
+        self.samples = None
+
+    def parse_all_processes(self, xml_path=None):
+        if xml_path is None:
+            xml_path = self._export_xml(schema_name="sysmon-process", output_suffix="sysmon-process")
+        self.print_log(f"解析全进程CPU/内存数据: {xml_path} (chunk {self.chunk_rows} rows)")
+        directory = os.path.join(self.spill_dir, self.trace_id, "raw") if self.spill_dir else None
+        self.samples = SpillColumns(PROCESS_COLUMNS, self.chunk_rows, directory)
+        for row in self._iter_all_processes(xml_path):
+            self.samples.append(*row)
+        self.samples.flush()
+        self.print_log(
+            f"获取到 {len(self.samples)} 条全进程记录，落盘 {self.samples.chunk_count} 块 "
+            f"({len(self.samples)} rows in {self.samples.chunk_count} chunks)"
+        )
+        return self.samples
+
+    def _iter_all_processes(self, xml_path):
+        """逐行产出 (ts_ns, 进程名 id, pid, cpu, memory, resident_size) Yield one tuple per row"""
+        pool = self.string_pool
+        # process 的 fmt -> (进程名 id, pid) process fmt -> (name id, pid)
+        process_info = {}
+        # 每个进程的上一个 CPU 值 Last cpu value per process
+        last_cpu = {}
+        # id 缓存也计入内存预算，超出部分落盘 The id cache counts against the budget too, the rest spills to disk
+        cache = RefCache.for_budget(self.memory_budget // 4)
+        try:
+            for row in self._iter_rows(xml_path):
+                for size_ele in row.iter("size-in-bytes"):
+                    size_id = size_ele.get("id")
+                    if size_id is not None:
+                        cache[size_id] = CompactElement(size_ele.tag, size_ele.text, size_ele.get("fmt"))
+                time_ele = self._get_cached_element(row, ".//start-time", cache)
+                process_ele = self._get_cached_element(row, ".//process", cache)
+                if time_ele is None or process_ele is None:
+                    continue
+                process_fmt = process_ele.get("fmt", "")
+                info = process_info.get(process_fmt)
+                if info is None:
+                    info = process_info[process_fmt] = _process_info(pool, process_fmt)
+                name_id, pid = info
+
+                cpu_ele = self._get_cached_element(row, ".//system-cpu-percent", cache)
+                cpu_value = float(cpu_ele.text) if cpu_ele is not None else last_cpu.get(name_id, 0.0)
+                last_cpu[name_id] = cpu_value
+                mem_ele = self._get_cached_element(row, ".//size-in-bytes[3]", cache)
+                resident_ele = self._get_cached_element(row, ".//size-in-bytes[9]", cache)
+                yield (
+                    int(time_ele.text),
+                    name_id,
+                    pid,
+                    cpu_value,
+                    float(mem_ele.text) / 1048576 if mem_ele is not None else 0.0,
+                    float(resident_ele.text) / 1048576 if resident_ele is not None else 0.0,
+                )
+        finally:
+            cache.close()
+
+    def aggregate(self):
+        """外部排序后按 (秒, 进程) 聚合 External sort, then aggregate per (second, process)"""
+        self.print_log("外部排序 External sort")
+        ordered = external_sort(self.samples, "ts_ns")
+        try:
+            self.print_log("按秒聚合 Per-second aggregation")
+            return aggregate_per_second(ordered, ["cpu", "memory", "resident_size"])
+        finally:
+            ordered.cleanup()
+
+    def save_all_processes(self, output_dir="./temp/save"):
+        """
+        保存按秒聚合后的全进程数据为 NDJSON（逐块写出）
+        Save the per-second all-process data as NDJSON, written chunk by chunk
+        """
+        from stream_sinks import open_sink
+
+        d = os.path.join(output_dir, "all_process")
+        Path(d).mkdir(parents=True, exist_ok=True)
+        pool = self.string_pool
+        aggregated = self.aggregate()
+        try:
+            with open_sink(
+                os.path.join(d, f"{self.trace_id}_all_process"),
+                "ndjson",
+                ["time", "process", "cpu", "memory", "resident_size", "samples"],
+            ) as sink:
+                for chunk in aggregated.chunks():
+                    for second, process, count, cpu, memory, resident in zip(
+                        chunk["second"].tolist(),
+                        chunk["process"].tolist(),
+                        chunk["count"].tolist(),
+                        chunk["cpu_last"].tolist(),
+                        chunk["memory_last"].tolist(),
+                        chunk["resident_size_last"].tolist(),
+                    ):
+                        sink.write({
+                            "time": seconds_to_hms(second),
+                            "process": pool.lookup(process),
+                            "cpu": round(cpu, 2),
+                            "memory": round(memory, 2),
+                            "resident_size": round(resident, 2),
+                            "samples": count,
+                        })
+            self.print_log(f"保存文件: {sink.path} ({sink.count} rows)")
+            return sink.path
+        finally:
+            aggregated.cleanup()
+
+    def cleanup(self):
+        if self.samples is not None:
+            self.samples.cleanup()
+
+
+def _process_info(pool, fmt):
+    """"Name (pid)" -> (进程名 id, pid)，进程名规则与 XCTraceParser 相同 Same name rule as XCTraceParser"""
+    pid = process_pid(fmt)
+    return pool.intern(fmt.split()[0] if fmt else ""), -1 if pid is None else pid
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,11 @@ import os
 # import sys
 import json
 import argparse
-from data_visualizer import FMParsedData, DataVisualizer
+import hashlib
+from data_visualizer import FMParsedData, DataVisualizer, CompactDataVisualizer
+from xctrace_parser import sort_by_time, detect_order, ASCENDING
 import time
 import random
-from pyecharts.charts import Bar, Line, Page
 
 def read_json_files(directory):
     """
@@ -29,6 +30,41 @@ def read_json_files(directory):
                 
     return json_paths
 
+def read_summary_index(directory):
+    """
+    读取 save() 生成的 summary/index.json
+    :param directory: save() 的输出目录
+    :return: {trace_id: 摘要}
+    """
+    index_path = os.path.join(directory, 'summary', 'index.json')
+    if not os.path.isfile(index_path):
+        raise FileNotFoundError(f"摘要索引不存在: {index_path}")
+    with open(index_path, 'r') as f:
+        return json.load(f)
+
+def print_overview(index, traces=None):
+    """按 trace 打印概览表 Print one overview row per trace"""
+    def _fmt(value):
+        return '-' if value is None else f"{value:.1f}"
+
+    header = f"{'trace':<28}{'device':<20}{'process':<16}{'span(s)':>9}" \
+             f"{'fps avg':>9}{'fps min':>9}{'gpu avg':>9}{'cpu avg':>9}{'cpu max':>9}{'mem max':>10}"
+    print(header)
+    print('-' * len(header))
+    for trace_id in sorted(index):
+        if traces and trace_id not in traces:
+            continue
+        item = index[trace_id]
+        m = item['metrics']
+        starts = [v['start'] for v in m.values() if v['start'] is not None]
+        ends = [v['end'] for v in m.values() if v['end'] is not None]
+        span = max(ends) - min(starts) if starts else None
+        print(
+            f"{trace_id:<28}{item.get('device', '')[:19]:<20}{item.get('process', '')[:15]:<16}{_fmt(span):>9}"
+            f"{_fmt(m['fps']['mean']):>9}{_fmt(m['fps']['min']):>9}{_fmt(m['gpu']['mean']):>9}"
+            f"{_fmt(m['cpu']['mean']):>9}{_fmt(m['cpu']['max']):>9}{_fmt(m['mem']['max']):>10}"
+        )
+
 def main():
     
     # 创建命令行参数解析器
@@ -46,6 +82,7 @@ def main():
     parser.add_argument(
         'path',
         type=str,
+        nargs='?',
         help='要扫描的目录路径'
     )
     parser.add_argument(
@@ -53,17 +90,102 @@ def main():
         action='store_true',
         help='是否递归扫描子目录'
     )
+    parser.add_argument(
+        '-snapshot',
+        choices=['svg', 'png'],
+        default=None,
+        help='Also write a static svg/png of the report without a browser',
+    )
+    parser.add_argument(
+        '-report_mode',
+        choices=['default', 'compact', 'large'],
+        default='default',
+        help='compact: 每条序列以压缩的 typed array 只保存一次 store each series once as a compressed typed array; '
+        'large: compact + 数值时间轴、渐进渲染与 LTTB 采样 numeric time axis, progressive rendering and LTTB sampling'
+    )
+    parser.add_argument(
+        '-cache_dir',
+        type=str,
+        default=None,
+        help='增量重建：只重新解析新增或变化的 Json，其余复用缓存的转换结果 '
+        'Incremental rebuild: only reparse new or changed json files and reuse cached series for the rest'
+    )
+    parser.add_argument(
+        '-db',
+        type=str,
+        default=None,
+        help='从 SQLite 指标库查询而不是扫描 Json 文件 Query a metrics_store SQLite db instead of scanning json files'
+    )
+    parser.add_argument(
+        '-traces',
+        nargs='+',
+        default=None,
+        help='只加载选择的 trace（默认全部） Only load these traces (default all)'
+    )
+    parser.add_argument(
+        '-overview',
+        action='store_true',
+        help='只读取 summary/index.json 打印概览表 Print an overview table from summary/index.json only'
+    )
+    parser.add_argument(
+        '-process',
+        type=str,
+        default=None,
+        help='查询模式下的进程名 Process name to query in db mode'
+    )
+    parser.add_argument(
+        '-start',
+        type=float,
+        default=None,
+        help='查询模式下的起始秒数 Window start seconds in db mode'
+    )
+    parser.add_argument(
+        '-end',
+        type=float,
+        default=None,
+        help='查询模式下的结束秒数 Window end seconds in db mode'
+    )
     args = parser.parse_args()
 
-    results = read_json_files(args.path)
-    
-    json_parser = FMJsonParser(
-        json_files = results
-    )
+    if args.overview:
+        if not args.path:
+            parser.error('-overview 需要 path  -overview requires path')
+        print_overview(read_summary_index(args.path), args.traces)
+        return
+
+    if args.db:
+        json_parser = FMDbParser(
+            db_path=args.db,
+            traces=args.traces,
+            process=args.process,
+            start=args.start,
+            end=args.end,
+        )
+    elif args.path:
+        results = read_json_files(args.path)
+        if args.traces:
+            results = [
+                r for r in results
+                if os.path.splitext(os.path.basename(r))[0].rpartition('_')[0] in args.traces
+            ]
+
+        if args.cache_dir:
+            json_parser = FMCachedParser(
+                json_files = results,
+                cache_dir = args.cache_dir
+            )
+        else:
+            json_parser = FMJsonParser(
+                json_files = results
+            )
+    else:
+        parser.error('需要 path 或 -db  path or -db is required')
     
     # 可视化流程
     print("开始可视化 Start visualize")
     html_path = f"./temp/visualize/{json_parser.trace_id}_report.html"
+    # 缓存中的数据已经转换过 Series from the cache are already transformed
+    transformed = getattr(json_parser, 'transformed', False)
     
     # 转换数据格式
     fps_data = XCTraceVisualizer(
@@ -71,35 +193,44 @@ def main():
         trace_id=json_parser.trace_id,
         data_type=DataType.FPS,
         data_detail=json_parser.fps_values_dict,
-        file_names=json_parser.fps_file_names
-    ).transform_data()
+        file_names=json_parser.fps_file_names,
+        orders=getattr(json_parser, 'orders', None)
+    ).transform_data(transformed)
 
     gpu_data = XCTraceVisualizer(
         title="GPU Data",
         trace_id=json_parser.trace_id,
         data_type=DataType.GPU,
         data_detail=json_parser.gpu_values_dict,
-        file_names=json_parser.gpu_file_names
-    ).transform_data()
+        file_names=json_parser.gpu_file_names,
+        orders=getattr(json_parser, 'orders', None)
+    ).transform_data(transformed)
 
     cpu_data = XCTraceVisualizer(
         title="CPU Usage",
         trace_id=json_parser.trace_id,
         data_type=DataType.CPU,
         data_detail=json_parser.cpu_values_dict,
-        file_names=json_parser.cpu_file_names
-    ).transform_data()
+        file_names=json_parser.cpu_file_names,
+        orders=getattr(json_parser, 'orders', None)
+    ).transform_data(transformed)
 
     mem_data = XCTraceVisualizer(
         title="Memory Usage",
         trace_id=json_parser.trace_id,
         data_type=DataType.MEM,
         data_detail=json_parser.mem_values_dict,
-        file_names=json_parser.mem_file_names
-    ).transform_data()
+        file_names=json_parser.mem_file_names,
+        orders=getattr(json_parser, 'orders', None)
+    ).transform_data(transformed)
 
     # 生成可视化报告
-    dv = DataVisualizer(html_path=html_path)
+    if args.report_mode == 'compact':
+        dv = CompactDataVisualizer(html_path=html_path)
+    elif args.report_mode == 'large':
+        dv = CompactDataVisualizer(html_path=html_path, large=True)
+    else:
+        dv = DataVisualizer(html_path=html_path)
     dv.add_multi_line_parsed_data(fps_data)
     dv.add_multi_line_parsed_data(gpu_data)
     dv.add_multi_line_parsed_data(cpu_data)
@@ -107,6 +238,17 @@ def main():
     dv.render_html()
     
     print(f"可视化完成 Report saved to: {html_path}")
+    if args.snapshot:
+        from svg_renderer import StaticVisualizer
+
+        sv = StaticVisualizer(
+            svg_path=html_path[:-len(".html")] + ".svg",
+            snapshot_path=html_path[:-len(".html")] + ".png",
+        )
+        for chart in (fps_data, gpu_data, cpu_data, mem_data):
+            sv.add_multi_line_parsed_data(chart)
+        image_path = sv.render_svg() if args.snapshot == "svg" else sv.make_snapshot()
+        print(f"静态图已生成 Static image saved to: {image_path}")
 
 class FMJsonParser:
     def __init__(self, json_files: list):
@@ -121,6 +263,8 @@ class FMJsonParser:
         self.gpu_file_names = []
         self.cpu_file_names = []
         self.mem_file_names = []
+        # 文件名 -> 检测到的时间顺序 file name -> detected time order
+        self.orders = {}
         self.trace_id = self._generate_trace_id()
         for json_file_path in json_files:
             # 提取文件名（带扩展名）
@@ -129,8 +273,11 @@ class FMJsonParser:
             # 提取文件名（不带扩展名）
             file_name_without_ext = os.path.splitext(file_name_with_ext)[0]
             key = file_name_without_ext.split('_')[-1]  # 获取元素的后缀关键字
-            
+            if key not in ('fps', 'gpu', 'cpu', 'mem'):
+                continue
+
             json_list = self._parse_json_file(json_file_path)
+            self.orders[file_name_without_ext] = detect_order(json_list, _item_seconds)
             if key == 'fps':
                 self.fps_file_names.append(file_name_without_ext)
                 self.fps_values_dict[file_name_without_ext] = json_list
@@ -158,13 +305,173 @@ class FMJsonParser:
                     data = json.load(file)  # 解析 JSON 数据
                     # 输出解析后的数据
                     print(f"\n解析文件: {json_file_path}")
-                    return list(reversed(data))
+                    return data
                     
                 except json.JSONDecodeError as e:
                     print(f"解析 {json_file_path} 时发生错误:", e)
                     return []
 
 
+# 缓存格式与转换逻辑的版本，不一致时整个缓存失效
+# Version of the cache format and of the transforms, a mismatch invalidates the whole cache
+CACHE_VERSION = 2
+
+
+class FMCachedParser:
+    """
+    增量版本的 FMJsonParser：cache_dir/manifest.json 记录每个 Json 的 mtime/size/hash，
+    以及对应的已转换序列缓存文件。mtime 与 size 未变的文件直接读取缓存；
+    变化了但 hash 相同的文件只更新 manifest；其余文件才重新解析与转换。
+    暴露与 FMJsonParser 相同的属性，但序列已经是转换后的数据（transformed = True）。
+
+    Incremental FMJsonParser. cache_dir/manifest.json records mtime/size/hash
+    of every json file and the cache file holding its transformed series.
+    Files with the same mtime and size load from the cache, files whose hash
+    did not change only refresh the manifest, and only the rest are reparsed
+    and transformed. Exposes the FMJsonParser attributes with already
+    transformed series (transformed = True). A manifest written with another
+    CACHE_VERSION is discarded together with its series.
+    """
+    transformed = True
+
+    def __init__(self, json_files: list, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.series_dir = os.path.join(cache_dir, 'series')
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        os.makedirs(self.series_dir, exist_ok=True)
+
+        self.trace_id = f"{int(time.time())}_{random.randint(1000, 9999)}"
+        for suffix in SUFFIX_TYPES:
+            setattr(self, f"{suffix}_values_dict", {})
+            setattr(self, f"{suffix}_file_names", [])
+
+        manifest = self._read_manifest()
+        new_manifest = {}
+        self.reused = 0
+        self.rebuilt = 0
+        for json_file_path in json_files:
+            file_name_without_ext = os.path.splitext(os.path.basename(json_file_path))[0]
+            key = file_name_without_ext.split('_')[-1]
+            if key not in SUFFIX_TYPES:
+                continue
+            abs_path = os.path.abspath(json_file_path)
+            entry, values = self._load(abs_path, key, manifest.get(abs_path))
+            new_manifest[abs_path] = entry
+            getattr(self, f"{key}_file_names").append(file_name_without_ext)
+            getattr(self, f"{key}_values_dict")[file_name_without_ext] = values
+
+        # 合并进已有的 manifest，只删除源文件已不存在的条目；本次未扫描到的文件
+        # （例如另一个目录的输入）仍保留缓存
+        # Merge into the existing manifest and only prune entries whose source file
+        # is gone; files outside this scan (e.g. another input directory) keep their cache
+        merged = {path: entry for path, entry in manifest.items() if os.path.exists(path)}
+        merged.update(new_manifest)
+        referenced = {entry.get('series') for entry in merged.values()}
+        for entry in manifest.values():
+            if entry.get('series') not in referenced:
+                cache_path = os.path.join(self.series_dir, f"{entry.get('series')}.json")
+                if os.path.exists(cache_path):
+                    os.remove(cache_path)
+        self._write_manifest(merged)
+        print(f"增量重建 Incremental rebuild: {self.rebuilt} rebuilt, {self.reused} reused")
+
+    def _load(self, abs_path, key, entry):
+        st = os.stat(abs_path)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            values = self._read_series(entry['series'])
+            if values is not None:
+                self.reused += 1
+                return entry, values
+
+        digest = _file_hash(abs_path)
+        # 缓存文件名带上数据类型 The cache file name includes the data type
+        entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'hash': digest, 'series': f"{key}_{digest}"}
+        values = self._read_series(entry['series'])
+        if values is not None:
+            self.reused += 1
+            return entry, values
+
+        with open(abs_path, 'r') as f:
+            data = json.load(f)
+        print(f"\n解析文件: {abs_path}")
+        values = XCTraceVisualizer(None, None, SUFFIX_TYPES[key], None, []).transform_series(
+            data, order=detect_order(data, _item_seconds)
+        )
+        self._write_series(entry['series'], values)
+        self.rebuilt += 1
+        return entry, values
+
+    def _read_manifest(self):
+        if not os.path.isfile(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            manifest = None
+        if isinstance(manifest, dict) and manifest.get('version') == CACHE_VERSION:
+            return manifest['files']
+        print("缓存版本不一致，全部重建 Cache version changed, rebuilding everything")
+        for name in os.listdir(self.series_dir):
+            os.remove(os.path.join(self.series_dir, name))
+        return {}
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'files': manifest}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _read_series(self, name):
+        # 缓存按列存储 The cache stores the series as columns
+        cache_path = os.path.join(self.series_dir, f"{name}.json")
+        try:
+            with open(cache_path, 'r') as f:
+                columns = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return [{"time": t, "value": v} for t, v in zip(columns['time'], columns['value'])]
+
+    def _write_series(self, name, values):
+        cache_path = os.path.join(self.series_dir, f"{name}.json")
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'time': [item['time'] for item in values], 'value': [item['value'] for item in values]}, f)
+        os.replace(tmp_path, cache_path)
+
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FMDbParser:
+    """
+    通过 metrics_store 的索引查询指定 trace 与时间窗口，
+    输出与 FMJsonParser 相同的数据结构
+
+    Pull selected traces and time windows through the metrics_store index,
+    exposing the same attributes as FMJsonParser.
+    """
+    def __init__(self, db_path: str, traces=None, process=None, start=None, end=None):
+        from metrics_store import MetricsStore
+
+        self.trace_id = f"{int(time.time())}_{random.randint(1000, 9999)}"
+        store = MetricsStore(db_path)
+        # 查询结果按 ts 升序 Query results are sorted by ts
+        self.orders = {}
+        for suffix in ('fps', 'gpu', 'cpu', 'mem'):
+            values = store.query_values(suffix, traces, process, start, end)
+            values_dict = {f"{trace}_{suffix}": rows for trace, rows in values.items()}
+            setattr(self, f"{suffix}_values_dict", values_dict)
+            setattr(self, f"{suffix}_file_names", list(values_dict))
+            self.orders.update(dict.fromkeys(values_dict, ASCENDING))
+        store.close()
+
+
 # 保留原有DataType枚举和可视化类
 class DataType:
     FPS = 0
@@ -173,6 +480,21 @@ class DataType:
     MEM = 3
 
 
+Y_LABELS = {
+    DataType.FPS: "FPS",
+    DataType.GPU: "GPU",
+    DataType.CPU: "CPU",
+    DataType.MEM: "MEM",
+}
+
+SUFFIX_TYPES = {
+    'fps': DataType.FPS,
+    'gpu': DataType.GPU,
+    'cpu': DataType.CPU,
+    'mem': DataType.MEM,
+}
+
+
 def seconds_to_hms(seconds):
     """将总秒数转换为 HH:MM:SS 格式"""
     hours = int(seconds // 3600)
@@ -206,9 +528,14 @@ def duration_to_seconds(duration_str):
     return seconds
 
 
+def _item_seconds(item):
+    """save() 行的整秒时间，用于检测顺序 Whole seconds of a save() row, used to detect the order"""
+    return duration_to_seconds(item["time"].split(".")[0])
+
+
 
 class XCTraceVisualizer:
-    def __init__(self, title, trace_id, data_type: DataType, data_detail, file_names: list):
+    def __init__(self, title, trace_id, data_type: DataType, data_detail, file_names: list, orders=None):
         self.title = title
         self.trace_id = trace_id
         self.data_type = data_type
@@ -216,36 +543,35 @@ class XCTraceVisualizer:
         self.data_detail = data_detail
         # list, ["hetao_1688_mem"]
         self.file_names = file_names
+        # 解析时检测到的时间顺序，缺省时由 sort_by_time 检测
+        # time order detected by the parser, sort_by_time detects it when missing
+        self.orders = orders or {}
 
         self._y_label = None
 
-    def transform_data(self):
+    def transform_data(self, transformed=False):
+        """
+        :param transformed: data_detail 已是转换后的数据（增量缓存）时只组装结果
+                            data_detail is already transformed (incremental cache), only assemble it
+        """
+        self._y_label = Y_LABELS[self.data_type]
+        if not transformed:
+            for name in self.file_names:
+                self.data_detail[name] = self.transform_series(self.data_detail[name], self.orders.get(name))
+        return self._get_dv_parsed_data()
+
+    def transform_series(self, data_detail, order=None):
+        """转换单个文件的数据 Transform the series of one file"""
         t = self.data_type
         if t == DataType.FPS:
-            self._y_label = "FPS"
-            for name in self.file_names:
-                tmp_data = self.data_detail[name]
-                tmp_t_data = self._transform_fps_data(tmp_data)
-                self.data_detail[name] = tmp_t_data
+            return self._transform_fps_data(data_detail, order)
         elif t == DataType.GPU:
-            self._y_label = "GPU"
-            for name in self.file_names:
-                tmp_data = self.data_detail[name]
-                tmp_t_data = self._transform_gpu_data(tmp_data)
-                self.data_detail[name] = tmp_t_data
+            return self._transform_gpu_data(data_detail, order)
         elif t == DataType.CPU:
-            self._y_label = "CPU"
-            for name in self.file_names:
-                tmp_data = self.data_detail[name]
-                tmp_t_data = self._transform_cpu_data(tmp_data)
-                self.data_detail[name] = tmp_t_data
+            return self._transform_cpu_data(data_detail, order)
         elif t == DataType.MEM:
-            self._y_label = "MEM"
-            for name in self.file_names:
-                tmp_data = self.data_detail[name]
-                tmp_t_data = self._transform_mem_data(tmp_data)
-                self.data_detail[name] = tmp_t_data
-        return self._get_dv_parsed_data()
+            return self._transform_mem_data(data_detail, order)
+        raise ValueError(f"未知数据类型 unknown data type: {t}")
 
     def _get_dv_parsed_data(self):
         y_dict = {}
@@ -278,7 +604,7 @@ class XCTraceVisualizer:
             title=fTitle, file_names = self.file_names, y_label=self._y_label, y_seq=y_dict, x_seq=x_seq
         )
 
-    def _transform_fps_data(self, data_detail):
+    def _transform_fps_data(self, data_detail, order=None):
         d = []
         for item in data_detail:
             _time = item["time"]
@@ -287,10 +613,10 @@ class XCTraceVisualizer:
             # 使用新函数计算总秒数
             ts = duration_to_seconds(_time.split(".")[0])
             d.append({"time": ts, "value": _value})
-        s_data = sorted(d, key=lambda item: item["time"])
+        s_data = sort_by_time(d, order)
         return self._remove_same_time_data(s_data)
 
-    def _transform_gpu_data(self, data_detail):
+    def _transform_gpu_data(self, data_detail, order=None):
         d = []
         for item in data_detail:
             _time = item["time"]
@@ -299,10 +625,10 @@ class XCTraceVisualizer:
             # 使用新函数计算总秒数
             ts = duration_to_seconds(_time.split(".")[0])
             d.append({"time": ts, "value": _value})
-        s_data = sorted(d, key=lambda item: item["time"])
+        s_data = sort_by_time(d, order)
         return self._remove_same_time_data(s_data)
 
-    def _transform_cpu_data(self, data_detail):
+    def _transform_cpu_data(self, data_detail, order=None):
         d = []
         for item in data_detail:
             _time = item["time"]
@@ -311,10 +637,10 @@ class XCTraceVisualizer:
             # 使用新函数计算总秒数
             ts = duration_to_seconds(_time.split(".")[0])
             d.append({"time": ts, "value": _value})
-        s_data = sorted(d, key=lambda item: item["time"])
+        s_data = sort_by_time(d, order)
         return self._remove_same_time_data(s_data)
 
-    def _transform_mem_data(self, data_detail):
+    def _transform_mem_data(self, data_detail, order=None):
         d = []
         for item in data_detail:
             _time = item["time"]
@@ -323,7 +649,7 @@ class XCTraceVisualizer:
             # 使用新函数计算总秒数
             ts = duration_to_seconds(_time.split(".")[0])
             d.append({"time": ts, "value": _value})
-        s_data = sorted(d, key=lambda item: item["time"])
+        s_data = sort_by_time(d, order)
         return self._remove_same_time_data(s_data)
 
     def _remove_same_time_data(self, data):
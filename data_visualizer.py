@@ -1,9 +1,13 @@
-from snapshot_selenium import snapshot as driver
-from pyecharts.charts import Line, Page
-from pyecharts import options as opts
-from pyecharts.render import make_snapshot
-from pyecharts.globals import ThemeType
+# pyecharts 与 snapshot_selenium 在用到时才导入，只解析不出报告时不需要付出导入开销
+# pyecharts and snapshot_selenium are imported on first use, so a parse without a report never pays for them
 from collections import namedtuple
+from array import array
+from bisect import bisect_left, bisect_right
+import base64
+import html
+import json
+import sys
+import zlib
 
 ParsedData = namedtuple("ParsedData", ["title", "y_label", "y_seq", "x_seq"])
 FMParsedData = namedtuple("FMParsedData", ["title", "file_names", "y_label", "y_seq", "x_seq"])
@@ -27,6 +31,8 @@ class DataVisualizer:
 		html_path="data_visualizer.html",
 		snapshot_path="data_visualizer.png",
 	):
+		from pyecharts.charts import Page
+
 		self._chart = Page(
 			layout=Page.SimplePageLayout,
 		)
@@ -36,9 +42,15 @@ class DataVisualizer:
 	def render_html(self):
 		self._chart.render(self.html_path)
 
+	def render_embed(self):
+		return self._chart.render_embed()
+
 	def make_snapshot(self):
 		try:
-			result = make_snapshot(driver, r, self.snapshot_path)
+			from snapshot_selenium import snapshot as driver
+			from pyecharts.render import make_snapshot
+
+			result = make_snapshot(driver, self._chart.render(self.html_path), self.snapshot_path)
 		except Exception as e:
 			print(f"make_snapshot Exception {e}")
 			return False
@@ -50,7 +62,27 @@ class DataVisualizer:
 		width="1300px",
 		height="500px",
 		page_title=None,
+		mark_areas=None,
 	):
+		"""
+		:param mark_areas: 需要标记的区间 [(start_seconds, end_seconds, name)]，例如卡顿区间
+		                   intervals to shade [(start_seconds, end_seconds, name)], e.g. jank intervals
+		"""
+		from pyecharts.charts import Line
+		from pyecharts import options as opts
+		from pyecharts.globals import ThemeType
+
+		markarea_opts = None
+		if mark_areas:
+			markarea_opts = opts.MarkAreaOpts(
+				is_silent=True,
+				data=[
+					opts.MarkAreaItem(name=name, x=_label_range(parsed_data.x_seq, start, end))
+					for start, end, name in mark_areas
+				],
+				itemstyle_opts=opts.ItemStyleOpts(color=MARK_AREA_COLOR),
+			)
+
 		new_chart = (
 			Line(
 				init_opts=opts.InitOpts(
@@ -66,6 +98,7 @@ class DataVisualizer:
 				parsed_data.y_seq,
 				is_smooth=False,
 				label_opts=opts.LabelOpts(is_show=False),
+				markarea_opts=markarea_opts,
 			)
 			.set_global_opts(
 				title_opts=opts.TitleOpts(title=parsed_data.title),
@@ -87,6 +120,10 @@ class DataVisualizer:
 		height="500px",
 		page_title=None,
 	):
+		from pyecharts.charts import Line
+		from pyecharts import options as opts
+		from pyecharts.globals import ThemeType
+
 		line = Line(
 				init_opts=opts.InitOpts(
 					theme=ThemeType.LIGHT,
@@ -117,5 +154,320 @@ class DataVisualizer:
 		new_chart = (line)
 		self._chart.add(new_chart)
 
+MARK_AREA_COLOR = "rgba(255, 99, 71, 0.2)"
+
+
+def _label_range(x_seq, start, end):
+	"""秒数区间 -> 类目轴上覆盖它的 (起始标签, 结束标签) Seconds range -> covering category labels"""
+	seconds = [_x_to_seconds(x) for x in x_seq]
+	lo = max(0, min(bisect_right(seconds, start) - 1, len(x_seq) - 1))
+	hi = max(lo, min(bisect_left(seconds, end), len(x_seq) - 1))
+	return x_seq[lo], x_seq[hi]
+
+
+def _x_to_seconds(x):
+	"""HH:MM:SS / MM:SS / 数字 -> 秒数"""
+	if isinstance(x, (int, float)):
+		return x
+	seconds = 0
+	for part in str(x).split(":"):
+		seconds = seconds * 60 + float(part)
+	return seconds
+
+
+# 报告显示两位小数，float32 的误差需小于其十分之一 The report shows 2 decimals, float32 must stay within a tenth of that
+F32_TOLERANCE = 0.0005
+
+
+def value_typecode(values):
+	"""
+	float32 往返后误差都不超过 F32_TOLERANCE 时返回 "f"，否则返回 "d"（NaN 视为相等）
+
+	"f" when every value survives a float32 round trip within F32_TOLERANCE,
+	"d" otherwise (NaN compares equal).
+	"""
+	for original, rounded in zip(values, array("f", values)):
+		if abs(original - rounded) > F32_TOLERANCE:
+			return "d"
+	return "f"
+
+
+def _pack(values, typecode):
+	"""打包为小端 typed array 并 deflate 压缩后 base64 Pack as a little-endian typed array, deflate and base64"""
+	arr = array(typecode, values)
+	if sys.byteorder == "big":
+		arr.byteswap()
+	return base64.b64encode(zlib.compress(arr.tobytes(), 9)).decode("ascii")
+
+
+class CompactDataVisualizer:
+	"""
+	紧凑报告：每条序列只以压缩后的 typed array 保存一次，
+	时间轴相同的图表共享同一份时间轴数据，在浏览器中解压解码。
+	接口与 DataVisualizer 相同。
+
+	Compact report. Each series is stored once as a deflate-compressed typed
+	array, charts with the same time axis share one axis payload, and the
+	browser decodes them on load. Same interface as DataVisualizer.
+
+	large=True 为大数据量模式：数值时间轴 + 每个图表共享一个 dataset，
+	开启渐进/分块渲染与 LTTB 客户端采样，适合百万级数据点的序列。
+	两种模式下图表都只在滚动到可见区域附近时才解码并初始化。
+
+	large=True is the large-dataset mode: a numeric time axis with one shared
+	dataset per chart, progressive chunked rendering and client-side LTTB
+	sampling for multi-million-point series. In both modes a chart is only
+	decoded and initialised when it scrolls near the viewport.
+	"""
+
+	ECHARTS_JS = "https://assets.pyecharts.org/assets/v5/echarts.min.js"
+
+	def __init__(
+		self,
+		html_path="data_visualizer.html",
+		snapshot_path="data_visualizer.png",
+		large=False,
+	):
+		self.html_path = html_path
+		self.snapshot_path = snapshot_path
+		self.large = large
+		self.page_title = "XCTraceParser"
+		# payload id -> {"type": "u32"|"f32"|"f64", "data": base64}
+		self._payloads = {}
+		# 时间轴去重 x axis tuple -> payload id
+		self._axis_ids = {}
+		self._charts = []
+
+	def _add_values(self, values):
+		"""
+		数值序列：能在 float32 下保持显示精度时用 f32，否则（如较大的内存值）用 f64
+		A value series: f32 when float32 keeps the displayed precision, f64 otherwise (e.g. large memory values)
+		"""
+		return self._add_payload(values, value_typecode(values))
+
+	def _add_payload(self, values, typecode):
+		payload_id = f"p{len(self._payloads)}"
+		kind = {"I": "u32", "f": "f32", "d": "f64"}[typecode]
+		self._payloads[payload_id] = {"type": kind, "data": _pack(values, typecode)}
+		return payload_id
+
+	def _add_axis(self, x_seq):
+		seconds = tuple(_x_to_seconds(x) for x in x_seq)
+		axis_id = self._axis_ids.get(seconds)
+		if axis_id is None:
+			integral = all(float(v).is_integer() and 0 <= v < 2 ** 32 for v in seconds)
+			if integral:
+				axis_id = self._add_payload([int(v) for v in seconds], "I")
+			else:
+				axis_id = self._add_payload(seconds, "d")
+			self._axis_ids[seconds] = axis_id
+		return axis_id
+
+	def add_parsed_data(
+		self,
+		parsed_data: ParsedData,
+		width="1300px",
+		height="500px",
+		page_title=None,
+		mark_areas=None,
+	):
+		if page_title:
+			self.page_title = page_title
+		self._charts.append({
+			"title": parsed_data.title,
+			"width": width,
+			"height": height,
+			"x": self._add_axis(parsed_data.x_seq),
+			"series": [{"name": parsed_data.y_label, "y": self._add_values(parsed_data.y_seq)}],
+			"marks": [[start, end, name] for start, end, name in mark_areas or ()],
+		})
+
+	def add_multi_line_parsed_data(
+		self,
+		parsed_data: FMParsedData,
+		width="1500px",
+		height="500px",
+		page_title=None,
+	):
+		if page_title:
+			self.page_title = page_title
+		x_len = len(parsed_data.x_seq)
+		series = []
+		for name in parsed_data.file_names:
+			y_seq = list(parsed_data.y_seq[name])
+			# 较短的序列补 NaN 对齐共享时间轴 Pad shorter series with NaN to the shared axis
+			y_seq += [float("nan")] * (x_len - len(y_seq))
+			series.append({"name": name, "y": self._add_values(y_seq)})
+		self._charts.append({
+			"title": parsed_data.title,
+			"width": width,
+			"height": height,
+			"x": self._add_axis(parsed_data.x_seq),
+			"series": series,
+		})
+
+	def render_embed(self):
+		charts = "\n".join(
+			f'<div id="chart{i}" style="width:{c["width"]};height:{c["height"]};margin:0 auto;"></div>'
+			for i, c in enumerate(self._charts)
+		)
+		return _COMPACT_TEMPLATE % {
+			"page_title": html.escape(self.page_title),
+			"echarts_js": self.ECHARTS_JS,
+			"charts": charts,
+			"large": "true" if self.large else "false",
+			"mark_color": MARK_AREA_COLOR,
+			"payloads": json.dumps(self._payloads, separators=(",", ":")),
+			"specs": json.dumps(self._charts, separators=(",", ":")),
+		}
+
+	def render_html(self):
+		with open(self.html_path, "w", encoding="utf-8") as f:
+			f.write(self.render_embed())
+
+	def make_snapshot(self):
+		print("make_snapshot 不支持紧凑报告 not supported for compact reports")
+		return False
+
+
+_COMPACT_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>%(page_title)s</title>
+<script type="text/javascript" src="%(echarts_js)s"></script>
+</head>
+<body>
+%(charts)s
+<script type="application/json" id="payloads">%(payloads)s</script>
+<script type="application/json" id="specs">%(specs)s</script>
+<script>
+(function () {
+	var large = %(large)s;
+	var payloads = JSON.parse(document.getElementById("payloads").textContent);
+	var specs = JSON.parse(document.getElementById("specs").textContent);
+	var types = {u32: Uint32Array, f32: Float32Array, f64: Float64Array};
+	var decoded = {};
+
+	function decode(id) {
+		if (!decoded[id]) {
+			var p = payloads[id];
+			var bin = atob(p.data);
+			var bytes = new Uint8Array(bin.length);
+			for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+			var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("deflate"));
+			decoded[id] = new Response(stream).arrayBuffer().then(function (buf) {
+				return new types[p.type](buf);
+			});
+		}
+		return decoded[id];
+	}
+
+	function hms(s) {
+		var h = Math.floor(s / 3600), m = Math.floor(s %% 3600 / 60), sec = Math.floor(s %% 60);
+		return [h, m, sec].map(function (v) { return v < 10 ? "0" + v : "" + v; }).join(":");
+	}
+
+	function round2(v) {
+		return v == null || isNaN(v) ? "-" : Math.round(v * 100) / 100;
+	}
+
+	function toValues(arr) {
+		return Array.from(arr, function (v) { return isNaN(v) ? null : v; });
+	}
+
+	function categoryOption(spec, arrays) {
+		return {
+			xAxis: {type: "category", data: Array.prototype.map.call(arrays[0], hms)},
+			series: spec.series.map(function (s, k) {
+				return {name: s.name, type: "line", showSymbol: false, data: toValues(arrays[k + 1])};
+			})
+		};
+	}
+
+	function largeOption(spec, arrays) {
+		// 每个图表一个共享的列式 dataset One shared column dataset per chart
+		var source = {x: Array.from(arrays[0])};
+		spec.series.forEach(function (s, k) { source["s" + k] = toValues(arrays[k + 1]); });
+		return {
+			animation: false,
+			dataset: {source: source},
+			xAxis: {type: "value", min: "dataMin", max: "dataMax", axisLabel: {formatter: hms}},
+			series: spec.series.map(function (s, k) {
+				return {
+					name: s.name,
+					type: "line",
+					showSymbol: false,
+					encode: {x: "x", y: "s" + k},
+					sampling: "lttb",
+					progressive: 20000,
+					progressiveThreshold: 50000,
+					progressiveChunkMode: "mod"
+				};
+			})
+		};
+	}
+
+	// 数值轴直接使用秒数，类目轴取覆盖该时刻的标签
+	// Numeric axes take seconds directly, category axes the label covering that moment
+	function markX(axis, s, upper) {
+		if (large) return s;
+		var lo = 0, hi = axis.length - 1;
+		while (lo < hi) {
+			var mid = (lo + hi + (upper ? 0 : 1)) >> 1;
+			if (upper ? axis[mid] < s : axis[mid] > s) {
+				if (upper) lo = mid + 1; else hi = mid - 1;
+			} else {
+				if (upper) hi = mid; else lo = mid;
+			}
+		}
+		return hms(axis[lo]);
+	}
+
+	function build(i) {
+		var spec = specs[i];
+		var ids = [spec.x].concat(spec.series.map(function (s) { return s.y; }));
+		Promise.all(ids.map(decode)).then(function (arrays) {
+			var chart = echarts.init(document.getElementById("chart" + i), "light");
+			var option = large ? largeOption(spec, arrays) : categoryOption(spec, arrays);
+			option.title = {text: spec.title};
+			option.tooltip = {trigger: "axis", valueFormatter: round2};
+			option.legend = {data: spec.series.map(function (s) { return s.name; })};
+			option.toolbox = {show: true, orient: "horizontal", feature: {saveAsImage: {}, restore: {}, dataView: {}, dataZoom: {}}};
+			option.dataZoom = [{type: "slider", start: 0, end: 100}, {type: "inside"}];
+			option.yAxis = {type: "value"};
+			if (spec.marks && spec.marks.length) {
+				option.series[0].markArea = {
+					silent: true,
+					itemStyle: {color: "%(mark_color)s"},
+					data: spec.marks.map(function (m) {
+						return [{name: m[2], xAxis: markX(arrays[0], m[0], false)}, {xAxis: markX(arrays[0], m[1], true)}];
+					})
+				};
+			}
+			chart.setOption(option);
+		});
+	}
+
+	// 只在图表接近可见区域时才解码并初始化 Build a chart only when it gets near the viewport
+	if (typeof IntersectionObserver === "undefined") {
+		specs.forEach(function (spec, i) { build(i); });
+		return;
+	}
+	var observer = new IntersectionObserver(function (entries) {
+		entries.forEach(function (entry) {
+			if (!entry.isIntersecting) return;
+			observer.unobserve(entry.target);
+			build(Number(entry.target.id.slice("chart".length)));
+		});
+	}, {rootMargin: "300px 0px"});
+	specs.forEach(function (spec, i) { observer.observe(document.getElementById("chart" + i)); });
+})();
+</script>
+</body>
+</html>
+"""
+
+
 if __name__ == "__main__":
 	main()
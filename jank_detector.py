@@ -0,0 +1,218 @@
+import os
+import json
+import heapq
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+from xctrace_parser import fmt_to_seconds
+
+# severity 为估算的掉帧数 (target_fps - mean_fps) * duration
+# severity is the estimated number of dropped frames, (target_fps - mean_fps) * duration
+JankInterval = namedtuple(
+    "JankInterval",
+    ["trace_id", "start", "end", "duration", "min_fps", "mean_fps", "mean_gpu", "severity", "level"],
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FPS 卡顿区间检测 Detect FPS jank intervals")
+    parser.add_argument(
+        "path",
+        type=str,
+        help="xctrace_parser.py save() 的输出目录 (e.g. ./temp/save)",
+    )
+    parser.add_argument(
+        "-top",
+        type=int,
+        default=20,
+        help="print the N worst jank intervals across all traces",
+    )
+    parser.add_argument(
+        "-enter_fps",
+        type=float,
+        default=45.0,
+        help="a jank starts when the rolling mean fps drops below this",
+    )
+    parser.add_argument(
+        "-exit_fps",
+        type=float,
+        default=55.0,
+        help="a jank ends when the rolling mean fps rises above this",
+    )
+    parser.add_argument(
+        "-window",
+        type=int,
+        default=3,
+        help="rolling mean window in samples",
+    )
+    args = parser.parse_args()
+
+    intervals = scan_json_dir(
+        args.path, window=args.window, enter_fps=args.enter_fps, exit_fps=args.exit_fps
+    )
+    print(f"{'trace':<28}{'start(s)':>10}{'end(s)':>10}{'dur(s)':>8}{'min fps':>9}{'mean fps':>10}{'severity':>10}  level")
+    for item in worst_jank_intervals(intervals, args.top):
+        print(
+            f"{item.trace_id:<28}{item.start:>10.2f}{item.end:>10.2f}{item.duration:>8.2f}"
+            f"{item.min_fps:>9.1f}{item.mean_fps:>10.1f}{item.severity:>10.1f}  {item.level}"
+        )
+
+
+def rolling_mean(values, window):
+    """
+    基于 cumsum 的尾随滑动平均，前 window-1 个点使用已有的样本
+
+    Trailing rolling mean through cumsum. The first window-1 points average
+    over the samples available so far.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if window <= 1 or len(values) == 0:
+        return values
+    csum = np.cumsum(values)
+    result = np.empty_like(values)
+    head = min(window, len(values))
+    result[:head] = csum[:head] / np.arange(1, head + 1)
+    result[window:] = (csum[window:] - csum[:-window]) / window
+    return result
+
+
+def hysteresis(values, enter, exit):
+    """
+    向量化的迟滞判断：低于 enter 进入卡顿，高于 exit 才退出
+
+    Vectorized hysteresis. A sample below `enter` starts a jank, which lasts
+    until a sample rises above `exit`. Returns a bool mask.
+    """
+    values = np.asarray(values)
+    event = np.zeros(len(values), dtype=np.int8)
+    event[values < enter] = 1
+    event[values > exit] = -1
+    # 每个点之前最近一次事件的下标 Index of the latest event up to each point
+    idx = np.where(event != 0, np.arange(len(values)), -1)
+    last = np.maximum.accumulate(idx) if len(idx) else idx
+    return (last >= 0) & (event[np.maximum(last, 0)] == 1)
+
+
+def detect_jank(
+    ts,
+    fps,
+    gpu=None,
+    trace_id="",
+    window=3,
+    enter_fps=45.0,
+    exit_fps=55.0,
+    min_duration=0.5,
+    target_fps=60.0,
+):
+    """
+    在按时间升序的列式 FPS 序列上检测卡顿区间
+
+    Detect jank intervals on a columnar FPS series sorted by time.
+    :param ts: 秒数 seconds
+    :param gpu: 与 ts 对齐的 GPU 序列（可选） GPU series aligned with ts (optional)
+    :param min_duration: 短于该秒数的区间被忽略 intervals shorter than this are dropped
+    """
+    ts = np.asarray(ts, dtype=np.float64)
+    fps = np.asarray(fps, dtype=np.float64)
+    if len(ts) == 0:
+        return []
+    mask = hysteresis(rolling_mean(fps, window), enter_fps, exit_fps)
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return []
+
+    # 区间结束于退出点（或序列末尾） An interval ends at the exit sample (or the last sample)
+    end_ts = ts[np.minimum(ends, len(ts) - 1)]
+    durations = end_ts - ts[starts]
+    # 区间边界交错排列后用 reduceat 求每段的最小值，偶数段即卡顿区间
+    # Interleave the bounds so reduceat yields per-interval minimums on the even segments
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = starts
+    bounds[1::2] = ends
+    min_fps = np.minimum.reduceat(np.append(fps, np.inf), bounds)[0::2]
+    csum = np.concatenate(([0.0], np.cumsum(fps)))
+    mean_fps = (csum[ends] - csum[starts]) / (ends - starts)
+    mean_gpu = None
+    if gpu is not None and len(gpu) == len(fps):
+        gsum = np.concatenate(([0.0], np.cumsum(np.asarray(gpu, dtype=np.float64))))
+        mean_gpu = (gsum[ends] - gsum[starts]) / (ends - starts)
+    severity = np.maximum(target_fps - mean_fps, 0) * durations
+
+    result = []
+    for k in np.flatnonzero(durations >= min_duration):
+        mean = float(mean_fps[k])
+        result.append(
+            JankInterval(
+                trace_id=trace_id,
+                start=float(ts[starts[k]]),
+                end=float(end_ts[k]),
+                duration=float(durations[k]),
+                min_fps=float(min_fps[k]),
+                mean_fps=mean,
+                mean_gpu=None if mean_gpu is None else float(mean_gpu[k]),
+                severity=float(severity[k]),
+                level="severe" if mean < 20 else "major" if mean < 30 else "minor",
+            )
+        )
+    return result
+
+
+def to_columns(values, field):
+    """
+    save() 格式的数据 -> 按时间升序的 (ts, value) numpy 列
+
+    save() rows -> (ts, value) numpy columns sorted by time.
+    """
+    ts = np.fromiter((fmt_to_seconds(item["time"]) for item in values), np.float64, len(values))
+    data = np.fromiter((item[field] for item in values), np.float64, len(values))
+    if len(ts) > 1 and np.any(ts[1:] < ts[:-1]):
+        order = np.argsort(ts, kind="stable")
+        ts, data = ts[order], data[order]
+    return ts, data
+
+
+def detect_jank_values(fps_values, gpu_values=None, trace_id="", **kwargs):
+    """在 XCTraceParser 的 fps/gpu 数据上检测卡顿 Detect jank on XCTraceParser fps/gpu values"""
+    ts, fps = to_columns(fps_values, "fps")
+    gpu = None
+    if gpu_values:
+        _, gpu = to_columns(gpu_values, "gpu")
+    return detect_jank(ts, fps, gpu, trace_id=trace_id, **kwargs)
+
+
+def worst_jank_intervals(intervals, n=20):
+    """按 severity 取最严重的 n 个区间 The n most severe intervals"""
+    return heapq.nlargest(n, intervals, key=lambda item: item.severity)
+
+
+def scan_json_dir(directory, **kwargs):
+    """
+    扫描 save() 输出目录下所有 {trace_id}_fps.json（以及同名 gpu），逐个产出卡顿区间
+
+    Scan every {trace_id}_fps.json (and the matching gpu file) under a save()
+    directory and yield their jank intervals.
+    """
+    paths = {}
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            trace_id, _, suffix = os.path.splitext(filename)[0].rpartition("_")
+            if filename.endswith(".json") and suffix in ("fps", "gpu"):
+                paths.setdefault(trace_id, {})[suffix] = os.path.join(root, filename)
+    for trace_id in sorted(paths):
+        if "fps" not in paths[trace_id]:
+            continue
+        with open(paths[trace_id]["fps"], "r") as f:
+            fps_values = json.load(f)
+        gpu_values = None
+        if "gpu" in paths[trace_id]:
+            with open(paths[trace_id]["gpu"], "r") as f:
+                gpu_values = json.load(f)
+        yield from detect_jank_values(fps_values, gpu_values, trace_id=trace_id, **kwargs)
+
+
+if __name__ == "__main__":
+    main()
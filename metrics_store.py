@@ -0,0 +1,244 @@
+import os
+import sqlite3
+import argparse
+import json
+import time
+from itertools import islice
+
+from xctrace_parser import fmt_to_seconds, seconds_to_hms
+
+# (指标名, save() 输出文件后缀, 数值字段)
+# (metric, suffix of the files written by save(), value field)
+METRIC_FIELDS = [
+    ("fps", "fps", "fps"),
+    ("gpu", "gpu", "gpu"),
+    ("cpu", "cpu", "cpu"),
+    ("mem", "mem", "memory"),
+    ("resident", "mem", "resident_size"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS traces (
+    trace TEXT PRIMARY KEY,
+    process TEXT NOT NULL,
+    source TEXT,
+    created_at REAL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    trace TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    process TEXT NOT NULL,
+    ts REAL NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS idx_samples_trace_metric_process_ts
+    ON samples (trace, metric, process, ts);
+CREATE TABLE IF NOT EXISTS summaries (
+    trace TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    process TEXT NOT NULL,
+    count INTEGER,
+    min REAL,
+    max REAL,
+    avg REAL,
+    start_ts REAL,
+    end_ts REAL,
+    PRIMARY KEY (trace, metric, process)
+);
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将解析结果 Json 导入 SQLite Ingest parsed json into SQLite")
+    parser.add_argument(
+        "-db_path",
+        required=True,
+        help="SQLite database path",
+    )
+    parser.add_argument(
+        "-ingest",
+        required=True,
+        help="directory of json files written by xctrace_parser.py save()",
+    )
+    parser.add_argument(
+        "-target_process_name",
+        default="",
+        help="process name the json files were parsed for",
+    )
+    args = parser.parse_args()
+
+    store = MetricsStore(args.db_path)
+    traces = store.ingest_json_dir(args.ingest, process=args.target_process_name)
+    store.close()
+    print(f"导入完成 Ingested {len(traces)} traces into {args.db_path}")
+
+
+class MetricsStore:
+    """
+    基于 SQLite 的指标库，samples 表按 (trace, metric, process, ts) 建索引，
+    一个 trace 的替换（删除旧数据与分批写入）在同一个事务中完成
+
+    SQLite backed metrics store. Samples are indexed on
+    (trace, metric, process, ts), and replacing one trace (the delete and all
+    insert batches) runs in a single transaction.
+    """
+
+    def __init__(self, db_path, batch_size=50000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def ingest(self, trace, series, process="", source=None):
+        """
+        写入一个 trace 的全部数据，已存在的同名 trace 会被替换
+
+        Write every series of one trace, replacing a trace of the same name.
+        All of it runs in one transaction, so readers never see a half-written
+        trace and a failure leaves the previous data in place.
+        :param series: {suffix: values}，suffix 为 fps/gpu/cpu/mem，values 为 save() 的数据格式
+        """
+        with self._conn:
+            self._conn.execute("DELETE FROM samples WHERE trace = ?", (trace,))
+            self._conn.execute("DELETE FROM summaries WHERE trace = ?", (trace,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO traces VALUES (?, ?, ?, ?)",
+                (trace, process, source, time.time()),
+            )
+
+            for metric, suffix, field in METRIC_FIELDS:
+                values = series.get(suffix)
+                if not values:
+                    continue
+                rows = (
+                    (trace, metric, process, fmt_to_seconds(item["time"]), item[field])
+                    for item in values
+                    if field in item
+                )
+                self._insert_rows(rows)
+                self._write_summary(trace, metric, process)
+
+    def ingest_parser(self, parser):
+        """导入 XCTraceParser 的解析结果 Ingest the result of an XCTraceParser"""
+        self.ingest(
+            parser.trace_id,
+            {
+                "fps": parser.fps_values,
+                "gpu": parser.gpu_values,
+                "cpu": parser.cpu_values,
+                "mem": parser.mem_values,
+            },
+            process=parser.target_process_name,
+            source=parser.trace_path,
+        )
+
+    def ingest_json_dir(self, directory, process=""):
+        """
+        导入 save() 输出目录下的 {trace_id}_{suffix}.json 文件，返回导入的 trace 列表
+
+        Ingest the {trace_id}_{suffix}.json files under a save() directory.
+        """
+        grouped = {}
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if not filename.lower().endswith(".json"):
+                    continue
+                name = os.path.splitext(filename)[0]
+                trace, _, suffix = name.rpartition("_")
+                if suffix not in ("fps", "gpu", "cpu", "mem"):
+                    continue
+                grouped.setdefault(trace, {})[suffix] = os.path.join(root, filename)
+
+        for trace, paths in grouped.items():
+            series = {}
+            for suffix, path in paths.items():
+                with open(path, "r") as f:
+                    series[suffix] = json.load(f)
+            self.ingest(trace, series, process=process, source=directory)
+        return list(grouped)
+
+    def _insert_rows(self, rows):
+        # 分批写入以限制内存，由调用方的事务统一提交 Insert in batches to bound memory, committed by the caller's transaction
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self._conn.executemany(
+                "INSERT INTO samples VALUES (?, ?, ?, ?, ?)", batch
+            )
+
+    def _write_summary(self, trace, metric, process):
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO summaries
+            SELECT trace, metric, process, COUNT(value), MIN(value), MAX(value),
+                   AVG(value), MIN(ts), MAX(ts)
+            FROM samples WHERE trace = ? AND metric = ? AND process = ?
+            """,
+            (trace, metric, process),
+        )
+
+    def traces(self):
+        return [row[0] for row in self._conn.execute("SELECT trace FROM traces ORDER BY trace")]
+
+    def summaries(self, traces=None):
+        sql = "SELECT trace, metric, process, count, min, max, avg, start_ts, end_ts FROM summaries"
+        params = []
+        if traces:
+            sql += f" WHERE trace IN ({','.join('?' * len(traces))})"
+            params.extend(traces)
+        sql += " ORDER BY trace, metric"
+        keys = ("trace", "metric", "process", "count", "min", "max", "avg", "start_ts", "end_ts")
+        return [dict(zip(keys, row)) for row in self._conn.execute(sql, params)]
+
+    def query(self, metric, traces=None, process=None, start=None, end=None):
+        """
+        按索引查询某指标的时间窗口数据，返回 {trace: [(ts, value), ...]}（按 ts 升序）
+
+        Query one metric through the index, return {trace: [(ts, value), ...]}
+        sorted by ts.
+        :param start: 起始秒数（含） start seconds, inclusive
+        :param end: 结束秒数（含） end seconds, inclusive
+        """
+        if traces is None:
+            traces = self.traces()
+        result = {}
+        for trace in traces:
+            sql = "SELECT ts, value FROM samples WHERE trace = ? AND metric = ?"
+            params = [trace, metric]
+            if process is not None:
+                sql += " AND process = ?"
+                params.append(process)
+            if start is not None:
+                sql += " AND ts >= ?"
+                params.append(start)
+            if end is not None:
+                sql += " AND ts <= ?"
+                params.append(end)
+            sql += " ORDER BY ts"
+            rows = self._conn.execute(sql, params).fetchall()
+            if rows:
+                result[trace] = rows
+        return result
+
+    def query_values(self, suffix, traces=None, process=None, start=None, end=None):
+        """
+        以 save() 的数据格式返回查询结果 {trace: [{"time": "HH:MM:SS", field: value}]}
+
+        Same as `query` but in the save() row format, so that the result can be
+        fed to XCTraceVisualizer directly.
+        """
+        metric, _, field = next(m for m in METRIC_FIELDS if m[1] == suffix)
+        result = {}
+        for trace, rows in self.query(metric, traces, process, start, end).items():
+            result[trace] = [{"time": seconds_to_hms(ts), field: value} for ts, value in rows]
+        return result
+
+
+if __name__ == "__main__":
+    main()
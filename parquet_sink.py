@@ -0,0 +1,280 @@
+import os
+import json
+import shutil
+import argparse
+import tempfile
+from urllib.parse import quote
+
+import numpy as np
+
+from metrics_store import METRIC_FIELDS
+from asof_join import to_ns_columns
+
+# 输出格式 -> (pyarrow.dataset 的格式名, 扩展名) output format -> (pyarrow.dataset format, extension)
+FORMATS = {
+    "parquet": ("parquet", "parquet"),
+    "arrow": ("ipc", "arrow"),
+}
+
+# Hive 分区目录 trace=.../process=.../metric=... Hive partition directories
+PARTITION_COLUMNS = ("trace", "process", "metric")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出为分区的 Parquet / Arrow IPC Export partitioned Parquet / Arrow IPC")
+    parser.add_argument(
+        "-output",
+        required=True,
+        help="root directory of the partitioned dataset",
+    )
+    parser.add_argument(
+        "-ingest",
+        required=True,
+        help="directory of json files written by xctrace_parser.py save()",
+    )
+    parser.add_argument(
+        "-target_process_name",
+        default="",
+        help="process name the json files were parsed for (when there is no summary sidecar)",
+    )
+    parser.add_argument(
+        "-format",
+        choices=list(FORMATS),
+        default="parquet",
+        help="parquet files or Arrow IPC (feather v2) files",
+    )
+    parser.add_argument(
+        "-row_group_rows",
+        type=int,
+        default=64 * 1024,
+        help="rows per row group (record batch for arrow), smaller groups prune time ranges more finely",
+    )
+    args = parser.parse_args()
+
+    sink = ArrowSink(args.output, fmt=args.format, row_group_rows=args.row_group_rows)
+    traces = sink.write_json_dir(args.ingest, process=args.target_process_name)
+    print(f"导出完成 Exported {len(traces)} traces into {args.output}")
+
+
+def require_pyarrow():
+    """导入 pyarrow，未安装时给出安装提示 Import pyarrow, with an install hint when it is missing"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError as e:
+        raise ImportError(
+            "Parquet/Arrow 导出需要 pyarrow，请先执行 pip install pyarrow  "
+            "The Parquet/Arrow export requires pyarrow: pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+def arrow_schema():
+    """
+    稳定的长表结构，每行为一个指标的一个样本
+
+    The stable long-format schema, one sample of one metric per row.
+    """
+    pa = require_pyarrow()
+    return pa.schema([
+        ("trace", pa.string()),
+        ("run", pa.int32()),
+        ("process", pa.string()),
+        ("pid", pa.int32()),
+        ("metric", pa.string()),
+        ("ts_ns", pa.int64()),
+        ("value", pa.float64()),
+    ])
+
+
+def partitioning():
+    """trace/process/metric 的 Hive 分区 Hive partitioning on trace/process/metric"""
+    pa = require_pyarrow()
+    schema = arrow_schema()
+    return pa.dataset.partitioning(
+        pa.schema([schema.field(name) for name in PARTITION_COLUMNS]), flavor="hive"
+    )
+
+
+def open_dataset(root_dir, fmt="parquet"):
+    """
+    以稳定的结构打开导出的数据集，可直接交给 DuckDB / Polars / pandas
+
+    Open an exported dataset with the stable schema, ready for DuckDB, Polars
+    or pandas.
+
+        dataset = open_dataset("./temp/arrow")
+        dataset.to_table(filter=(ds.field("metric") == "fps") & (ds.field("ts_ns") < 10**10))
+    """
+    pa = require_pyarrow()
+    return pa.dataset.dataset(
+        root_dir, schema=arrow_schema(), format=FORMATS[fmt][0], partitioning=partitioning()
+    )
+
+
+class ArrowSink:
+    """
+    把解析结果写为按 trace=/process=/metric= 分区的 Parquet 或 Arrow IPC 数据集。
+    每个分区内按 ts_ns 升序写入，并按 row_group_rows 切分 row group，
+    row group 的 ts_ns 最小/最大值统计使时间范围查询可以跳过无关的 row group；
+    分区目录则让分析引擎按 trace/进程/指标做谓词下推。
+
+    Write parsed series as a Parquet or Arrow IPC dataset partitioned by
+    trace=/process=/metric=. Each partition is written in ascending ts_ns
+    order and cut into row groups of row_group_rows, so the ts_ns min/max
+    statistics of a row group let time-range queries skip it, while the
+    partition directories give engines predicate pushdown on trace, process
+    and metric.
+    """
+
+    def __init__(self, root_dir, fmt="parquet", row_group_rows=64 * 1024, compression="zstd"):
+        if fmt not in FORMATS:
+            raise ValueError(f"不支持的格式 unsupported format: {fmt}")
+        require_pyarrow()
+        self.root_dir = root_dir
+        self.fmt = fmt
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+
+    def write(self, trace, series, process="", pid=None, run=1):
+        """
+        写入一个 trace 的全部数据。先写到 root_dir 下的隐藏临时目录，成功后整体替换
+        该 trace 的 trace=<id>/ 目录：写入失败时旧分区保持不变，进程名改变时旧的
+        process= 分区也不会残留
+
+        Write every series of one trace. The data is written to a hidden staging
+        directory under root_dir first and then swapped in for the whole
+        trace=<id>/ directory, so a failed write keeps the old partitions and
+        partitions of a previous process= do not linger.
+        :param series: {suffix: values}，suffix 为 fps/gpu/cpu/mem，values 为 save() 的数据格式
+        :return: 写入的行数 rows written
+        """
+        pa = require_pyarrow()
+        tables = []
+        for metric, suffix, field in METRIC_FIELDS:
+            values = [item for item in series.get(suffix) or () if field in item]
+            if not values:
+                continue
+            ts, columns = to_ns_columns(values, [field])
+            tables.append(self._metric_table(pa, trace, run, process, pid, metric, ts, columns[field]))
+        if not tables:
+            return 0
+        table = pa.concat_tables(tables)
+        dataset_format, extension = FORMATS[self.fmt]
+        os.makedirs(self.root_dir, exist_ok=True)
+        # 以 "." 开头的目录不会被数据集发现 Directories starting with "." are ignored by dataset discovery
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.root_dir)
+        try:
+            pa.dataset.write_dataset(
+                table,
+                staging,
+                format=dataset_format,
+                partitioning=partitioning(),
+                basename_template=f"run{run}-{{i}}.{extension}",
+                existing_data_behavior="overwrite_or_ignore",
+                file_options=self._file_options(pa, dataset_format),
+                min_rows_per_group=self.row_group_rows,
+                max_rows_per_group=self.row_group_rows,
+            )
+            self._swap(os.path.join(staging, os.path.basename(self._trace_dir(trace))), self._trace_dir(trace), staging)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return table.num_rows
+
+    @staticmethod
+    def _swap(written, trace_dir, staging):
+        """用新写入的目录替换 trace_dir，失败时恢复旧目录 Replace trace_dir, restoring the old one on failure"""
+        previous = os.path.join(staging, "previous")
+        if os.path.exists(trace_dir):
+            os.rename(trace_dir, previous)
+        try:
+            os.rename(written, trace_dir)
+        except OSError:
+            if os.path.exists(previous):
+                os.rename(previous, trace_dir)
+            raise
+
+    def write_parser(self, parser):
+        """写入 XCTraceParser 的解析结果 Write the result of an XCTraceParser"""
+        return self.write(
+            parser.trace_id,
+            {
+                "fps": parser.fps_values,
+                "gpu": parser.gpu_values,
+                "cpu": parser.cpu_values,
+                "mem": parser.mem_values,
+            },
+            process=parser.target_process_name,
+            pid=parser.target_pid,
+            run=parser._read_toc_info().get("run", 1),
+        )
+
+    def write_json_dir(self, directory, process=""):
+        """
+        写入 save() 输出目录下的 {trace_id}_{suffix}.json 文件，进程名、pid 与 run
+        优先取自 summary sidecar，返回写入的 trace 列表
+
+        Write the {trace_id}_{suffix}.json files under a save() directory. The
+        process, pid and run come from the summary sidecar when there is one.
+        """
+        grouped = {}
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if not filename.lower().endswith(".json"):
+                    continue
+                name = os.path.splitext(filename)[0]
+                trace, _, suffix = name.rpartition("_")
+                if suffix not in ("fps", "gpu", "cpu", "mem"):
+                    continue
+                grouped.setdefault(trace, {})[suffix] = os.path.join(root, filename)
+
+        for trace, paths in grouped.items():
+            series = {}
+            for suffix, path in paths.items():
+                with open(path, "r") as f:
+                    series[suffix] = json.load(f)
+            summary = {}
+            summary_path = os.path.join(directory, "summary", f"{trace}_summary.json")
+            if os.path.isfile(summary_path):
+                with open(summary_path, "r") as f:
+                    summary = json.load(f)
+            self.write(
+                trace,
+                series,
+                process=summary.get("process") or process,
+                pid=summary.get("pid"),
+                run=summary.get("run", 1),
+            )
+        return list(grouped)
+
+    def _trace_dir(self, trace):
+        # Hive 分区目录名中的值按 URI 编码 Partition values are URI-encoded in hive directory names
+        return os.path.join(self.root_dir, f"trace={quote(trace, safe='')}")
+
+    def _metric_table(self, pa, trace, run, process, pid, metric, ts, values):
+        n = len(ts)
+        # 常量列用 take 广播，避免逐行构造 Python 对象 Broadcast the constant columns with take
+        zeros = pa.array(np.zeros(n, dtype=np.int32))
+        return pa.table(
+            [
+                pa.array([trace], pa.string()).take(zeros),
+                pa.array([run], pa.int32()).take(zeros),
+                pa.array([process], pa.string()).take(zeros),
+                pa.array([pid], pa.int32()).take(zeros),
+                pa.array([metric], pa.string()).take(zeros),
+                pa.array(ts, pa.int64()),
+                pa.array(values, pa.float64()),
+            ],
+            schema=arrow_schema(),
+        )
+
+    def _file_options(self, pa, dataset_format):
+        if dataset_format == "parquet":
+            return pa.dataset.ParquetFileFormat().make_write_options(
+                compression=self.compression, write_statistics=True
+            )
+        return pa.dataset.IpcFileFormat().make_write_options(compression=self.compression)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import os
+import json
+import xml.etree.ElementTree as ET
+
+from xctrace_parser import XCTraceParser, CompactElement, OrderTracker, RefCache
+
+ROW_END = b"</row>"
+
+# 断点与 id 日志的格式版本，不一致时重新开始 Format version of the checkpoint and id journal, a mismatch starts over
+CHECKPOINT_VERSION = 2
+
+
+class RowReader:
+    """
+    以 XMLPullParser 逐块解析导出的 XML，只在 </row> 边界喂给解析器，
+    offset 为最近一个产出的 row 结束处的字节偏移。从断点恢复时先喂入文件头
+    （第一个 <row 之前的部分，包含根节点与 schema），再从 offset 继续。
+
+    Parse an exported XML with XMLPullParser, feeding it only at </row>
+    boundaries. offset is the byte offset right after the last yielded row.
+    To resume, the file header (everything before the first <row, holding the
+    root elements and the schema) is fed first, then parsing continues at offset.
+    """
+
+    def __init__(self, xml_path, offset=0, header_end=None, block_size=1 << 16):
+        self.xml_path = xml_path
+        self.offset = offset
+        self.header_end = header_end
+        self.block_size = block_size
+
+    def __iter__(self):
+        parser = ET.XMLPullParser(events=("start", "end"))
+        parent = None
+        with open(self.xml_path, "rb") as f:
+            pos = 0
+            if self.offset:
+                parser.feed(f.read(self.header_end))
+                f.seek(self.offset)
+                pos = self.offset
+            buf = b""
+            while True:
+                data = f.read(self.block_size)
+                buf += data
+                if self.header_end is None:
+                    i = buf.find(b"<row")
+                    if i >= 0:
+                        self.header_end = pos + i
+                cut = buf.rfind(ROW_END) + len(ROW_END) if data else len(buf)
+                if cut < len(ROW_END):
+                    cut = 0
+                if cut:
+                    # 本次喂入的每个 </row> 的结束偏移，与 row 的 end 事件一一对应
+                    # End offset of every </row> fed this time, one per row end event
+                    ends = []
+                    i = buf.find(ROW_END, 0, cut)
+                    while i >= 0:
+                        ends.append(pos + i + len(ROW_END))
+                        i = buf.find(ROW_END, i + len(ROW_END), cut)
+                    parser.feed(buf[:cut])
+                    k = 0
+                    for event, elem in parser.read_events():
+                        if event == "start":
+                            if elem.tag == "node":
+                                parent = elem
+                        elif elem.tag == "row":
+                            if k < len(ends):
+                                self.offset = ends[k]
+                            k += 1
+                            yield elem
+                            elem.clear()
+                            if parent is not None:
+                                parent.remove(elem)
+                    pos += cut
+                    buf = buf[cut:]
+                if not data:
+                    break
+
+
+class JournaledRefCache(RefCache):
+    """
+    新增的 id 在写入缓存时同时追加到日志文件（每个 id 一行），断点只需记录日志长度；
+    从磁盘读回的 id 不会重复记录。内存占用与 RefCache 一样有上限。
+
+    RefCache that also appends every new id to a journal file, one line per
+    id, so a checkpoint only records the journal length. Ids read back from
+    the spill database are not journaled again. Memory stays bounded like
+    RefCache.
+    """
+
+    def __init__(self, journal=None, max_entries=65536):
+        super().__init__(max_entries)
+        self.journal = journal
+
+    def __setitem__(self, key, value):
+        # 同一行内重复写入的 id 只记录一次 An id written twice within a row is journaled once
+        if self.journal is not None and key not in self._hot:
+            self.journal.write(json.dumps([key] + _encode_element(value)) + "\n")
+        self._put(key, value)
+
+
+class ResumableParser(XCTraceParser):
+    """
+    带断点的 XCTraceParser。每解析 checkpoint_rows 行输出，记录一次断点：
+    输入 XML 的字节偏移、之后的 ref 需要的 id（逐个追加到日志，断点记录日志长度）、
+    跨行状态（排序与上一个 CPU 值），以及已输出的数据（追加到 part 文件，记录长度）。
+    resume=True 时把 part 与日志截断到断点长度、恢复缓存与状态后从偏移继续，
+    导出已完成的 XML 不会重新导出；结果与不中断的解析完全相同。
+
+    XCTraceParser with checkpoints. Every checkpoint_rows output rows it
+    records the input byte offset, the ids later refs need (appended one by
+    one to a journal whose length is recorded), the cross-row state (order
+    and last cpu) and the rows emitted so far (appended to part files whose
+    lengths are recorded). With resume=True the parts and the journal are
+    truncated to the checkpoint, the cache and state are restored and parsing
+    continues at the offset. A completed export is not run again, and the
+    result is identical to an uninterrupted parse.
+
+        trace_id = ResumableParser.resume_trace_id(trace_path) or make_trace_id(trace_path)
+        parser = ResumableParser(trace_path, log_path, "Steam", trace_id=trace_id, resume=True)
+        parser.parse()
+    """
+
+    # id 缓存在内存中的上限 In-memory limit of the id cache
+    ref_cache_entries = 65536
+
+    def __init__(self, trace_path, log_path, target_process_name, trace_id=None, resume=False, checkpoint_rows=50000):
+        super().__init__(trace_path, log_path, target_process_name, trace_id=trace_id)
+        self.resume = resume
+        self.checkpoint_rows = checkpoint_rows
+        self.checkpoint_path = checkpoint_path(trace_path, self.temp_path)
+        self.checkpoint = self._load_checkpoint()
+        self._reader = None
+
+    @staticmethod
+    def resume_trace_id(trace_path, temp_path="./temp/parse"):
+        """断点文件中记录的 trace_id，没有断点时为 None The trace_id of an existing checkpoint"""
+        path = checkpoint_path(trace_path, temp_path)
+        try:
+            with open(path, "r") as f:
+                return json.load(f).get("trace_id")
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _load_checkpoint(self):
+        fresh = {
+            "version": CHECKPOINT_VERSION,
+            "trace_path": os.path.abspath(self.trace_path),
+            "trace_id": self.trace_id,
+            "target_process_name": self.target_process_name,
+            "stages": {},
+        }
+        if not self.resume or not os.path.isfile(self.checkpoint_path):
+            return fresh
+        with open(self.checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("version") != CHECKPOINT_VERSION or \
+                checkpoint.get("trace_id") != self.trace_id or \
+                checkpoint.get("target_process_name") != self.target_process_name:
+            self.print_log("断点与本次解析不匹配，重新开始 Checkpoint does not match, starting over")
+            return fresh
+        return checkpoint
+
+    def _write_checkpoint(self):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _export_toc(self):
+        toc_path = os.path.join(self.temp_path, f"{self.trace_id}_toc.xml")
+        if self.resume and os.path.isfile(toc_path) and os.path.getsize(toc_path):
+            self.print_log(f"复用已导出的目录结构 Reusing exported toc: {toc_path}")
+            return
+        super()._export_toc()
+
+    def _iter_rows(self, xml_path):
+        if self._reader is not None and self._reader.xml_path == xml_path:
+            return iter(self._reader)
+        return super()._iter_rows(xml_path)
+
+    def _parse_gpu_fps(self):
+        self.fps_values, self.gpu_values = self._parse_stage(
+            "fps", "core-animation-fps-estimate", "core-animation-fps", ("fps", "gpu"), self._iter_gpu_fps
+        )
+
+    def _parse_cpu_mem(self):
+        self.cpu_values, self.mem_values = self._parse_stage(
+            "cpu", "sysmon-process", "sysmon-process", ("cpu", "mem"),
+            lambda xml_path, state: self._iter_cpu_mem(xml_path, state=state),
+        )
+
+    def _parse_stage(self, stage, schema_name, output_suffix, suffixes, iterate):
+        stages = self.checkpoint["stages"]
+        saved = stages.get(stage)
+        xml_path = os.path.join(self.temp_path, f"{self.trace_id}_{output_suffix}.xml")
+        if saved and os.path.isfile(xml_path) and os.path.getsize(xml_path) == saved["xml_size"]:
+            self.print_log(f"从断点继续 Resuming {schema_name} at byte {saved['offset']}: {xml_path}")
+        else:
+            xml_path = self._export_xml(schema_name=schema_name, output_suffix=output_suffix)
+            saved = stages[stage] = {
+                "xml_size": os.path.getsize(xml_path),
+                "offset": 0,
+                "header_end": None,
+                "rows": 0,
+                "refs": 0,
+                "parts": {suffix: 0 for suffix in suffixes},
+                "state": None,
+                "done": False,
+            }
+            self._write_checkpoint()
+
+        part_paths = {suffix: self._part_path(suffix) for suffix in suffixes}
+        refs_path = os.path.join(self.temp_path, f"{self.trace_id}_{stage}.refs.ndjson")
+        values = {suffix: _read_part(part_paths[suffix], saved["parts"][suffix]) for suffix in suffixes}
+        if saved["done"]:
+            for suffix in suffixes:
+                self.time_orders[suffix] = saved["state"]["order_result"]
+            if saved["state"].get("pid") is not None:
+                self.target_pid = saved["state"]["pid"]
+            self.print_log(f"{schema_name} 已在断点中完成 already completed in the checkpoint")
+            return tuple(values[suffix] for suffix in suffixes)
+
+        # 恢复到有上限的缓存，超出部分落盘 Restore into the bounded cache, the rest spills to disk
+        cache = JournaledRefCache(max_entries=self.ref_cache_entries)
+        for key, data in _read_refs(refs_path, saved["refs"]):
+            cache[key] = _decode_element(data)
+        state = {"cache": cache}
+        if saved["state"]:
+            state["order"] = OrderTracker.from_dict(saved["state"]["order"])
+            if "last_cpu" in saved["state"]:
+                state["last_cpu"] = saved["state"]["last_cpu"]
+            if "pid" in saved["state"]:
+                state["pid"] = saved["state"]["pid"]
+
+        with self._stage(f"parse_{schema_name}"):
+            self._reader = RowReader(xml_path, saved["offset"], saved["header_end"])
+            self.print_log(f"解析{schema_name}数据: {xml_path}")
+            parts = {suffix: open(part_paths[suffix], "a") for suffix in suffixes}
+            refs = cache.journal = open(refs_path, "a")
+            # 已写入 part 的行数 Rows already in the parts
+            progress = {"rows": saved["rows"]}
+            try:
+                rows = saved["rows"]
+                lists = [values[suffix] for suffix in suffixes]
+                for items in iterate(xml_path, state=state):
+                    for data, item in zip(lists, items):
+                        data.append(item)
+                    rows += 1
+                    if rows % self.checkpoint_rows == 0:
+                        self._save_stage(saved, progress, values, state, parts, refs)
+                self._save_stage(saved, progress, values, state, parts, refs)
+            finally:
+                for f in parts.values():
+                    f.close()
+                refs.close()
+                cache.close()
+                self._reader = None
+        saved["done"] = True
+        saved["state"]["order_result"] = self.time_orders.get(suffixes[0])
+        self._write_checkpoint()
+        self.print_log(
+            f"获取到 {len(values[suffixes[0]])} 条{suffixes[0].upper()}记录;  "
+            f"{len(values[suffixes[1]])} 条{suffixes[1].upper()}记录"
+        )
+        return tuple(values[suffix] for suffix in suffixes)
+
+    def _save_stage(self, saved, progress, values, state, parts, refs):
+        """
+        先追加上个断点之后的数据（写成一行）并刷新 id 日志，再原子替换断点文件
+        Append the rows added since the last checkpoint (one line) and flush
+        the id journal, then atomically replace the checkpoint file
+        """
+        rows = len(values[next(iter(parts))])
+        for suffix, f in parts.items():
+            f.write(json.dumps(values[suffix][progress["rows"]:]) + "\n")
+            f.flush()
+        progress["rows"] = rows
+        refs.flush()
+        saved["offset"] = self._reader.offset
+        saved["header_end"] = self._reader.header_end
+        saved["rows"] = rows
+        saved["refs"] = refs.tell()
+        saved["parts"] = {suffix: f.tell() for suffix, f in parts.items()}
+        saved["state"] = {"order": state["order"].to_dict()}
+        if "last_cpu" in state:
+            saved["state"]["last_cpu"] = state["last_cpu"]
+        if "pid" in state:
+            saved["state"]["pid"] = state["pid"]
+        self._write_checkpoint()
+
+    def _part_path(self, suffix):
+        return os.path.join(self.temp_path, f"{self.trace_id}_{suffix}.part.ndjson")
+
+
+def checkpoint_path(trace_path, temp_path="./temp/parse"):
+    """以 trace 文件名命名的断点文件 Checkpoint file named after the trace"""
+    name = os.path.splitext(os.path.basename(os.path.normpath(trace_path)))[0]
+    return os.path.join(temp_path, f"{name}.checkpoint.json")
+
+
+def _read_part(path, length):
+    """把 part 文件截断到断点长度并读回 Truncate a part file to the checkpoint length and read it back"""
+    if not os.path.isfile(path):
+        open(path, "w").close()
+    values = []
+    with open(path, "r+") as f:
+        f.truncate(length)
+        for line in f:
+            values.extend(json.loads(line))
+    return values
+
+
+def _read_refs(path, length):
+    """把 id 日志截断到断点长度，逐个产出 (id, [tag, text, fmt]) Truncate the id journal and yield its ids"""
+    if not os.path.isfile(path):
+        open(path, "w").close()
+    with open(path, "r+") as f:
+        f.truncate(length)
+        for line in f:
+            data = json.loads(line)
+            yield data[0], data[1:]
+
+
+def _encode_element(ele):
+    """CompactElement -> [tag, text, fmt]"""
+    return [ele.tag, ele.text, ele.fmt]
+
+
+def _decode_element(data):
+    return CompactElement(*data)
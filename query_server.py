@@ -0,0 +1,350 @@
+import os
+import json
+import argparse
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from xctrace_parser import fmt_to_seconds, seconds_to_hms
+
+# 指标 -> (save() 输出文件后缀, 数值字段)
+# metric -> (suffix of the files written by save(), value field)
+METRICS = {
+    "fps": ("fps", "fps"),
+    "gpu": ("gpu", "gpu"),
+    "cpu": ("cpu", "cpu"),
+    "mem": ("mem", "memory"),
+    "resident": ("mem", "resident_size"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地查询服务 Local query server for parsed traces")
+    parser.add_argument(
+        "path",
+        type=str,
+        help="xctrace_parser.py save() 的输出目录 (e.g. ./temp/save)",
+    )
+    parser.add_argument(
+        "-host",
+        default="127.0.0.1",
+        help="listen host",
+    )
+    parser.add_argument(
+        "-port",
+        type=int,
+        default=8765,
+        help="listen port",
+    )
+    parser.add_argument(
+        "-memory_budget_mb",
+        type=float,
+        default=512,
+        help="memory budget of the parsed trace cache",
+    )
+    args = parser.parse_args()
+
+    cache = TraceCache(
+        TraceDirectory(args.path), memory_budget=int(args.memory_budget_mb * 1024 * 1024)
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(cache))
+    print(f"查询服务已启动 Serving {args.path} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class ColumnarTrace:
+    """
+    单个 trace 的列式数据：每个指标一组按时间升序的 (ts, value) array
+
+    Columnar data of one trace: per metric a pair of ts/value arrays sorted by ts.
+    """
+
+    def __init__(self, trace_id, process=""):
+        self.trace_id = trace_id
+        self.process = process
+        # metric -> (array('d') ts, array('d') values)
+        self.columns = {}
+
+    def add(self, metric, values, field):
+        pairs = [(fmt_to_seconds(item["time"]), item[field]) for item in values if field in item]
+        if any(pairs[i][0] > pairs[i + 1][0] for i in range(len(pairs) - 1)):
+            pairs.sort(key=lambda p: p[0])
+        self.columns[metric] = (
+            array("d", (p[0] for p in pairs)),
+            array("d", (p[1] for p in pairs)),
+        )
+
+    @property
+    def nbytes(self):
+        return sum(
+            ts.itemsize * len(ts) + values.itemsize * len(values)
+            for ts, values in self.columns.values()
+        )
+
+    def window(self, metric, start=None, end=None):
+        """按时间窗口切片 Slice one metric by time window (seconds, inclusive)"""
+        ts, values = self.columns.get(metric, (array("d"), array("d")))
+        lo = 0 if start is None else bisect_left(ts, start)
+        hi = len(ts) if end is None else bisect_right(ts, end)
+        return ts[lo:hi], values[lo:hi]
+
+
+class TraceDirectory:
+    """
+    从 save() 的输出目录按 trace 加载数据
+
+    Load traces from the output directory of save().
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # 上次扫描的 {trace_id: {suffix: path}} 与各目录的 mtime
+        # The last scan {trace_id: {suffix: path}} and the mtime of every directory
+        self._index = None
+        self._mtimes = {}
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        """
+        trace 索引，只在某个目录的 mtime 变化（新增/删除文件或子目录）时重新遍历
+        The trace index. The tree is walked again only when the mtime of one
+        of its directories changes (a file or subdirectory was added or removed).
+        """
+        with self._lock:
+            if self._index is None or self._changed():
+                self._index, self._mtimes = self._walk()
+            return self._index
+
+    def _changed(self):
+        for path, mtime in self._mtimes.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _walk(self):
+        grouped = {}
+        mtimes = {}
+        for root, _, files in os.walk(self.directory):
+            try:
+                mtimes[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            for filename in files:
+                if not filename.lower().endswith(".json"):
+                    continue
+                trace_id, _, suffix = os.path.splitext(filename)[0].rpartition("_")
+                if suffix in ("fps", "gpu", "cpu", "mem"):
+                    grouped.setdefault(trace_id, {})[suffix] = os.path.join(root, filename)
+        if not mtimes:
+            # 目录尚不存在时记录下来，创建后会重新扫描 Remember a missing directory so it is scanned once created
+            mtimes[self.directory] = None
+        return grouped, mtimes
+
+    def summaries(self):
+        index_path = os.path.join(self.directory, "summary", "index.json")
+        if os.path.isfile(index_path):
+            with open(index_path, "r") as f:
+                return json.load(f)
+        return {}
+
+    def trace_ids(self):
+        return sorted(self._scan())
+
+    def load(self, trace_id):
+        paths = self._scan().get(trace_id)
+        if not paths:
+            raise KeyError(trace_id)
+        process = self.summaries().get(trace_id, {}).get("process", "")
+        trace = ColumnarTrace(trace_id, process=process)
+        loaded = {}
+        for metric, (suffix, field) in METRICS.items():
+            if suffix not in paths:
+                continue
+            if suffix not in loaded:
+                with open(paths[suffix], "r") as f:
+                    loaded[suffix] = json.load(f)
+            trace.add(metric, loaded[suffix], field)
+        return trace
+
+
+class TraceCache:
+    """
+    按内存预算做 LRU 淘汰的已解析 trace 缓存
+
+    LRU cache of parsed traces, evicting under a memory budget.
+    最近使用的 trace 总是保留，即使它单独超过预算。
+    The most recently used trace is always kept, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, loader, memory_budget):
+        self.loader = loader
+        self.memory_budget = memory_budget
+        self._traces = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def get(self, trace_id):
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            if trace is not None:
+                self._traces.move_to_end(trace_id)
+                return trace
+
+        trace = self.loader.load(trace_id)
+
+        with self._lock:
+            if trace_id not in self._traces:
+                self._traces[trace_id] = trace
+                self._nbytes += trace.nbytes
+            self._traces.move_to_end(trace_id)
+            while self._nbytes > self.memory_budget and len(self._traces) > 1:
+                _, evicted = self._traces.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+            return self._traces[trace_id]
+
+    def cached_ids(self):
+        with self._lock:
+            return list(self._traces)
+
+
+def downsample(ts, values, max_points):
+    """
+    按桶保留最小值与最大值的降采样，保留尖峰
+
+    Min/max bucket downsampling, keeps spikes visible.
+    """
+    n = len(ts)
+    if max_points is None or n <= max_points or max_points < 2:
+        return list(ts), list(values)
+    buckets = max_points // 2
+    out_ts = []
+    out_values = []
+    for b in range(buckets):
+        lo = b * n // buckets
+        hi = (b + 1) * n // buckets
+        if lo >= hi:
+            continue
+        chunk = values[lo:hi]
+        i_min = lo + min(range(hi - lo), key=chunk.__getitem__)
+        i_max = lo + max(range(hi - lo), key=chunk.__getitem__)
+        for i in sorted({i_min, i_max}):
+            out_ts.append(ts[i])
+            out_values.append(values[i])
+    return out_ts, out_values
+
+
+def render_report_html(trace, max_points=2000):
+    """生成单个 trace 的图表 HTML Render the chart html of one trace"""
+    from data_visualizer import ParsedData, DataVisualizer
+
+    dv = DataVisualizer()
+    for metric, title in (("fps", "FPS Data"), ("gpu", "GPU Data"), ("cpu", "CPU Usage"), ("mem", "Memory Usage")):
+        if metric not in trace.columns:
+            continue
+        ts, values = downsample(*trace.window(metric), max_points)
+        dv.add_parsed_data(
+            ParsedData(
+                title=f"{trace.trace_id} {title}",
+                y_label=metric.upper(),
+                y_seq=[round(v, 2) for v in values],
+                x_seq=[seconds_to_hms(t) for t in ts],
+            )
+        )
+    return dv.render_embed()
+
+
+def make_handler(cache):
+    class QueryHandler(BaseHTTPRequestHandler):
+        """
+        GET /traces
+        GET /series?trace=ID&metric=fps[&start=S&end=S&process=NAME&max_points=N]
+        GET /report?trace=ID
+        """
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                if url.path == "/traces":
+                    self._send_json(self._traces())
+                elif url.path == "/series":
+                    self._send_json(self._series(query))
+                elif url.path == "/report":
+                    trace = cache.get(query["trace"])
+                    self._send(200, render_report_html(trace).encode("utf-8"), "text/html; charset=utf-8")
+                else:
+                    self._send_json({"error": f"unknown path {url.path}"}, 404)
+            except KeyError as e:
+                self._send_json({"error": f"not found: {e}"}, 404)
+            except ValueError as e:
+                self._send_json({"error": str(e)}, 400)
+            except Exception as e:
+                # 其余异常（如损坏的 Json）返回 500，不让连接无响应地断开
+                # Anything else (e.g. a corrupt json) answers 500 instead of dropping the connection
+                self._send_json({"error": f"internal error: {type(e).__name__}: {e}"}, 500)
+
+        def _traces(self):
+            summaries = cache.loader.summaries()
+            cached = set(cache.cached_ids())
+            return [
+                {
+                    "trace": trace_id,
+                    "cached": trace_id in cached,
+                    "summary": summaries.get(trace_id),
+                }
+                for trace_id in cache.loader.trace_ids()
+            ]
+
+        def _series(self, query):
+            metric = query.get("metric", "fps")
+            if metric not in METRICS:
+                raise ValueError(f"unknown metric {metric}")
+            trace = cache.get(query["trace"])
+            start = float(query["start"]) if "start" in query else None
+            end = float(query["end"]) if "end" in query else None
+            max_points = int(query["max_points"]) if "max_points" in query else None
+            ts, values = [], []
+            process = query.get("process")
+            if not process or not trace.process or process == trace.process:
+                ts, values = downsample(*trace.window(metric, start, end), max_points)
+            return {
+                "trace": trace.trace_id,
+                "metric": metric,
+                "process": trace.process,
+                "ts": list(ts),
+                "value": list(values),
+            }
+
+        def _send_json(self, data, code=200):
+            self._send(code, json.dumps(data).encode("utf-8"), "application/json")
+
+        def _send(self, code, body, content_type):
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return QueryHandler
+
+
+if __name__ == "__main__":
+    main()
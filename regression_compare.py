@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+# 指标 -> (save() Json 中的字段, 变差的方向, 默认阈值)
+# metric -> (field in the save() json, direction that is worse, default threshold)
+# "lower": 数值越低越差 (FPS)  lower values are worse; "higher": 数值越高越差  higher values are worse
+METRICS = {
+    "fps": ("fps", "lower", 30.0),
+    "gpu": ("gpu", "higher", 80.0),
+    "cpu": ("cpu", "higher", 80.0),
+    "mem": ("memory", "higher", None),
+}
+
+# delta = candidate - baseline；regression 为 True 时 delta 的置信区间整体落在变差的一侧且超过容忍度
+# delta = candidate - baseline. regression is True when the whole confidence
+# interval of delta lies on the worse side and beyond the tolerance
+StatDelta = namedtuple(
+    "StatDelta",
+    ["metric", "stat", "baseline", "candidate", "delta", "ci_low", "ci_high", "regression"],
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基线回归对比 Compare candidate runs against a baseline")
+    parser.add_argument(
+        "-baseline",
+        nargs="+",
+        required=True,
+        help="基线 save() 输出目录 save() output directories of the baseline runs",
+    )
+    parser.add_argument(
+        "-candidate",
+        nargs="+",
+        required=True,
+        help="待测 save() 输出目录 save() output directories of the candidate runs",
+    )
+    parser.add_argument(
+        "-metrics",
+        nargs="+",
+        choices=list(METRICS),
+        default=list(METRICS),
+        help="metrics to compare",
+    )
+    parser.add_argument(
+        "-fps_threshold",
+        type=float,
+        default=METRICS["fps"][2],
+        help="time under this fps counts as bad",
+    )
+    parser.add_argument(
+        "-cpu_threshold",
+        type=float,
+        default=METRICS["cpu"][2],
+        help="time above this cpu usage counts as bad",
+    )
+    parser.add_argument(
+        "-tolerance",
+        type=float,
+        default=0.05,
+        help="relative change of median/p90 (and absolute change of the bad-time share) that is tolerated",
+    )
+    parser.add_argument(
+        "-resamples",
+        type=int,
+        default=1000,
+        help="bootstrap resamples",
+    )
+    parser.add_argument(
+        "-confidence",
+        type=float,
+        default=0.95,
+        help="confidence level of the intervals",
+    )
+    parser.add_argument(
+        "-output",
+        type=str,
+        default=None,
+        help="also write the result as json",
+    )
+    args = parser.parse_args()
+
+    thresholds = {"fps": args.fps_threshold, "cpu": args.cpu_threshold}
+    baseline = load_series(args.baseline, args.metrics)
+    candidate = load_series(args.candidate, args.metrics)
+    deltas = compare(
+        baseline,
+        candidate,
+        thresholds=thresholds,
+        tolerance=args.tolerance,
+        resamples=args.resamples,
+        confidence=args.confidence,
+    )
+    passed = not any(d.regression for d in deltas)
+
+    print(f"{'metric':<8}{'stat':<12}{'baseline':>10}{'candidate':>11}{'delta':>10}{'ci':>22}  verdict")
+    for d in deltas:
+        ci = f"[{d.ci_low:.3f}, {d.ci_high:.3f}]"
+        print(
+            f"{d.metric:<8}{d.stat:<12}{d.baseline:>10.3f}{d.candidate:>11.3f}{d.delta:>10.3f}{ci:>22}"
+            f"  {'REGRESSION' if d.regression else 'ok'}"
+        )
+    print("结果 Verdict: " + ("PASS" if passed else "FAIL"))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"passed": passed, "deltas": [d._asdict() for d in deltas]}, f, indent=2)
+    sys.exit(0 if passed else 1)
+
+
+def load_series(directories, metrics=tuple(METRICS)):
+    """
+    读取一组 save() 输出目录，按指标收集每个 trace 的数值。
+    save() 的数据已按时间升序排列，块自助抽样只需要相邻样本在时间上相邻，所以不再解析时间。
+
+    Read a set of save() output directories and collect the values of every
+    trace per metric. save() data is already in ascending time order, and the
+    block bootstrap only needs neighbours in time, so timestamps are not parsed.
+    :return: {metric: [np.ndarray per trace]}
+    """
+    series = {metric: [] for metric in metrics}
+    for directory in directories:
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"目录不存在: {directory}")
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                _, _, suffix = os.path.splitext(filename)[0].rpartition("_")
+                if not filename.endswith(".json") or suffix not in series:
+                    continue
+                with open(os.path.join(root, filename), "r") as f:
+                    values = json.load(f)
+                if values:
+                    field = METRICS[suffix][0]
+                    series[suffix].append(np.fromiter((item[field] for item in values), np.float64, len(values)))
+    return series
+
+
+def quantile_edges(values, bins=256):
+    """
+    基线与待测合并后的等频分箱边界，重复值较多时箱数会更少
+
+    Equal-frequency bin edges of the pooled baseline and candidate values,
+    fewer bins remain when many values repeat.
+    """
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)))
+    return edges if len(edges) > 1 else np.append(edges, edges)
+
+
+def trace_block_ids(lengths, block):
+    """
+    每个样本所属的块编号，块在每个 trace 内重新开始，不会跨越两个 trace
+
+    Block id of every sample. Blocks restart at every trace, so no block spans
+    the end of one trace and the start of the next.
+    """
+    ids = []
+    offset = 0
+    for length in lengths:
+        ids.append(np.arange(length) // block + offset)
+        offset += -(-length // block)
+    return np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+
+
+def bootstrap_stats(parts, threshold, direction, quantile, edges, rng, resamples, block, max_blocks=4096):
+    """
+    对 (中位数, 尾部分位数, 超阈值时间占比) 做向量化的块自助抽样。
+    相邻样本自相关，所以按长度为 block 的连续块整体抽取（块数超过 max_blocks 时加大 block），
+    块只在同一个 trace 内划分。
+    每块先统计分箱直方图，一次抽样即每块的多项分布权重，所有抽样的直方图
+    由 (resamples, blocks) @ (blocks, bins) 一次矩阵乘法得到，分位数在箱内线性插值。
+
+    Vectorized block bootstrap of (median, tail quantile, bad-time share).
+    Neighbouring samples are autocorrelated, so contiguous blocks of `block`
+    samples are drawn together (block grows when there would be more than
+    max_blocks blocks). Blocks are cut within each trace. Each block is
+    reduced to a binned histogram, a resample is a multinomial weight per
+    block, and the histograms of all resamples come from one
+    (resamples, blocks) @ (blocks, bins) matrix product. Quantiles are
+    interpolated linearly within a bin.
+    :param parts: 每个 trace 的数值 values of every trace
+    :return: (point estimates shape (3,), resampled estimates shape (resamples, 3))
+    """
+    parts = [np.asarray(part, dtype=np.float64) for part in parts if len(part)]
+    values = np.concatenate(parts)
+    n = len(values)
+    bad = _bad_mask(values, threshold, direction)
+    point = np.array([*np.quantile(values, [0.5, quantile]), bad.mean() if bad is not None else np.nan])
+
+    block = max(block, -(-n // max_blocks))
+    block_ids = trace_block_ids([len(part) for part in parts], block)
+    n_blocks = int(block_ids[-1]) + 1
+    n_bins = len(edges) - 1
+    bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, n_bins - 1)
+    hist = np.bincount(block_ids * n_bins + bins, minlength=n_blocks * n_bins).reshape(n_blocks, n_bins)
+
+    weights = rng.multinomial(n_blocks, np.full(n_blocks, 1.0 / n_blocks), size=resamples).astype(np.float32)
+    resampled = weights @ hist.astype(np.float32)
+    result = np.empty((resamples, 3))
+    result[:, 0] = _hist_quantile(resampled, edges, 0.5)
+    result[:, 1] = _hist_quantile(resampled, edges, quantile)
+    if bad is None:
+        result[:, 2] = np.nan
+    else:
+        bad_counts = np.bincount(block_ids, weights=bad, minlength=n_blocks).astype(np.float32)
+        result[:, 2] = (weights @ bad_counts) / resampled.sum(axis=1)
+    return point, result
+
+
+def _hist_quantile(hist, edges, q):
+    """每行直方图的 q 分位数 (箱内线性插值) The q quantile of every histogram row, interpolated within a bin"""
+    cum = np.cumsum(hist, axis=1)
+    target = q * cum[:, -1]
+    j = np.minimum((cum < target[:, None]).sum(axis=1), hist.shape[1] - 1)
+    rows = np.arange(len(hist))
+    count = hist[rows, j]
+    frac = np.clip((target - (cum[rows, j] - count)) / np.maximum(count, 1), 0, 1)
+    return edges[j] + frac * (edges[j + 1] - edges[j])
+
+
+def compare(
+    baseline,
+    candidate,
+    thresholds=None,
+    tolerance=0.05,
+    resamples=1000,
+    confidence=0.95,
+    quantile=0.9,
+    block=10,
+    bins=256,
+    seed=0,
+):
+    """
+    对比 load_series() 的结果，返回每个指标的 StatDelta 列表。
+    尾部分位数取变差的一侧：FPS 为 1 - quantile (低帧率的尾部)，其余为 quantile。
+
+    Compare two load_series() results and return StatDeltas per metric. The
+    tail quantile is taken on the worse side: 1 - quantile for FPS (the low
+    tail), quantile for the other metrics.
+    :param thresholds: {metric: threshold}，覆盖 METRICS 中的默认阈值 overrides the defaults
+    :param tolerance: median/分位数的相对变化与超阈值占比的绝对变化在此以内不算回归
+                      relative median/quantile change and absolute bad-share change that is tolerated
+    :param block: 自助抽样的块长度（样本数） block length of the bootstrap, in samples
+    :param bins: 分位数插值的分箱数 number of bins used to interpolate the quantiles
+    """
+    thresholds = thresholds or {}
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+    deltas = []
+    for metric in baseline:
+        base_parts = baseline[metric]
+        cand_parts = candidate.get(metric, [])
+        if not base_parts or not cand_parts:
+            continue
+        _, direction, default = METRICS[metric]
+        threshold = thresholds.get(metric, default)
+        q = 1 - quantile if direction == "lower" else quantile
+        edges = quantile_edges(np.concatenate(base_parts + cand_parts), bins)
+        base_point, base_boot = bootstrap_stats(base_parts, threshold, direction, q, edges, rng, resamples, block)
+        cand_point, cand_boot = bootstrap_stats(cand_parts, threshold, direction, q, edges, rng, resamples, block)
+        point = cand_point - base_point
+        boot = cand_boot - base_boot
+        # 区间围绕精确的点估计，抵消分箱插值带来的偏差
+        # Center the interval on the exact point estimate to cancel the binning bias
+        low, high = point + np.quantile(boot - np.median(boot, axis=0), [alpha, 1 - alpha], axis=0)
+        names = ("median", f"p{round(q * 100)}", "bad_time" if threshold is not None else None)
+        for k, stat in enumerate(names):
+            if stat is None:
+                continue
+            if k < 2:
+                # 分位数按相对基线的比例计算容忍度 Quantile tolerance is relative to the baseline
+                margin = tolerance * abs(base_point[k])
+                worse = high[k] < -margin if direction == "lower" else low[k] > margin
+            else:
+                # 超阈值时间占比总是越高越差 A higher bad-time share is always worse
+                worse = low[k] > tolerance
+            deltas.append(
+                StatDelta(
+                    metric=metric,
+                    stat=stat,
+                    baseline=float(base_point[k]),
+                    candidate=float(cand_point[k]),
+                    delta=float(point[k]),
+                    ci_low=float(low[k]),
+                    ci_high=float(high[k]),
+                    regression=bool(worse),
+                )
+            )
+    return deltas
+
+
+def _bad_mask(values, threshold, direction):
+    if threshold is None:
+        return None
+    return values < threshold if direction == "lower" else values > threshold
+
+
+if __name__ == "__main__":
+    main()
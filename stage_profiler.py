@@ -0,0 +1,149 @@
+import io
+import os
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+
+# -profile 的取值 -> (cProfile, tracemalloc) Values of -profile -> (cProfile, tracemalloc)
+PROFILE_MODES = {
+    "all": (True, True),
+    "cpu": (True, False),
+    "memory": (False, True),
+}
+
+# top_allocations: [(文件:行号 file:line, 字节数 bytes, 分配次数 count)]
+StageStats = namedtuple("StageStats", ["stage", "seconds", "peak_bytes", "profile_path", "top_allocations", "top_functions"])
+
+
+class StageProfiler:
+    """
+    按解析流水线的阶段（export、按 schema 的 parse、transform、save、render）
+    可选地采集 cProfile 与 tracemalloc。每个阶段结束时把 cProfile 数据写为
+    {output_dir}/{prefix}_{stage}.prof（可用 snakeviz / pstats 查看），
+    write_report() 汇总各阶段耗时、内存峰值与分配最多的代码行。
+    嵌套或并发的阶段只计入最外层的阶段。
+
+    Optional cProfile and tracemalloc capture per pipeline stage (export,
+    parse per schema, transform, save, render). When a stage ends its cProfile
+    data is dumped to {output_dir}/{prefix}_{stage}.prof (for snakeviz or
+    pstats), and write_report() sums up the time, peak memory and top
+    allocating lines of every stage. Nested or concurrent stages are counted
+    in the outermost one.
+
+        profiler = StageProfiler("./temp/parse", trace_id)
+        with profiler.stage("save"):
+            parser.save()
+        profiler.write_report()
+    """
+
+    def __init__(self, output_dir, prefix, cpu=True, memory=True, top=20):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top
+        self.stats = []
+        self._lock = threading.Lock()
+        self._active = False
+
+    @classmethod
+    def from_mode(cls, mode, log_path, prefix):
+        """由 -profile 的取值创建，输出到解析日志所在目录 From a -profile value, next to the parse log"""
+        cpu, memory = PROFILE_MODES[mode]
+        return cls(os.path.dirname(log_path) or ".", prefix, cpu=cpu, memory=memory)
+
+    def stage(self, name):
+        with self._lock:
+            if self._active:
+                return nullcontext()
+            self._active = True
+        return self._profile(name)
+
+    @contextmanager
+    def _profile(self, name):
+        profile = cProfile.Profile() if self.cpu else None
+        was_tracing = tracemalloc.is_tracing()
+        base = None
+        if self.memory:
+            if was_tracing:
+                base = tracemalloc.take_snapshot()
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+        begin = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            seconds = time.perf_counter() - begin
+            peak = 0
+            allocations = []
+            if self.memory:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if not was_tracing:
+                    tracemalloc.stop()
+                allocations = _top_allocations(snapshot, base, self.top)
+            profile_path = None
+            functions = ""
+            if profile is not None:
+                profile_path = self._profile_path(name)
+                profile.dump_stats(profile_path)
+                functions = _top_functions(profile, self.top)
+            self.stats.append(StageStats(name, seconds, peak, profile_path, allocations, functions))
+            with self._lock:
+                self._active = False
+
+    def _profile_path(self, name):
+        stage = name.replace("/", "_")
+        count = sum(1 for item in self.stats if item.stage == name)
+        if count:
+            stage = f"{stage}.{count}"
+        return os.path.join(self.output_dir, f"{self.prefix}_{stage}.prof")
+
+    def write_report(self):
+        """写出 {prefix}_profile.txt 并返回路径 Write {prefix}_profile.txt and return its path"""
+        path = os.path.join(self.output_dir, f"{self.prefix}_profile.txt")
+        lines = [f"{'stage':<40}{'seconds':>10}{'peak MB':>10}  profile"]
+        for item in self.stats:
+            lines.append(
+                f"{item.stage:<40}{item.seconds:>10.3f}{item.peak_bytes / 1048576:>10.2f}  {item.profile_path or '-'}"
+            )
+        for item in self.stats:
+            if item.top_allocations:
+                lines += ["", f"== {item.stage}: 分配最多的代码行 top allocations =="]
+                for location, size, count in item.top_allocations:
+                    lines.append(f"{size / 1024:>12.1f} KiB {count:>10}  {location}")
+            if item.top_functions:
+                lines += ["", f"== {item.stage}: 累计耗时最多的函数 top cumulative time ==", item.top_functions.rstrip()]
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+
+def _top_allocations(snapshot, base, top):
+    # 只统计阶段内产生且在结束时仍存活的分配 Only allocations made in the stage and still alive at its end
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    if base is None:
+        stats = snapshot.statistics("lineno")
+        return [(str(s.traceback[0]), s.size, s.count) for s in stats[:top]]
+    stats = snapshot.compare_to(base, "lineno")
+    stats = [s for s in stats if s.size_diff > 0]
+    stats.sort(key=lambda s: s.size_diff, reverse=True)
+    return [(str(s.traceback[0]), s.size_diff, s.count_diff) for s in stats[:top]]
+
+
+def _top_functions(profile, top):
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(top)
+    return stream.getvalue()
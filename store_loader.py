@@ -0,0 +1,268 @@
+import os
+import sys
+import glob
+import mmap
+import time
+import zlib
+import argparse
+import threading
+import queue
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# 需要解压的 indexed-store 文件 Files of an indexed-store that are decompressed
+STORE_FILES = ("bulkstore", "spindex.0")
+
+# last 为 True 时 data 为空，表示该文件已解压完成 (size 为解压后的总字节数)
+# When last is True data is empty and the file is done (size is the decompressed total)
+StoreChunk = namedtuple("StoreChunk", ["path", "offset", "data", "last", "size"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行解压 indexed-store Decompress indexed-stores in parallel")
+    parser.add_argument(
+        "trace_path",
+        type=str,
+        help="Path to .trace file",
+    )
+    parser.add_argument(
+        "-workers",
+        type=int,
+        default=None,
+        help="number of decompression threads (default: cpu count)",
+    )
+    parser.add_argument(
+        "-budget_mb",
+        type=int,
+        default=64,
+        help="max decompressed megabytes held in memory at once",
+    )
+    args = parser.parse_args()
+
+    paths = find_store_files(args.trace_path)
+    if not paths:
+        print(f"未找到 indexed-store No indexed-store found in {args.trace_path}")
+        sys.exit(1)
+    loader = StoreLoader(max_workers=args.workers, budget_bytes=args.budget_mb * 1024 * 1024)
+    begin = time.time()
+    compressed = sum(os.path.getsize(p) for p in paths)
+    total = 0
+    for chunk in loader.iter_chunks(paths):
+        if chunk.last:
+            total += chunk.size
+            print(f"{os.path.getsize(chunk.path):>12} -> {chunk.size:>12}  {os.path.relpath(chunk.path, args.trace_path)}")
+    cost = time.time() - begin
+    print(
+        f"{len(paths)} 个文件 files, {compressed} -> {total} bytes, "
+        f"{cost:.2f}s ({loader.max_workers} workers, peak {loader.peak_bytes} bytes)"
+    )
+
+
+def find_store_files(trace_path, run=None):
+    """
+    corespace/{run}/core/stores/indexed-store-N 下的 bulkstore 与 spindex.0，按文件大小降序，
+    大文件先开始解压，线程池的尾部等待更短
+
+    The bulkstore and spindex.0 files under corespace/{run}/core/stores/indexed-store-N,
+    largest first so the big stores start early and the pool does not wait on a long tail.
+    :param run: run 目录名 (如 "run1"、"currentRun")，None 为全部 run directory name, None for all runs
+    """
+    paths = []
+    pattern = os.path.join(trace_path, "corespace", run or "*", "core", "stores", "indexed-store-*")
+    for store in glob.glob(pattern):
+        for name in STORE_FILES:
+            path = os.path.join(store, name)
+            if os.path.isfile(path):
+                paths.append(path)
+    return sorted(paths, key=lambda p: (-os.path.getsize(p), p))
+
+
+class _ByteBudget:
+    """
+    已解压但尚未被消费者取走的字节数上限。消费者在阻塞等待下一个块之前必须归还
+    上一个块的预算，否则等待预算的线程与等待数据的消费者会互相等待；
+    单个块大于上限时在预算空闲时放行。
+
+    Cap on bytes decompressed but not yet taken by the consumer. The consumer
+    must return the budget of the previous chunk before it blocks waiting for
+    the next one, otherwise workers waiting for budget and a consumer waiting
+    for data would wait on each other. A chunk larger than the cap is let
+    through once the budget is empty.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self, n):
+        with self._cond:
+            while not self.closed and self.used and self.used + n > self.limit:
+                self._cond.wait()
+            if self.closed:
+                return False
+            self.used += n
+            self.peak = max(self.peak, self.used)
+            return True
+
+    def release(self, n):
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class StoreLoader:
+    """
+    在线程池上并行解压多个互不依赖的 indexed-store 文件（zlib 解压时释放 GIL）。
+    输入通过 mmap 映射，按块喂给 zlib.decompressobj，每次输出最多 chunk_size 字节，
+    已解压未消费的数据总量受 budget_bytes 限制，冷读耗时随核数下降。
+
+    Decompress independent indexed-store files in parallel on a thread pool
+    (zlib releases the GIL while inflating). Inputs are memory-mapped and fed
+    to zlib.decompressobj in slices, producing at most chunk_size bytes per
+    step. Bytes decompressed but not yet consumed are capped by budget_bytes,
+    so cold-read time scales with cores while memory stays bounded.
+
+        loader = StoreLoader(max_workers=4, budget_bytes=64 << 20)
+        for chunk in loader.iter_chunks(find_store_files("demo.trace")):
+            handle(chunk.path, chunk.offset, chunk.data)
+    """
+
+    def __init__(self, max_workers=None, budget_bytes=64 * 1024 * 1024, chunk_size=1024 * 1024):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.budget_bytes = budget_bytes
+        self.chunk_size = chunk_size
+        # 最近一次加载中同时持有的最大字节数 Peak bytes held during the last load
+        self.peak_bytes = 0
+
+    def iter_chunks(self, paths):
+        """
+        按完成顺序产出 StoreChunk，不同文件的块可能交错；每个文件最后产出一个 last=True 的块。
+        消费者处理完一个块后其预算即被归还，提前结束迭代会取消剩余任务。
+
+        Yield StoreChunks in completion order, chunks of different files may
+        interleave. Each file ends with a chunk whose last is True. The budget
+        of a chunk is returned once the consumer moves on, and leaving the loop
+        early cancels the remaining work.
+        """
+        paths = list(paths)
+        budget = _ByteBudget(self.budget_bytes)
+        results = queue.Queue()
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        for path in paths:
+            pool.submit(self._worker, path, budget, results)
+        remaining = len(paths)
+        held = 0
+        try:
+            while remaining:
+                item = results.get()
+                if isinstance(item, BaseException):
+                    raise item
+                if item.last:
+                    remaining -= 1
+                else:
+                    held = len(item.data)
+                yield item
+                # 消费者处理完这个块后、在 get() 阻塞之前归还预算
+                # Return the budget once the consumer is done, before blocking in get()
+                if held:
+                    budget.release(held)
+                    held = 0
+        finally:
+            budget.close()
+            pool.shutdown(wait=True, cancel_futures=True)
+            self.peak_bytes = budget.peak
+
+    def load(self, paths):
+        """
+        解压并返回 {path: bytes}。结果整体保存在内存中，只适合小文件或需要随机访问的场景
+
+        Decompress and return {path: bytes}. The result is fully held in memory,
+        so this is meant for small stores or when random access is needed.
+        """
+        parts = {}
+        for chunk in self.iter_chunks(paths):
+            if not chunk.last:
+                parts.setdefault(chunk.path, []).append(chunk.data)
+        return {path: b"".join(parts.get(path, ())) for path in paths}
+
+    def _worker(self, path, budget, results):
+        try:
+            size = 0
+            for offset, data in iter_decompressed(path, self.chunk_size):
+                if not budget.acquire(len(data)):
+                    return
+                results.put(StoreChunk(path, offset, data, False, 0))
+                size = offset + len(data)
+            results.put(StoreChunk(path, size, b"", True, size))
+        except Exception as e:
+            results.put(RuntimeError(f"解压失败 Failed to decompress {path}: {e}"))
+
+
+def iter_decompressed(path, chunk_size=1024 * 1024, read_size=256 * 1024):
+    """
+    逐块解压单个文件，产出 (offset, bytes)。支持首尾相接的多个 zlib 流 (unused_data)，
+    非 zlib 文件原样分块产出。
+
+    Decompress one file chunk by chunk, yielding (offset, bytes). Several
+    concatenated zlib streams are handled through unused_data; a file that is
+    not zlib is yielded as is.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if not _is_zlib(mm[:2]):
+                for offset in range(0, len(mm), chunk_size):
+                    yield offset, mm[offset:offset + chunk_size]
+                return
+            yield from _inflate(mm, chunk_size, read_size)
+
+
+def _inflate(mm, chunk_size, read_size):
+    # 只切出 read_size 的输入片段，映射的文件不会整体读入内存
+    # Only read_size slices of the mapping are materialized, never the whole file
+    offset = 0
+    pos = 0
+    d = zlib.decompressobj()
+    pending = b""
+    while True:
+        if not pending:
+            if pos >= len(mm):
+                break
+            pending = mm[pos:pos + read_size]
+            pos += len(pending)
+        data = d.decompress(pending, chunk_size)
+        pending = d.unconsumed_tail
+        if data:
+            yield offset, data
+            offset += len(data)
+        if d.eof:
+            # 后面可能紧跟着另一个 zlib 流 Another zlib stream may follow
+            rest = d.unused_data
+            while len(rest) < 2 and pos < len(mm):
+                rest += mm[pos:pos + read_size]
+                pos = min(pos + read_size, len(mm))
+            if not _is_zlib(rest[:2]):
+                break
+            d = zlib.decompressobj()
+            pending = rest
+    if not d.eof:
+        tail = d.flush()
+        if tail:
+            yield offset, tail
+
+
+def _is_zlib(header):
+    return len(header) == 2 and header[0] & 0x0F == 8 and (header[0] << 8 | header[1]) % 31 == 0
+
+
+if __name__ == "__main__":
+    main()
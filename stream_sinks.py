@@ -0,0 +1,96 @@
+import io
+import csv
+import gzip
+import zlib
+import json
+from abc import ABC, abstractmethod
+
+
+def open_sink(path_prefix, fmt, fields, compress=False, buffer_size=1 << 20, flush_rows=10000):
+    """
+    按格式打开流式输出
+    :param path_prefix: 不带扩展名的输出路径 output path without extension
+    :param fmt: "ndjson" 或 "csv"
+    :param fields: 字段顺序（CSV 表头） field order (CSV header)
+    """
+    if fmt == "ndjson":
+        return NDJSONSink(path_prefix + ".ndjson", compress, buffer_size, flush_rows)
+    if fmt == "csv":
+        return CSVSink(path_prefix + ".csv", fields, compress, buffer_size, flush_rows)
+    raise ValueError(f"不支持的格式 unsupported format: {fmt}")
+
+
+class _Sink(ABC):
+    """
+    带缓冲（可选 gzip）的逐行输出，每 flush_rows 行 flush 一次，
+    便于下游在写入过程中 tail；gzip 输出每次 flush 时做 Z_SYNC_FLUSH，
+    已写出的部分可以直接用 zcat 解压
+
+    Buffered, optionally gzipped row output. It flushes every `flush_rows`
+    rows so downstream tools can tail the file while it is being written.
+    The gzip output does a Z_SYNC_FLUSH on every flush, so everything written
+    so far can be decompressed with zcat.
+    """
+
+    def __init__(self, path, compress=False, buffer_size=1 << 20, flush_rows=10000):
+        if compress:
+            path += ".gz"
+            raw = self._gzip = gzip.GzipFile(path, "wb", compresslevel=6)
+            self._file = io.TextIOWrapper(
+                io.BufferedWriter(raw, buffer_size), encoding="utf-8", newline=""
+            )
+        else:
+            self._gzip = None
+            self._file = open(path, "w", buffering=buffer_size, encoding="utf-8", newline="")
+        self.path = path
+        self.count = 0
+        self.flush_rows = flush_rows
+
+    def write(self, row):
+        self._write(row)
+        self.count += 1
+        if self.flush_rows and self.count % self.flush_rows == 0:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        if self._gzip is not None:
+            # 默认即 zlib.Z_SYNC_FLUSH Defaults to zlib.Z_SYNC_FLUSH
+            self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def write_all(self, rows):
+        for row in rows:
+            self.write(row)
+
+    @abstractmethod
+    def _write(self, row):
+        """写出一行，由子类实现 Write one row, implemented by subclasses"""
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NDJSONSink(_Sink):
+    """每行一个 JSON 对象 One JSON object per line"""
+
+    def _write(self, row):
+        self._file.write(json.dumps(row, separators=(",", ":")))
+        self._file.write("\n")
+
+
+class CSVSink(_Sink):
+    """带表头的 CSV CSV with a header row"""
+
+    def __init__(self, path, fields, compress=False, buffer_size=1 << 20, flush_rows=10000):
+        super().__init__(path, compress, buffer_size, flush_rows)
+        self._writer = csv.DictWriter(self._file, fieldnames=fields, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def _write(self, row):
+        self._writer.writerow(row)
@@ -0,0 +1,89 @@
+import os
+import glob
+import zlib
+import plistlib
+
+
+class StringPool:
+    """
+    整数下标的字符串驻留表。解析器从空表开始，导出数据中出现的字符串按需追加；
+    行解析时只携带整数 id，输出时才通过 lookup 还原字符串。
+    load() 可按需读取 bundle 的 corespace/run{n}/core/uniquing/strings
+    （zlib 压缩的 XML plist 字符串数组），供需要整张表的工具使用。
+
+    Integer-indexed string intern table. Parsers start from an empty pool and
+    append strings as they show up in the exported data. Row decoding carries
+    small integer ids, and strings are resolved through lookup() only for
+    output. load() reads the bundle's corespace/run{n}/core/uniquing/strings
+    (a zlib-compressed XML plist array of strings) for tools that want the
+    whole table.
+
+        pool = StringPool()
+        pid = pool.intern("Steam")
+        pool.lookup(pid)   # "Steam"
+        bundle = StringPool.load("demo.trace", run=1)
+    """
+
+    def __init__(self, strings=()):
+        self.strings = list(strings)
+        self.ids = {}
+        for i, s in enumerate(self.strings):
+            # 重复字符串保留第一个 id Keep the first id of duplicated strings
+            self.ids.setdefault(s, i)
+        # bundle 中的字符串数量 Number of strings that came from the bundle
+        self.seeded = len(self.strings)
+
+    @classmethod
+    def load(cls, trace_path, run=1):
+        """
+        加载 run 的 uniquing/strings，找不到或无法解码时返回空的 StringPool
+
+        Load the uniquing/strings of a run. Returns an empty pool when the
+        file is missing or cannot be decoded.
+        """
+        path = find_strings_file(trace_path, run)
+        if path is None:
+            return cls()
+        try:
+            return cls(read_strings_file(path))
+        except (OSError, ValueError, zlib.error, plistlib.InvalidFileException):
+            return cls()
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __contains__(self, s):
+        return s in self.ids
+
+    def intern(self, s):
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def lookup(self, i):
+        return self.strings[i]
+
+
+def find_strings_file(trace_path, run=1):
+    """corespace/run{n}/core/uniquing/strings 的路径，不存在时为 None"""
+    path = os.path.join(trace_path, "corespace", f"run{run}", "core", "uniquing", "strings")
+    if os.path.isfile(path):
+        return path
+    # run 编号不一定从 1 开始 (例如 run2) Run numbers do not always start at 1
+    candidates = sorted(
+        glob.glob(os.path.join(trace_path, "corespace", "run*", "core", "uniquing", "strings"))
+    )
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def read_strings_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(b"<?xml") and not data.startswith(b"bplist"):
+        data = zlib.decompress(data)
+    strings = plistlib.loads(data)
+    if not isinstance(strings, list):
+        raise ValueError(f"unexpected uniquing strings format: {path}")
+    return [s if isinstance(s, str) else str(s) for s in strings]
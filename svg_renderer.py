@@ -0,0 +1,379 @@
+import math
+import struct
+import zlib
+from html import escape
+
+import numpy as np
+
+# 与 pyecharts light 主题接近的配色 Palette close to the pyecharts light theme
+PALETTE = [
+    (55, 162, 218),
+    (50, 197, 233),
+    (103, 224, 227),
+    (159, 230, 184),
+    (255, 219, 92),
+    (255, 159, 127),
+    (251, 114, 147),
+    (224, 98, 174),
+    (230, 144, 209),
+    (231, 188, 243),
+]
+AXIS_COLOR = (110, 112, 121)
+GRID_COLOR = (224, 230, 241)
+TEXT_COLOR = (70, 70, 70)
+BACKGROUND = (255, 255, 255)
+
+
+class StaticVisualizer:
+    """
+    不依赖浏览器的静态报告：直接把折线图绘制为 SVG，或用内置的 numpy
+    光栅化器输出 PNG。每条序列按像素列做最小/最大值降采样，尖峰不会丢失。
+    接口与 DataVisualizer 相同（add_parsed_data / add_multi_line_parsed_data）。
+
+    Browser-free static report. Line charts are drawn straight to SVG, or to
+    PNG through a small built-in numpy rasterizer. Every series is min/max
+    downsampled per pixel column, so spikes survive. Same interface as
+    DataVisualizer (add_parsed_data / add_multi_line_parsed_data).
+
+        sv = StaticVisualizer(svg_path="report.svg", snapshot_path="report.png")
+        sv.add_parsed_data(fps_data)
+        sv.render_svg()
+        sv.make_snapshot()
+
+    PNG 用点阵字体绘制标题、图例与刻度（英文字母显示为大写，点阵字体没有的字符留空）。
+    The PNG draws titles, legends and ticks with a bitmap font (letters are
+    shown upper case, characters the font lacks are left blank).
+    """
+
+    def __init__(
+        self,
+        svg_path="data_visualizer.svg",
+        snapshot_path="data_visualizer.png",
+        width=1000,
+        chart_height=260,
+    ):
+        self.svg_path = svg_path
+        self.snapshot_path = snapshot_path
+        self.width = width
+        self.chart_height = chart_height
+        # [(title, x_seq, [(name, y_seq)])]
+        self._charts = []
+
+    def add_parsed_data(self, parsed_data, **kwargs):
+        self._charts.append(
+            (parsed_data.title, parsed_data.x_seq, [(parsed_data.y_label, parsed_data.y_seq)])
+        )
+
+    def add_multi_line_parsed_data(self, parsed_data, **kwargs):
+        series = [(name, parsed_data.y_seq[name]) for name in parsed_data.file_names]
+        self._charts.append((parsed_data.title, parsed_data.x_seq, series))
+
+    @property
+    def height(self):
+        return max(1, len(self._charts)) * self.chart_height
+
+    def render_svg(self):
+        """写出 SVG 文件并返回路径 Write the SVG file and return its path"""
+        with open(self.svg_path, "w", encoding="utf-8") as f:
+            f.write(self.render_embed())
+        return self.svg_path
+
+    def render_embed(self):
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" '
+            f'viewBox="0 0 {self.width} {self.height}" font-family="sans-serif">',
+            f'<rect width="100%" height="100%" fill="{_hex(BACKGROUND)}"/>',
+        ]
+        for kind, *args in self._primitives():
+            if kind == "line":
+                points, color, width = args
+                coords = " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+                parts.append(
+                    f'<polyline points="{coords}" fill="none" stroke="{_hex(color)}" '
+                    f'stroke-width="{width}" stroke-linejoin="round"/>'
+                )
+            elif kind == "text":
+                x, y, text, anchor, size, color = args
+                parts.append(
+                    f'<text x="{x:.1f}" y="{y:.1f}" text-anchor="{anchor}" font-size="{size}" '
+                    f'fill="{_hex(color)}">{escape(str(text))}</text>'
+                )
+        parts.append("</svg>")
+        return "\n".join(parts)
+
+    def make_snapshot(self):
+        """写出 PNG 文件并返回路径 Write the PNG file and return its path"""
+        canvas = _Canvas(self.width, self.height, BACKGROUND)
+        for kind, *args in self._primitives():
+            if kind == "line":
+                points, color, width = args
+                canvas.polyline(points, color, width)
+            elif kind == "text":
+                x, y, text, anchor, size, color = args
+                canvas.text(x, y, text, anchor, color)
+        with open(self.snapshot_path, "wb") as f:
+            f.write(canvas.to_png())
+        return self.snapshot_path
+
+    def _primitives(self):
+        """
+        生成与后端无关的绘图指令：
+        ("line", [(x, y)], color, width) / ("text", x, y, text, anchor, size, color)
+
+        Backend independent drawing commands shared by the SVG and PNG output.
+        """
+        left, right, top, bottom = 60, 20, 48, 28
+        plot_w = self.width - left - right
+        for index, (title, x_seq, series) in enumerate(self._charts):
+            y_base = index * self.chart_height
+            plot_top = y_base + top
+            plot_h = self.chart_height - top - bottom
+            plot_bottom = plot_top + plot_h
+
+            yield ("text", left, y_base + 18, title, "start", 14, TEXT_COLOR)
+            legend_x = left
+            for k, (name, _) in enumerate(series):
+                color = PALETTE[k % len(PALETTE)]
+                yield ("line", [(legend_x, y_base + 33), (legend_x + 18, y_base + 33)], color, 2)
+                yield ("text", legend_x + 22, y_base + 37, name, "start", 11, TEXT_COLOR)
+                legend_x += 30 + 7 * len(str(name))
+
+            finite = [
+                v for _, y_seq in series for v in y_seq if v is not None and not math.isnan(v)
+            ]
+            lo, hi, step = _nice_range(min(finite, default=0), max(finite, default=1))
+
+            def to_y(v):
+                return plot_bottom - (v - lo) / (hi - lo) * plot_h
+
+            tick = lo
+            while tick <= hi + step / 2:
+                y = to_y(tick)
+                yield ("line", [(left, y), (left + plot_w, y)], GRID_COLOR, 1)
+                yield ("text", left - 6, y + 4, _fmt_tick(tick, step), "end", 11, AXIS_COLOR)
+                tick += step
+            yield ("line", [(left, plot_bottom), (left + plot_w, plot_bottom)], AXIS_COLOR, 1)
+
+            n = len(x_seq)
+            if n == 0:
+                continue
+
+            def to_x(i):
+                return left + (i / (n - 1) * plot_w if n > 1 else plot_w / 2)
+
+            label_count = min(n, 6)
+            for j in range(label_count):
+                i = round(j * (n - 1) / max(1, label_count - 1))
+                anchor = "middle"
+                if label_count > 1 and j == 0:
+                    anchor = "start"
+                elif label_count > 1 and j == label_count - 1:
+                    anchor = "end"
+                yield ("text", to_x(i), plot_bottom + 16, _fmt_x(x_seq[i]), anchor, 11, AXIS_COLOR)
+
+            for k, (_, y_seq) in enumerate(series):
+                color = PALETTE[k % len(PALETTE)]
+                for run in _runs(y_seq, minmax_indices(y_seq, plot_w)):
+                    yield ("line", [(to_x(i), to_y(y_seq[i])) for i in run], color, 1.5)
+
+
+def minmax_indices(values, buckets):
+    """
+    最小/最大值降采样：把序列分成 buckets 个桶，每个桶保留最小值与最大值的下标，
+    None/NaN 会被跳过。返回升序下标列表。
+
+    Min/max downsampling. Split the series into `buckets` buckets and keep the
+    indices of each bucket's min and max, skipping None/NaN. Returns sorted indices.
+    """
+    n = len(values)
+    valid = [i for i in range(n) if values[i] is not None and not math.isnan(values[i])]
+    if len(valid) <= 2 * buckets:
+        return valid
+    result = []
+    for b in range(buckets):
+        chunk = valid[b * len(valid) // buckets:(b + 1) * len(valid) // buckets]
+        if not chunk:
+            continue
+        i_min = min(chunk, key=values.__getitem__)
+        i_max = max(chunk, key=values.__getitem__)
+        result.extend(sorted({i_min, i_max}))
+    return result
+
+
+def _runs(values, indices):
+    # 在 None/NaN 处断开折线 Break the polyline at None/NaN gaps
+    run = []
+    for i in indices:
+        if run and any(
+            values[j] is None or math.isnan(values[j]) for j in range(run[-1] + 1, i)
+        ):
+            yield run
+            run = []
+        run.append(i)
+    if run:
+        yield run
+
+
+def _nice_range(lo, hi, ticks=5):
+    if hi <= lo:
+        hi = lo + 1
+    raw = (hi - lo) / ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw)
+    return math.floor(lo / step) * step, math.ceil(hi / step) * step, step
+
+
+def _fmt_tick(value, step):
+    if step >= 1 and float(value).is_integer():
+        return str(int(value))
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _fmt_x(x):
+    # 数值时间轴（秒）显示为 HH:MM:SS A numeric time axis (seconds) is shown as HH:MM:SS
+    if isinstance(x, (int, float)):
+        x = int(x)
+        return f"{x // 3600:02d}:{x % 3600 // 60:02d}:{x % 60:02d}"
+    return x
+
+
+def _hex(color):
+    return "#%02x%02x%02x" % color
+
+
+# 3x5 点阵字体，覆盖数字、大写字母与常用符号，小写字母按大写绘制
+# 3x5 bitmap font for digits, upper case letters and common symbols, lower case is drawn upper case
+_FONT = {
+    "0": ("111", "101", "101", "101", "111"),
+    "1": ("010", "110", "010", "010", "111"),
+    "2": ("111", "001", "111", "100", "111"),
+    "3": ("111", "001", "111", "001", "111"),
+    "4": ("101", "101", "111", "001", "001"),
+    "5": ("111", "100", "111", "001", "111"),
+    "6": ("111", "100", "111", "101", "111"),
+    "7": ("111", "001", "010", "010", "010"),
+    "8": ("111", "101", "111", "101", "111"),
+    "9": ("111", "101", "111", "001", "111"),
+    "A": ("010", "101", "111", "101", "101"),
+    "B": ("110", "101", "110", "101", "110"),
+    "C": ("011", "100", "100", "100", "011"),
+    "D": ("110", "101", "101", "101", "110"),
+    "E": ("111", "100", "110", "100", "111"),
+    "F": ("111", "100", "110", "100", "100"),
+    "G": ("011", "100", "101", "101", "011"),
+    "H": ("101", "101", "111", "101", "101"),
+    "I": ("111", "010", "010", "010", "111"),
+    "J": ("001", "001", "001", "101", "010"),
+    "K": ("101", "101", "110", "101", "101"),
+    "L": ("100", "100", "100", "100", "111"),
+    "M": ("101", "111", "111", "101", "101"),
+    "N": ("110", "101", "101", "101", "101"),
+    "O": ("010", "101", "101", "101", "010"),
+    "P": ("110", "101", "110", "100", "100"),
+    "Q": ("010", "101", "101", "110", "011"),
+    "R": ("110", "101", "110", "101", "101"),
+    "S": ("011", "100", "010", "001", "110"),
+    "T": ("111", "010", "010", "010", "010"),
+    "U": ("101", "101", "101", "101", "011"),
+    "V": ("101", "101", "101", "010", "010"),
+    "W": ("101", "101", "111", "111", "101"),
+    "X": ("101", "101", "010", "101", "101"),
+    "Y": ("101", "101", "010", "010", "010"),
+    "Z": ("111", "001", "010", "100", "111"),
+    " ": ("000", "000", "000", "000", "000"),
+    ":": ("000", "010", "000", "010", "000"),
+    ".": ("000", "000", "000", "000", "010"),
+    ",": ("000", "000", "000", "010", "100"),
+    "-": ("000", "000", "111", "000", "000"),
+    "+": ("000", "010", "111", "010", "000"),
+    "=": ("000", "111", "000", "111", "000"),
+    "_": ("000", "000", "000", "000", "111"),
+    "/": ("001", "001", "010", "100", "100"),
+    "%": ("101", "001", "010", "100", "101"),
+    "(": ("010", "100", "100", "100", "010"),
+    ")": ("010", "001", "001", "001", "010"),
+}
+_GLYPHS = {ch: np.array([[bit == "1" for bit in row] for row in glyph]) for ch, glyph in _FONT.items()}
+
+
+class _Canvas:
+    """
+    numpy RGB 画布与 PNG 编码（zlib + struct）。折线的所有线段一次性插值成像素坐标，
+    再用数组下标整体写入，不逐像素循环。
+
+    numpy RGB canvas with a PNG encoder (zlib + struct). All segments of a
+    polyline are interpolated to pixel coordinates at once and written with
+    one fancy-indexed assignment instead of a per-pixel loop.
+    """
+
+    def __init__(self, width, height, background):
+        self.width = width
+        self.height = height
+        self.pixels = np.empty((height, width, 3), dtype=np.uint8)
+        self.pixels[:] = background
+
+    def _fill(self, xs, ys, color):
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        self.pixels[ys[inside], xs[inside]] = color
+
+    def polyline(self, points, color, width=1):
+        pts = np.rint(np.asarray(points, dtype=np.float64)).astype(np.int64)
+        if len(pts) == 1:
+            pts = np.vstack([pts, pts])
+        if len(pts) < 2:
+            return
+        x0, y0 = pts[:-1, 0], pts[:-1, 1]
+        dx, dy = pts[1:, 0] - x0, pts[1:, 1] - y0
+        # 每条线段按长轴逐像素取点 One point per pixel along the major axis of each segment
+        steps = np.maximum(np.abs(dx), np.abs(dy)) + 1
+        seg = np.repeat(np.arange(len(steps)), steps)
+        t = np.arange(int(steps.sum())) - np.repeat(np.cumsum(steps) - steps, steps)
+        scale = t / np.maximum(steps - 1, 1)[seg]
+        xs = x0[seg] + np.rint(dx[seg] * scale).astype(np.int64)
+        ys = y0[seg] + np.rint(dy[seg] * scale).astype(np.int64)
+        self._fill(xs, ys, color)
+        if width >= 1.5:
+            self._fill(xs + 1, ys, color)
+            self._fill(xs, ys + 1, color)
+
+    def line(self, x0, y0, x1, y1, color, width=1):
+        self.polyline([(x0, y0), (x1, y1)], color, width)
+
+    def text(self, x, y, text, anchor, color):
+        # 点阵字体没有的字符留空 Characters the bitmap font lacks are left blank
+        glyphs = [_GLYPHS.get(ch, _GLYPHS[" "]) for ch in str(text).upper()]
+        if not glyphs:
+            return
+        scale = 2
+        # 每个字符 3 列加 1 列间隔 3 columns per character plus 1 column of spacing
+        mask = np.hstack([np.pad(g, ((0, 0), (0, 1))) for g in glyphs])[:, :-1]
+        mask = np.kron(mask, np.ones((scale, scale), dtype=bool))
+        text_w = mask.shape[1]
+        if anchor == "end":
+            x -= text_w
+        elif anchor == "middle":
+            x -= text_w / 2
+        x, y = round(x), round(y) - 5 * scale
+        ys, xs = np.nonzero(mask)
+        self._fill(xs + x, ys + y, color)
+
+    def to_png(self):
+        # 每行前加过滤类型 0 Prefix every scanline with filter type 0
+        raw = np.zeros((self.height, self.width * 3 + 1), dtype=np.uint8)
+        raw[:, 1:] = self.pixels.reshape(self.height, -1)
+
+        def chunk(tag, data):
+            return (
+                struct.pack(">I", len(data))
+                + tag
+                + data
+                + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+            )
+
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+        return (
+            b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+            + chunk(b"IEND", b"")
+        )
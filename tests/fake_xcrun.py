@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+`xcrun xctrace` 的替身脚本，用于在没有 Xcode 的机器上测试录制与导出：
+
+    XCRUN=tests/fake_xcrun.py python xctrace_runner.py -device_ids A B -time_limit 1s
+
+- record：等待 --time-limit 或 SIGINT，然后写出一个最小的 .trace 目录，
+  并记录开始时间作为 toc 的 start-date
+- export：--toc 输出 toc，--xpath 按 schema 输出合成的 fps / sysmon-process 表，
+  行数由环境变量 FAKE_ROWS 决定（默认 400）
+
+Stand-in for `xcrun xctrace`, to test recording and exporting on machines
+without Xcode. `record` waits for --time-limit or SIGINT and writes a
+minimal .trace directory that remembers its start time for the toc
+start-date; `export` writes the toc (--toc) or a synthetic fps /
+sysmon-process table (--xpath) with FAKE_ROWS rows (400 by default).
+"""
+import os
+import sys
+import time
+import signal
+from datetime import datetime, timezone
+
+FLAGS = ("--toc", "--append-run", "--all-process")
+
+
+def fmt_time(ns):
+    seconds = ns // 1_000_000_000
+    ms = (ns // 1_000_000) % 1000
+    us = (ns // 1000) % 1000
+    return f"{seconds // 60:02d}:{seconds % 60:02d}.{ms:03d}.{us:03d}"
+
+
+def fps_xml(rows):
+    out = ['<?xml version="1.0"?>', "<trace-query-result>", '<node xpath="x">',
+           '<schema name="core-animation-fps-estimate"/>']
+    nid = 1
+    seen = {}
+    # xctrace 按时间倒序导出 xctrace exports in reverse chronological order
+    for i in range(rows - 1, -1, -1):
+        ns = i * 250_000_000
+        parts = [f'<start-time id="{nid}" fmt="{fmt_time(ns)}">{ns}</start-time>']
+        nid += 1
+        for tag, value in (("fps", 60 if (i // 40) % 5 else 20 + i % 7), ("percent", float(i % 30))):
+            if (tag, value) in seen:
+                parts.append(f'<{tag} ref="{seen[tag, value]}"/>')
+            else:
+                seen[tag, value] = nid
+                parts.append(f'<{tag} id="{nid}" fmt="{value}">{value}</{tag}>')
+                nid += 1
+        out.append("<row>" + "".join(parts) + "</row>")
+    out += ["</node>", "</trace-query-result>"]
+    return "\n".join(out)
+
+
+def sysmon_xml(rows):
+    out = ['<?xml version="1.0"?>', "<trace-query-result>", '<node xpath="x">',
+           '<schema name="sysmon-process"/>']
+    nid = 1
+    processes = {}
+    for i in range(rows - 1, -1, -1):
+        ns = i * 500_000_000
+        for name, pid in (("Steam", 321), ("backboardd", 55)):
+            parts = [f'<start-time id="{nid}" fmt="{fmt_time(ns)}">{ns}</start-time>']
+            nid += 1
+            if name in processes:
+                parts.append(f'<process ref="{processes[name]}"/>')
+            else:
+                processes[name] = nid
+                parts.append(f'<process id="{nid}" fmt="{name} ({pid})"/>')
+                nid += 1
+            if i % 9 != 3:
+                parts.append(f'<system-cpu-percent id="{nid}" fmt="{i % 50}%">{(i % 50) * 1.5}</system-cpu-percent>')
+                nid += 1
+            for k in range(1, 10):
+                value = (100 + k + i % 13) * 1048576
+                parts.append(f'<size-in-bytes id="{nid}" fmt="{value}">{value}</size-in-bytes>')
+                nid += 1
+            out.append("<row>" + "".join(parts) + "</row>")
+    out += ["</node>", "</trace-query-result>"]
+    return "\n".join(out)
+
+
+def toc_xml(trace_path):
+    start = "2025-01-01T00:00:00Z"
+    start_path = os.path.join(trace_path, "start-date")
+    if os.path.isfile(start_path):
+        with open(start_path) as f:
+            start = f.read().strip()
+    return (
+        '<?xml version="1.0"?><trace-toc><run number="1"><info><target>'
+        '<device platform="iOS" model="iPhone 12" name="Lab iPhone" os-version="16.0" uuid="UDID-1"/>'
+        f"</target><summary><start-date>{start}</start-date><duration>120.0</duration></summary>"
+        '</info><data><table schema="core-animation-fps-estimate"/><table schema="sysmon-process"/></data></run></trace-toc>'
+    )
+
+
+def record(opts):
+    stopped = []
+    signal.signal(signal.SIGINT, lambda *_: stopped.append(True))
+    limit = opts.get("--time-limit", "3s")
+    seconds = float(limit[:-2]) / 1000 if limit.endswith("ms") else float(limit.rstrip("s"))
+    start = datetime.now(timezone.utc)
+    print("Starting recording with the", opts.get("--template"), "on", opts.get("--device"), flush=True)
+    while (datetime.now(timezone.utc) - start).total_seconds() < seconds and not stopped:
+        time.sleep(0.05)
+    out = opts["--output"]
+    os.makedirs(os.path.join(out, "corespace"), exist_ok=True)
+    with open(os.path.join(out, "start-date"), "w") as f:
+        f.write(start.isoformat().replace("+00:00", "Z"))
+    print("Recording completed. Saving output file...", flush=True)
+
+
+def export(opts, flags):
+    rows = int(os.environ.get("FAKE_ROWS", "400"))
+    xpath = opts.get("--xpath", "")
+    if "--toc" in flags:
+        data = toc_xml(opts["--input"])
+    elif "core-animation-fps-estimate" in xpath:
+        data = fps_xml(rows)
+    elif "sysmon-process" in xpath:
+        data = sysmon_xml(rows)
+    else:
+        data = '<?xml version="1.0"?><trace-query-result/>'
+    with open(opts["--output"], "w") as f:
+        f.write(data)
+
+
+def main(argv):
+    if not argv or argv[0] != "xctrace":
+        print(f"unsupported command: {argv}", file=sys.stderr)
+        return 2
+    command = argv[1]
+    opts = {}
+    flags = set()
+    i = 2
+    while i < len(argv):
+        if argv[i] in FLAGS:
+            flags.add(argv[i])
+            i += 1
+        else:
+            opts[argv[i]] = argv[i + 1]
+            i += 2
+    if command == "record":
+        record(opts)
+    elif command == "export":
+        export(opts, flags)
+    else:
+        print(f"unsupported command: {command}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,114 @@
+import math
+
+import numpy as np
+import pytest
+
+from asof_join import AlignedFrame, asof_indices, asof_take, fmt_to_ns, to_ns_columns
+
+LEFT = [0, 10, 20, 25, 40]
+RIGHT = [5, 20, 30]
+
+
+def test_backward():
+    assert asof_indices(LEFT, RIGHT, direction="backward").tolist() == [-1, 0, 1, 1, 2]
+
+
+def test_forward():
+    assert asof_indices(LEFT, RIGHT, direction="forward").tolist() == [0, 1, 1, 2, -1]
+
+
+def test_nearest():
+    assert asof_indices(LEFT, RIGHT, direction="nearest").tolist() == [0, 0, 1, 1, 2]
+
+
+def test_nearest_ties_go_backward():
+    # 10 与 5/15 距离相等，取之前的样本 10 is as far from 5 as from 15, the earlier sample wins
+    assert asof_indices([10], [5, 15], direction="nearest").tolist() == [0]
+
+
+def test_duplicate_right_times():
+    right = [10, 10, 10, 20]
+    assert asof_indices([10], right, direction="backward").tolist() == [2]
+    assert asof_indices([10], right, direction="forward").tolist() == [0]
+    assert asof_indices([15], right, direction="backward").tolist() == [2]
+
+
+def test_tolerance():
+    assert asof_indices(LEFT, RIGHT, tolerance_ns=4, direction="backward").tolist() == [-1, -1, 1, -1, -1]
+    assert asof_indices(LEFT, RIGHT, tolerance_ns=5, direction="backward").tolist() == [-1, 0, 1, 1, -1]
+    assert asof_indices(LEFT, RIGHT, tolerance_ns=5, direction="forward").tolist() == [0, -1, 1, 2, -1]
+    assert asof_indices(LEFT, RIGHT, tolerance_ns=0, direction="nearest").tolist() == [-1, -1, 1, -1, -1]
+
+
+def test_empty_sides():
+    assert asof_indices(LEFT, [], direction="nearest").tolist() == [-1] * len(LEFT)
+    assert asof_indices([], RIGHT).tolist() == []
+    assert np.isnan(asof_take([], np.array([-1, -1]))).all()
+
+
+def test_unknown_direction():
+    with pytest.raises(ValueError):
+        asof_indices(LEFT, RIGHT, direction="sideways")
+
+
+def test_asof_take():
+    taken = asof_take([1.0, 2.0, 3.0], asof_indices(LEFT, RIGHT))
+    assert math.isnan(taken[0])
+    assert taken[1:].tolist() == [1.0, 2.0, 2.0, 3.0]
+
+
+def test_fmt_to_ns():
+    assert fmt_to_ns("00:01.000.000") == 1_000_000_000
+    assert fmt_to_ns("01:02.003.004") == 62_003_004_000
+    assert fmt_to_ns("01:00:00.500.000") == 3_600_500_000_000
+    assert fmt_to_ns("00:05") == 5_000_000_000
+    # 超过纳秒的位数被截断 Digits beyond nanoseconds are truncated
+    assert fmt_to_ns("00:00.123.456.789.9") == 123_456_789
+
+
+def test_to_ns_columns_sorts_descending_input():
+    values = [{"time": "00:02.000.000", "cpu": 2.0}, {"time": "00:01.000.000", "cpu": 1.0}]
+    ts, columns = to_ns_columns(values, ["cpu"])
+    assert ts.tolist() == [1_000_000_000, 2_000_000_000]
+    assert columns["cpu"].tolist() == [1.0, 2.0]
+
+
+def _frame():
+    return AlignedFrame({
+        "ts_ns": np.array([0, 1, 2, 3], dtype=np.int64),
+        "fps": np.array([60.0, 20.0, 25.0, np.nan]),
+        "gpu": np.array([10.0, 90.0, 50.0, 95.0]),
+    })
+
+
+def test_mask():
+    frame = _frame()
+    assert frame.mask("fps < 30").tolist() == [False, True, True, False]
+    assert frame.mask("fps < 30 and gpu > 80").tolist() == [False, True, False, False]
+    assert frame.mask("gpu >= 95").tolist() == [False, False, False, True]
+    assert frame.mask("fps != 60").tolist() == [False, True, True, True]
+    assert frame.mask("gpu > -1e3").all()
+
+
+def test_mask_errors():
+    frame = _frame()
+    with pytest.raises(ValueError):
+        frame.mask("cpu < 30")
+    with pytest.raises(ValueError):
+        frame.mask("fps << 30")
+
+
+def test_from_values_aligns_to_fps_times():
+    fps = [{"time": f"00:0{i}.000.000", "fps": 60.0} for i in range(4)]
+    gpu = [{"time": f"00:0{i}.000.000", "gpu": float(i)} for i in range(4)]
+    cpu = [{"time": "00:00.900.000", "cpu": 5.0}, {"time": "00:02.100.000", "cpu": 7.0}]
+    mem = [{"time": "00:01.000.000", "memory": 100.0, "resident_size": 50.0}]
+    frame = AlignedFrame.from_values(fps, gpu, cpu, mem, tolerance_ns=1_000_000_000)
+    assert frame["gpu"].tolist() == [0.0, 1.0, 2.0, 3.0]
+    # 00:02 距 00:00.9 超过 1 秒，不对齐 00:02 is more than 1 s after 00:00.9, so it is not joined
+    assert np.isnan(frame["cpu"]).tolist() == [True, False, True, False]
+    assert frame["cpu"][[1, 3]].tolist() == [5.0, 7.0]
+    assert math.isnan(frame["mem"][0])
+    assert frame["mem"][1:3].tolist() == [100.0, 100.0]
+    assert math.isnan(frame["mem"][3])
+    assert frame.describe("cpu", frame.mask("gpu >= 2"))["count"] == 1
@@ -0,0 +1,42 @@
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from async_parser import AsyncXCTraceParser
+from xctrace_parser import ASCENDING, XCTraceParser
+
+FAKE_XCRUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_xcrun.py")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XCRUN", FAKE_XCRUN)
+    monkeypatch.setenv("FAKE_ROWS", "60")
+    os.makedirs("temp/parse")
+    return tmp_path
+
+
+def _parse_async(executor):
+    parser = AsyncXCTraceParser("fake.trace", "temp/parse/async.log", "Steam", trace_id="a", executor=executor)
+    asyncio.run(parser.parse_async())
+    return parser
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_parse_async_flips_time_orders(workdir, use_processes):
+    if use_processes:
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            parser = _parse_async(executor)
+    else:
+        parser = _parse_async(None)
+
+    expected = XCTraceParser("fake.trace", "temp/parse/sync.log", "Steam", trace_id="s")
+    expected.parse()
+    assert parser.time_orders == expected.time_orders
+    assert parser.time_orders == {suffix: ASCENDING for suffix in ("fps", "gpu", "cpu", "mem")}
+    assert parser.target_pid == expected.target_pid == 321
+    assert parser.fps_values == expected.fps_values
+    assert parser.mem_values == expected.mem_values
@@ -0,0 +1,84 @@
+import re
+import json
+import math
+import base64
+import zlib
+from array import array
+
+from data_visualizer import CompactDataVisualizer, ParsedData, value_typecode
+from xctrace_parser import XCTraceVisualizer, DataType, ASCENDING
+
+TYPES = {"u32": "I", "f32": "f", "f64": "d"}
+
+
+def _payloads(dv):
+    html = dv.render_embed()
+    payloads = json.loads(re.search(r'<script type="application/json" id="payloads">(.*?)</script>', html).group(1))
+    specs = json.loads(re.search(r'<script type="application/json" id="specs">(.*?)</script>', html).group(1))
+    return payloads, specs
+
+
+def _decode(payload):
+    """与页面中的 decode() 相同：base64 -> inflate -> 小端 typed array Same as decode() in the page"""
+    arr = array(TYPES[payload["type"]])
+    arr.frombytes(zlib.decompress(base64.b64decode(payload["data"])))
+    return list(arr)
+
+
+def test_memory_values_round_trip_at_display_precision():
+    # 几 GB 的内存（MB）超出 float32 的两位小数精度 Several GB of memory in MB exceed float32 at 2 decimals
+    memory = [4096.01, 16384.37, 23456.78, 98765.43]
+    fps = [60.0, 59.5, 30.25, float("nan")]
+    dv = CompactDataVisualizer()
+    dv.add_parsed_data(ParsedData(title="mem", y_label="MEM", y_seq=memory, x_seq=["00:00:01", "00:00:02", "00:00:03", "00:00:04"]))
+    dv.add_parsed_data(ParsedData(title="fps", y_label="FPS", y_seq=fps, x_seq=["00:00:01", "00:00:02", "00:00:03", "00:00:04"]))
+    payloads, specs = _payloads(dv)
+
+    mem_payload = payloads[specs[0]["series"][0]["y"]]
+    assert mem_payload["type"] == "f64"
+    assert [round(v, 2) for v in _decode(mem_payload)] == memory
+
+    fps_payload = payloads[specs[1]["series"][0]["y"]]
+    assert fps_payload["type"] == "f32"
+    decoded = _decode(fps_payload)
+    assert decoded[:3] == fps[:3]
+    assert math.isnan(decoded[3])
+
+    # 两个图表共享同一条整数秒时间轴 Both charts share one whole-second axis
+    assert specs[0]["x"] == specs[1]["x"]
+    assert payloads[specs[0]["x"]]["type"] == "u32"
+    assert _decode(payloads[specs[0]["x"]]) == [1, 2, 3, 4]
+
+
+def test_value_typecode():
+    assert value_typecode([0.0, 12.5, 100.25]) == "f"
+    assert value_typecode([12.34, 99.99]) == "f"
+    assert value_typecode([123456.78]) == "d"
+    assert value_typecode([]) == "f"
+
+
+def _fps_rows(count, step=0.25):
+    rows = []
+    for i in range(count):
+        t = i * step
+        rows.append({"time": f"{int(t) // 60:02d}:{int(t) % 60:02d}.{int(t * 1000) % 1000:03d}.000", "fps": float(i % 61)})
+    return rows
+
+
+def test_large_report_gets_every_sample():
+    rows = _fps_rows(400)
+    default = XCTraceVisualizer("FPS", "t", DataType.FPS, rows, order=ASCENDING).transform_data()
+    full = XCTraceVisualizer("FPS", "t", DataType.FPS, rows, order=ASCENDING, full_resolution=True).transform_data()
+    # 默认按整秒去重 The default keeps one sample per whole second
+    assert len(default.x_seq) == 100
+    assert len(full.x_seq) == 400
+    assert full.x_seq[:3] == [0.0, 0.25, 0.5]
+    assert full.y_seq == [row["fps"] for row in rows]
+
+    dv = CompactDataVisualizer(large=True)
+    dv.add_parsed_data(full)
+    payloads, specs = _payloads(dv)
+    axis = payloads[specs[0]["x"]]
+    assert axis["type"] == "f64"
+    assert _decode(axis) == full.x_seq
+    assert _decode(payloads[specs[0]["series"][0]["y"]]) == full.y_seq
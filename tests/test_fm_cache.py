@@ -0,0 +1,71 @@
+import os
+import json
+
+from data_to_charts import FMCachedParser
+
+
+def _write_fps(path, fps):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump([{"time": f"00:0{i}.000.000", "fps": fps} for i in range(5)], f)
+    return path
+
+
+def _manifest(cache_dir):
+    with open(os.path.join(cache_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+def test_other_scans_keep_their_cache(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    a = _write_fps(str(tmp_path / "a" / "t_fps.json"), 60)
+    b = _write_fps(str(tmp_path / "b" / "t_fps.json"), 30)
+
+    assert FMCachedParser([a], cache_dir).rebuilt == 1
+    assert FMCachedParser([b], cache_dir).rebuilt == 1
+    assert set(_manifest(cache_dir)["files"]) == {os.path.abspath(a), os.path.abspath(b)}
+
+    parser = FMCachedParser([a], cache_dir)
+    assert (parser.rebuilt, parser.reused) == (0, 1)
+    assert len(os.listdir(os.path.join(cache_dir, "series"))) == 2
+
+
+def test_deleted_sources_are_pruned(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    a = _write_fps(str(tmp_path / "a" / "t_fps.json"), 60)
+    b = _write_fps(str(tmp_path / "b" / "t_fps.json"), 30)
+    FMCachedParser([a], cache_dir)
+    FMCachedParser([b], cache_dir)
+
+    os.remove(a)
+    FMCachedParser([b], cache_dir)
+    assert set(_manifest(cache_dir)["files"]) == {os.path.abspath(b)}
+    assert len(os.listdir(os.path.join(cache_dir, "series"))) == 1
+
+
+def test_version_change_invalidates_the_cache(tmp_path, monkeypatch):
+    import data_to_charts
+
+    cache_dir = str(tmp_path / "cache")
+    a = _write_fps(str(tmp_path / "a" / "t_fps.json"), 60)
+    FMCachedParser([a], cache_dir)
+    assert _manifest(cache_dir)["version"] == data_to_charts.CACHE_VERSION
+    assert FMCachedParser([a], cache_dir).reused == 1
+
+    monkeypatch.setattr(data_to_charts, "CACHE_VERSION", data_to_charts.CACHE_VERSION + 1)
+    parser = FMCachedParser([a], cache_dir)
+    assert (parser.rebuilt, parser.reused) == (1, 0)
+    assert _manifest(cache_dir)["version"] == data_to_charts.CACHE_VERSION
+
+
+def test_unversioned_manifest_is_discarded(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    a = _write_fps(str(tmp_path / "a" / "t_fps.json"), 60)
+    FMCachedParser([a], cache_dir)
+    files = _manifest(cache_dir)["files"]
+    # 旧格式：没有版本号的扁平 manifest The old flat manifest without a version
+    with open(os.path.join(cache_dir, "manifest.json"), "w") as f:
+        json.dump(files, f)
+    parser = FMCachedParser([a], cache_dir)
+    assert (parser.rebuilt, parser.reused) == (1, 0)
+    assert len(os.listdir(os.path.join(cache_dir, "series"))) == 1
@@ -0,0 +1,35 @@
+import json
+
+from data_to_charts import FMJsonParser, XCTraceVisualizer, DataType
+from xctrace_parser import ASCENDING, DESCENDING
+
+
+def _write_fps(path, seconds):
+    rows = [{"time": f"00:{s:02d}.{ms:03d}.000", "fps": float(s)} for s in seconds for ms in (0, 500)]
+    with open(path, "w") as f:
+        json.dump(rows, f)
+    return rows
+
+
+def test_saved_json_keeps_its_order(tmp_path):
+    rows = _write_fps(tmp_path / "t_fps.json", range(4))
+    parser = FMJsonParser([str(tmp_path / "t_fps.json")])
+    # save() 写出的升序数据不再反转 Ascending save() output is not reversed
+    assert parser.fps_values_dict["t_fps"] == rows
+    assert parser.orders == {"t_fps": ASCENDING}
+
+    data = XCTraceVisualizer(
+        "FPS", parser.trace_id, DataType.FPS, parser.fps_values_dict, parser.fps_file_names, orders=parser.orders
+    ).transform_data()
+    assert data.x_seq == ["00:00:00", "00:00:01", "00:00:02", "00:00:03"]
+    assert data.y_seq["t_fps"] == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_descending_json_is_sorted(tmp_path):
+    _write_fps(tmp_path / "t_fps.json", range(3, -1, -1))
+    parser = FMJsonParser([str(tmp_path / "t_fps.json")])
+    assert parser.orders == {"t_fps": DESCENDING}
+    data = XCTraceVisualizer(
+        "FPS", parser.trace_id, DataType.FPS, parser.fps_values_dict, parser.fps_file_names, orders=parser.orders
+    ).transform_data()
+    assert data.x_seq == ["00:00:00", "00:00:01", "00:00:02", "00:00:03"]
@@ -0,0 +1,125 @@
+import tracemalloc
+
+from column_spill import OutOfCoreParser, _process_info
+from string_pool import StringPool
+from xctrace_parser import XCTraceParser, CompactElement, RefCache
+
+
+def _write_sysmon_xml(path, rows):
+    """
+    合成 sysmon-process 导出：两个进程交替，每个 size-in-bytes 都有新的 id
+    A synthetic sysmon-process export: two processes per sample and a fresh id
+    for every size-in-bytes, like a long recording.
+    """
+    nid = 1
+    processes = {}
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0"?>\n<trace-query-result>\n<node xpath="x">\n<schema name="sysmon-process"/>\n')
+        for i in range(rows):
+            ns = i * 500_000_000
+            for name, pid in (("Steam", 321), ("backboardd", 55)):
+                parts = [f'<start-time id="{nid}" fmt="00:{i % 60:02d}.000.000">{ns}</start-time>']
+                nid += 1
+                if name in processes:
+                    parts.append(f'<process ref="{processes[name]}"/>')
+                else:
+                    processes[name] = nid
+                    parts.append(f'<process id="{nid}" fmt="{name} ({pid})"/>')
+                    nid += 1
+                parts.append(f'<system-cpu-percent id="{nid}" fmt="{i % 50}%">{i % 50}</system-cpu-percent>')
+                nid += 1
+                for k in range(1, 10):
+                    value = (100 + k + i % 13) * 1048576
+                    parts.append(f'<size-in-bytes id="{nid}" fmt="{value}">{value}</size-in-bytes>')
+                    nid += 1
+                f.write("<row>" + "".join(parts) + "</row>\n")
+        f.write("</node>\n</trace-query-result>\n")
+    return path
+
+
+def _parser(tmp_path):
+    parser = XCTraceParser("x", str(tmp_path / "parse.log"), "Steam", "m")
+    parser.print_log = lambda message: None
+    return parser
+
+
+def _peak_bytes(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_stream_rows_memory_is_flat(tmp_path):
+    peaks = {}
+    for rows in (1000, 4000):
+        xml_path = _write_sysmon_xml(tmp_path / f"sysmon_{rows}.xml", rows)
+        parser = _parser(tmp_path)
+        state = {"cache": RefCache(max_entries=2048)}
+
+        def run():
+            count = 0
+            for _ in parser._iter_cpu_mem(str(xml_path), state=state):
+                count += 1
+            assert count == rows
+
+        peaks[rows] = _peak_bytes(run)
+        assert state["cache"].spilled > 0
+        state["cache"].close()
+    # 行数变为 4 倍，峰值内存基本不变 4x the rows, about the same peak memory
+    assert peaks[4000] < peaks[1000] * 1.5
+
+
+def test_out_of_core_memory_is_flat(tmp_path):
+    peaks = {}
+    for rows in (1000, 4000):
+        xml_path = _write_sysmon_xml(tmp_path / f"sysmon_{rows}.xml", rows)
+        parser = OutOfCoreParser("x", str(tmp_path / "parse.log"), "m", memory_budget=1 << 20)
+        parser.print_log = lambda message: None
+
+        def run():
+            samples = parser.parse_all_processes(xml_path=str(xml_path))
+            assert len(samples) == rows * 2
+
+        peaks[rows] = _peak_bytes(run)
+        parser.cleanup()
+    assert peaks[4000] < peaks[1000] * 1.5
+
+
+def test_ref_cache_resolves_spilled_ids():
+    cache = RefCache(max_entries=4)
+    for i in range(1, 21):
+        cache[str(i)] = CompactElement("size-in-bytes", str(i), f"{i} B")
+    assert cache.spilled > 0
+    assert len(cache._hot) <= 4
+    for i in range(1, 21):
+        assert cache[str(i)].text == str(i)
+        assert cache.get(str(i)).get("fmt") == f"{i} B"
+    assert cache.get("99") is None
+    cache.close()
+
+
+def test_parsing_does_not_decode_the_bundle_string_table(tmp_path, monkeypatch):
+    from string_pool import StringPool
+
+    def load(*args, **kwargs):
+        raise AssertionError("uniquing table decoded")
+
+    monkeypatch.setattr(StringPool, "load", classmethod(load))
+    xml_path = _write_sysmon_xml(tmp_path / "sysmon.xml", 10)
+    parser = _parser(tmp_path)
+    cpu, mem = parser._read_cpu_mem(str(xml_path))
+    assert len(cpu) == len(mem) == 10
+    # 只驻留解析中遇到的名字 Only names seen while parsing are interned
+    assert sorted(parser.string_pool.strings) == ["Steam", "backboardd"]
+
+
+def test_spill_process_names_match_the_parser():
+    pool = StringPool()
+    # 与 XCTraceParser 相同只取第一个词 Only the first word, like XCTraceParser
+    name_id, pid = _process_info(pool, "Steam Helper (42)")
+    assert (pool.lookup(name_id), pid) == ("Steam", 42)
+    name_id, pid = _process_info(pool, "kernel_task")
+    assert (pool.lookup(name_id), pid) == ("kernel_task", -1)
@@ -0,0 +1,33 @@
+import pytest
+
+from metrics_store import MetricsStore
+
+
+def _fps(count, value):
+    return [{"time": f"00:{i // 60:02d}:{i % 60:02d}", "fps": value} for i in range(count)]
+
+
+def test_failed_ingest_keeps_the_previous_trace(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.db"), batch_size=10)
+    store.ingest("t1", {"fps": _fps(50, 60.0)}, process="Steam")
+
+    # 第 3 批中途出错 Fail in the middle of the third batch
+    broken = _fps(50, 30.0)
+    del broken[25]["time"]
+    with pytest.raises(KeyError):
+        store.ingest("t1", {"fps": broken}, process="Steam")
+
+    values = store.query("fps", traces=["t1"])["t1"]
+    assert len(values) == 50
+    assert {value for _, value in values} == {60.0}
+    assert store.summaries(["t1"])[0]["count"] == 50
+    store.close()
+
+
+def test_ingest_replaces_a_trace(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.db"), batch_size=10)
+    store.ingest("t1", {"fps": _fps(50, 60.0)}, process="Steam")
+    store.ingest("t1", {"fps": _fps(20, 30.0)}, process="Steam")
+    assert len(store.query("fps", traces=["t1"])["t1"]) == 20
+    assert store.summaries(["t1"])[0]["avg"] == 30.0
+    store.close()
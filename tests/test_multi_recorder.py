@@ -0,0 +1,59 @@
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import xctrace_runner
+from xctrace_runner import XCTraceMultiRecorder, XCTraceRecorder
+
+FAKE_XCRUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_xcrun.py")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # 导入之后再设置 XCRUN 也会生效 XCRUN set after import still takes effect
+    monkeypatch.setenv("XCRUN", FAKE_XCRUN)
+    monkeypatch.setenv("FAKE_ROWS", "40")
+    for d in ("temp/parse", "temp/save", "temp/visualize"):
+        os.makedirs(d)
+    return tmp_path
+
+
+def _start_date(trace_path):
+    with open(os.path.join(trace_path, "start-date")) as f:
+        return datetime.fromisoformat(f.read().strip().replace("Z", "+00:00")).timestamp()
+
+
+def test_records_two_fake_devices_at_once(workdir):
+    multi_recorder = XCTraceMultiRecorder("fake.tracetemplate", ["UDID-A", "UDID-B"], "Steam", max_workers=2)
+    results = multi_recorder.run(time_limit="1s")
+
+    assert set(results) == {"UDID-A", "UDID-B"}
+    for html_path in results.values():
+        assert html_path is not None and os.path.isfile(html_path)
+    starts = [_start_date(recorder.output_trace_path) for recorder in multi_recorder.recorders]
+    # 两台设备同时录制，而不是依次录制 Both devices record at the same time, not one after the other
+    assert abs(starts[0] - starts[1]) < 0.5
+
+
+def test_start_failure_stops_started_devices(workdir, monkeypatch):
+    real_start = XCTraceRecorder.start
+    calls = []
+
+    def start(recorder, time_limit=None, new_session=False):
+        calls.append(recorder)
+        if len(calls) == 2:
+            raise OSError("device not found")
+        return real_start(recorder, time_limit=time_limit, new_session=new_session)
+
+    monkeypatch.setattr(xctrace_runner.XCTraceRecorder, "start", start)
+    multi_recorder = XCTraceMultiRecorder("fake.tracetemplate", ["UDID-A", "UDID-B"], "Steam", max_workers=1)
+    begin = time.time()
+    with pytest.raises(OSError):
+        multi_recorder.run(time_limit="60s")
+
+    first = calls[0]
+    assert first.proc.poll() is not None
+    assert time.time() - begin < 30
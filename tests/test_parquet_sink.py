@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from parquet_sink import ArrowSink, open_dataset
+
+
+def _series(value):
+    return {"fps": [{"time": f"00:0{i}.000.000", "fps": value} for i in range(3)]}
+
+
+def test_rewrite_with_another_process_removes_old_partitions(tmp_path):
+    root = str(tmp_path / "arrow")
+    sink = ArrowSink(root)
+    sink.write("run 1", _series(60.0), process="Steam")
+    sink.write("other", _series(50.0), process="Steam")
+    sink.write("run 1", _series(30.0), process="Game")
+
+    assert sorted(os.listdir(os.path.join(root, "trace=run%201"))) == ["process=Game"]
+    table = open_dataset(root).to_table().to_pydict()
+    rows = sorted(zip(table["trace"], table["process"], table["value"]))
+    assert rows == [("other", "Steam", 50.0)] * 3 + [("run 1", "Game", 30.0)] * 3
+
+
+def test_failed_write_keeps_the_old_partitions(tmp_path, monkeypatch):
+    import pyarrow.dataset
+
+    root = str(tmp_path / "arrow")
+    sink = ArrowSink(root)
+    sink.write("run 1", _series(60.0), process="Steam")
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pyarrow.dataset, "write_dataset", fail)
+    with pytest.raises(OSError):
+        sink.write("run 1", _series(30.0), process="Game")
+    # 旧分区保留，临时目录已清理 The old partition survives and no staging directory is left
+    assert os.listdir(root) == ["trace=run%201"]
+    assert open_dataset(root).to_table().to_pydict()["value"] == [60.0] * 3
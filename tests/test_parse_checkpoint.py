@@ -0,0 +1,96 @@
+import os
+import json
+import argparse
+
+import pytest
+
+from parse_checkpoint import ResumableParser, JournaledRefCache
+from xctrace_parser import XCTraceParser, CompactElement, add_parse_arguments, run_parse
+
+FAKE_XCRUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_xcrun.py")
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _result(parser):
+    return (
+        parser.fps_values,
+        parser.gpu_values,
+        parser.cpu_values,
+        parser.mem_values,
+        parser.time_orders,
+        parser.target_pid,
+    )
+
+
+@pytest.fixture
+def fake_trace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XCRUN", FAKE_XCRUN)
+    monkeypatch.setenv("FAKE_ROWS", "40")
+    os.makedirs("temp/parse")
+    # 很小的 id 缓存，恢复与解析时都会落盘 A tiny id cache, so both restore and parsing spill
+    monkeypatch.setattr(ResumableParser, "ref_cache_entries", 8)
+    return "demo.trace"
+
+
+def _resumable(trace_path, resume):
+    trace_id = ResumableParser.resume_trace_id(trace_path) if resume else "ck"
+    parser = ResumableParser(trace_path, f"./temp/parse/{trace_id}_parse.log", "Steam",
+                             trace_id=trace_id, resume=resume, checkpoint_rows=7)
+    parser.print_log = lambda message: None
+    return parser
+
+
+@pytest.mark.parametrize("interrupt_at", [1, 2, 3, 5, 7])
+def test_resume_matches_an_uninterrupted_parse(fake_trace, monkeypatch, interrupt_at):
+    expected = XCTraceParser(fake_trace, "./temp/parse/full_parse.log", "Steam", trace_id="full")
+    expected.print_log = lambda message: None
+    expected.parse()
+
+    real_save = ResumableParser._save_stage
+    calls = []
+
+    def save_then_stop(self, *args):
+        real_save(self, *args)
+        calls.append(True)
+        if len(calls) == interrupt_at:
+            raise Interrupted()
+
+    monkeypatch.setattr(ResumableParser, "_save_stage", save_then_stop)
+    with pytest.raises(Interrupted):
+        _resumable(fake_trace, resume=False).parse()
+    monkeypatch.setattr(ResumableParser, "_save_stage", real_save)
+
+    resumed = _resumable(fake_trace, resume=True)
+    resumed.parse()
+    assert resumed.trace_id == "ck"
+    assert _result(resumed) == _result(expected)
+
+
+def test_journal_is_written_once_per_id(tmp_path):
+    journal_path = tmp_path / "refs.ndjson"
+    with open(journal_path, "w") as journal:
+        cache = JournaledRefCache(journal, max_entries=4)
+        for i in range(1, 11):
+            cache[str(i)] = CompactElement("size-in-bytes", str(i), None)
+            cache[str(i)] = CompactElement("size-in-bytes", str(i), None)
+        # 读回落盘的 id 不再记录 Reading back a spilled id does not journal it again
+        assert cache.get("1").text == "1"
+        cache.close()
+    with open(journal_path) as f:
+        keys = [json.loads(line)[0] for line in f]
+    assert keys == [str(i) for i in range(1, 11)]
+    assert len(cache._hot) <= 4
+
+
+def test_stream_rejects_checkpoints(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    arg_parser = argparse.ArgumentParser()
+    add_parse_arguments(arg_parser)
+    for extra in (["-resume"], ["-checkpoint_rows", "10"]):
+        args = arg_parser.parse_args(["-trace_path", "x.trace", "-target_process_name", "Steam", "-stream", "ndjson"] + extra)
+        with pytest.raises(ValueError):
+            run_parse(args)
@@ -0,0 +1,115 @@
+import os
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import query_server
+from query_server import TraceDirectory, TraceCache, make_handler
+
+
+def _write_trace(save_dir, trace_id, times=(1, 2, 3)):
+    for suffix, field in (("fps", "fps"), ("cpu", "cpu")):
+        d = save_dir / suffix
+        d.mkdir(parents=True, exist_ok=True)
+        rows = [{"time": f"00:{t:02d}.000.000", field: float(t)} for t in times]
+        (d / f"{trace_id}_{suffix}.json").write_text(json.dumps(rows))
+
+
+def _count_walks(monkeypatch):
+    walks = []
+    real_walk = os.walk
+
+    def walk(*args, **kwargs):
+        walks.append(args[0])
+        return real_walk(*args, **kwargs)
+
+    monkeypatch.setattr(query_server.os, "walk", walk)
+    return walks
+
+
+def test_index_is_cached_until_a_directory_changes(tmp_path, monkeypatch):
+    _write_trace(tmp_path, "a")
+    walks = _count_walks(monkeypatch)
+    directory = TraceDirectory(str(tmp_path))
+    assert directory.trace_ids() == ["a"]
+    assert directory.trace_ids() == ["a"]
+    directory.load("a")
+    assert len(walks) == 1
+
+    # 新文件写入已有的子目录 A new file lands in an existing subdirectory
+    _write_trace(tmp_path, "b")
+    assert directory.trace_ids() == ["a", "b"]
+    assert len(walks) == 2
+    os.remove(tmp_path / "fps" / "b_fps.json")
+    os.remove(tmp_path / "cpu" / "b_cpu.json")
+    assert directory.trace_ids() == ["a"]
+
+
+def test_missing_directory_is_picked_up_once_created(tmp_path):
+    directory = TraceDirectory(str(tmp_path / "save"))
+    assert directory.trace_ids() == []
+    _write_trace(tmp_path / "save", "a")
+    assert directory.trace_ids() == ["a"]
+
+
+class BrokenLoader:
+    def summaries(self):
+        return {}
+
+    def trace_ids(self):
+        return ["bad"]
+
+    def load(self, trace_id):
+        raise RuntimeError("corrupt trace")
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(loader):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(TraceCache(loader, 1 << 20)))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_series_and_errors(tmp_path, serve):
+    _write_trace(tmp_path, "a", times=range(10))
+    base = serve(TraceDirectory(str(tmp_path)))
+    status, traces = _get(f"{base}/traces")
+    assert status == 200
+    assert [item["trace"] for item in traces] == ["a"]
+
+    status, series = _get(f"{base}/series?trace=a&metric=cpu&start=2&end=4")
+    assert status == 200
+    assert series["ts"] == [2.0, 3.0, 4.0]
+    assert series["value"] == [2.0, 3.0, 4.0]
+
+    assert _get(f"{base}/series?trace=missing")[0] == 404
+    assert _get(f"{base}/series?trace=a&metric=nope")[0] == 400
+    assert _get(f"{base}/nope")[0] == 404
+
+
+def test_unexpected_errors_answer_500(serve):
+    base = serve(BrokenLoader())
+    status, body = _get(f"{base}/series?trace=bad")
+    assert status == 500
+    assert "corrupt trace" in body["error"]
@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+
+from regression_compare import compare, load_series, trace_block_ids, bootstrap_stats, quantile_edges
+
+
+def test_blocks_restart_at_every_trace():
+    assert trace_block_ids([5, 3], 2).tolist() == [0, 0, 1, 1, 2, 3, 3, 4]
+    assert trace_block_ids([3, 3], 10).tolist() == [0, 0, 0, 1, 1, 1]
+
+
+def test_bootstrap_never_mixes_traces():
+    # 每个 trace 只有一个块：抽样的 bad-time 占比只能是整块的组合
+    # One block per trace: a resampled bad-time share is a mix of whole traces only
+    parts = [np.full(6, 10.0), np.full(6, 50.0)]
+    edges = quantile_edges(np.concatenate(parts))
+    rng = np.random.default_rng(0)
+    _, boot = bootstrap_stats(parts, 30.0, "lower", 0.1, edges, rng, 200, block=10)
+    assert set(np.round(boot[:, 2], 6).tolist()) <= {0.0, 0.5, 1.0}
+
+
+def _save(directory, name, field, values):
+    directory.mkdir(parents=True, exist_ok=True)
+    rows = [{"time": f"00:{i // 60:02d}.{i % 60:03d}.000", field: v} for i, v in enumerate(values)]
+    with open(directory / f"{name}_{field}.json", "w") as f:
+        json.dump(rows, f)
+
+
+def test_compare_flags_a_shifted_candidate(tmp_path):
+    rng = np.random.default_rng(1)
+    for run in range(3):
+        _save(tmp_path / "base", f"t{run}", "fps", (60 + rng.normal(0, 2, 300)).tolist())
+        _save(tmp_path / "same", f"t{run}", "fps", (60 + rng.normal(0, 2, 300)).tolist())
+        _save(tmp_path / "slow", f"t{run}", "fps", (40 + rng.normal(0, 2, 300)).tolist())
+    baseline = load_series([str(tmp_path / "base")], ["fps"])
+    assert [len(part) for part in baseline["fps"]] == [300, 300, 300]
+
+    same = compare(baseline, load_series([str(tmp_path / "same")], ["fps"]), resamples=200)
+    assert not any(d.regression for d in same)
+    slow = compare(baseline, load_series([str(tmp_path / "slow")], ["fps"]), resamples=200)
+    assert {d.stat for d in slow if d.regression} >= {"median", "p10"}
@@ -0,0 +1,128 @@
+import os
+import json
+import random
+from collections import deque
+from concurrent.futures import Future
+
+from xctrace_parser import merge_sorted_series
+from xctrace_runner import XCTraceSegmentRecorder, merge_into, read_toc_start
+
+
+def _segment(rng, start, length):
+    return [{"time": start + rng.randint(0, length * 2), "seg": start} for _ in range(length)]
+
+
+def test_merge_into_matches_a_full_merge():
+    rng = random.Random(7)
+    combined = []
+    expected = []
+    for start in (0, 10, 15, 40, 39, 100):
+        segment = sorted(_segment(rng, start, 8), key=lambda item: item["time"])
+        merge_into(combined, segment, key=lambda item: item["time"])
+        expected = merge_sorted_series([expected, segment])
+    assert combined == expected
+
+
+def test_merge_into_only_touches_the_overlapping_tail():
+    calls = []
+
+    def key(item):
+        calls.append(item)
+        return item["time"]
+
+    combined = [{"time": t} for t in range(10000)]
+    merge_into(combined, [{"time": t} for t in range(10000, 10010)], key=key)
+    assert len(combined) == 10010
+    assert len(calls) < 100
+
+
+FAKE_XCRUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_xcrun.py")
+
+
+def _ndjson_times(path):
+    with open(path) as f:
+        return [json.loads(line)["time"] for line in f]
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def test_segment_offset_comes_from_the_toc_start(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("temp/save")
+    recorder = XCTraceSegmentRecorder("t.tracetemplate", "UDID", "Steam", "60s")
+    values = [{"time": "00:01.000.000", "fps": 60.0}]
+    mem = [{"time": "00:01.000.000", "memory": 1.0, "resident_size": 1.0}]
+    start = 1_700_000_000.0
+    # 第 1 段的墙钟偏移含 3 秒启动耗时 The wall clock offset of segment 1 includes 3 s of startup latency
+    pending = deque([
+        (0.0, _done((values, values, mem, start))),
+        (63.0, _done((values, values, mem, start + 60.0))),
+    ])
+    recorder._collect(pending, block=True)
+
+    assert [item["time"] for item in recorder.fps_values] == ["00:00:01.000.000", "00:01:01.000.000"]
+    # 最新分段的行还可能被之后的分段归并，暂不追加 Rows of the newest segment may still be merged, not appended yet
+    assert _ndjson_times(f"temp/save/{recorder.id}_fps.ndjson") == ["00:00:01.000.000"]
+    # 合并的 json 只在结束时生成 The combined json is only written at the end
+    assert not os.path.exists(f"temp/save/{recorder.id}_fps.json")
+    recorder._append()
+    assert _ndjson_times(f"temp/save/{recorder.id}_fps.ndjson") == ["00:00:01.000.000", "00:01:01.000.000"]
+
+
+def test_ndjson_matches_the_merged_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("temp/save")
+    recorder = XCTraceSegmentRecorder("t.tracetemplate", "UDID", "Steam", "10s", render_every=0)
+    start = 1_700_000_000.0
+    # 分段 1 的开始时间早于分段 0 的最后一行，两段在时间上重叠
+    # Segment 1 starts before the last row of segment 0, so the two overlap in time
+    pending = deque()
+    for index, times in enumerate(((0, 4, 8, 12), (1, 3, 9), (2, 5))):
+        values = [{"time": f"00:{t:02d}.000.000", "fps": float(index)} for t in times]
+        mem = [{"time": item["time"], "memory": 1.0, "resident_size": 1.0} for item in values]
+        pending.append((index * 10.0, _done((values, values, mem, start + index * 10.0))))
+    recorder._collect(pending, block=True)
+    recorder._append()
+    recorder.save()
+
+    with open(f"temp/save/{recorder.id}_fps.json") as f:
+        saved = [item["time"] for item in json.load(f)]
+    assert _ndjson_times(f"temp/save/{recorder.id}_fps.ndjson") == saved
+    assert saved == sorted(saved)
+
+
+def test_partial_report_is_rendered_while_recording(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XCRUN", FAKE_XCRUN)
+    monkeypatch.setenv("FAKE_ROWS", "20")
+    for d in ("temp/parse", "temp/save", "temp/visualize"):
+        os.makedirs(d)
+    recorder = XCTraceSegmentRecorder("t.tracetemplate", "UDID", "Steam", "1s", max_workers=1, render_every=1)
+    rendered = []
+    real_render = recorder.render
+
+    def render():
+        html_path = real_render()
+        rendered.append((recorder.segment_count, os.path.isfile(html_path)))
+        return html_path
+
+    recorder.render = render
+    recorder.run(segment_count=3)
+    # 录制结束前已有部分报告 A partial report exists before recording ends
+    assert (1, True) in rendered
+    assert rendered[-1] == (3, True)
+
+
+def test_read_toc_start(tmp_path):
+    toc_path = tmp_path / "toc.xml"
+    toc_path.write_text(
+        '<trace-toc><run number="1"><info><summary>'
+        "<start-date>2025-01-01T00:00:10Z</start-date>"
+        "</summary></info></run></trace-toc>"
+    )
+    assert read_toc_start(str(toc_path)) == 1735689610.0
+    assert read_toc_start(str(tmp_path / "missing.xml")) is None
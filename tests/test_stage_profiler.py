@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from stage_profiler import StageProfiler
+from xctrace_parser import XCTraceParser
+
+FAKE_XCRUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_xcrun.py")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XCRUN", FAKE_XCRUN)
+    monkeypatch.setenv("FAKE_ROWS", "20")
+    os.makedirs("temp/parse")
+    return tmp_path
+
+
+def test_stream_profiles_each_schema(workdir):
+    parser = XCTraceParser("fake.trace", "temp/parse/parse.log", "Steam", trace_id="s")
+    parser.profiler = StageProfiler("temp/parse", "s", cpu=True, memory=False)
+    parser.stream(output_dir="temp/save")
+
+    stages = [item.stage for item in parser.profiler.stats]
+    assert "parse_core-animation-fps-estimate" in stages
+    assert "parse_sysmon-process" in stages
+    for item in parser.profiler.stats:
+        assert os.path.isfile(item.profile_path)
@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只在出报告时才需要的模块 Modules only needed to render reports
+REPORT_MODULES = ("pyecharts", "selenium", "numpy", "data_visualizer")
+
+# 导入 xctrace_parser 到第一次 export 的耗时上限（不含解释器启动）
+# Budget from `import xctrace_parser` to the first export, interpreter startup excluded
+STARTUP_BUDGET_S = 0.2
+
+# 子进程：计时导入与 parse_only，在第一次 export 时停下并报告已加载的模块
+# Child process: time the import and parse_only, stop at the first export and
+# report which modules are loaded
+PROBE = """
+import sys, json, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import xctrace_parser, xctrace_cli
+
+def first_export(self):
+    print(json.dumps({{
+        "elapsed": time.perf_counter() - started,
+        "loaded": [m for m in {modules!r} if m in sys.modules],
+    }}))
+    raise SystemExit(0)
+
+xctrace_parser.XCTraceParser._export_toc = first_export
+xctrace_cli.main(["parse", "-trace_path", "x.trace", "-target_process_name", "Steam"{extra}])
+"""
+
+
+def _probe(tmp_path, extra=()):
+    code = PROBE.format(root=ROOT, modules=REPORT_MODULES, extra="".join(f", {arg!r}" for arg in extra))
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_parse_only_does_not_load_report_modules(tmp_path):
+    for extra in ((), ("-stream", "ndjson")):
+        probe = _probe(tmp_path, extra)
+        assert probe["loaded"] == [], extra
+        assert probe["elapsed"] < STARTUP_BUDGET_S, f"{extra}: {probe['elapsed'] * 1000:.1f} ms to the first export"
+
+
+def test_import_parser_does_not_load_report_modules():
+    code = (
+        "import sys, xctrace_parser, xctrace_cli\n"
+        f"print(','.join(m for m in {REPORT_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,38 @@
+import os
+import zlib
+import threading
+
+from store_loader import StoreLoader
+
+
+def _write_store(directory, name, payload):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(zlib.compress(payload))
+    return path
+
+
+def _run_with_timeout(target, timeout=30):
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(target()), daemon=True)
+    worker.start()
+    worker.join(timeout)
+    assert not worker.is_alive(), "StoreLoader 死锁 deadlocked"
+    return result
+
+
+def test_budget_smaller_than_two_chunks(tmp_path):
+    payloads = [os.urandom(64 * 1024) * 4 for _ in range(4)]
+    paths = [_write_store(tmp_path, f"store{i}", data) for i, data in enumerate(payloads)]
+    for budget in (1024, 4096, 16 * 1024):
+        loader = StoreLoader(max_workers=4, budget_bytes=budget, chunk_size=16 * 1024)
+        result = _run_with_timeout(lambda: loader.load(paths))
+        assert [result[p] for p in paths] == payloads
+        assert loader.peak_bytes <= max(budget, 16 * 1024)
+
+
+def test_budget_is_released_before_waiting(tmp_path):
+    paths = [_write_store(tmp_path, f"store{i}", bytes([i]) * 200 * 1024) for i in range(3)]
+    loader = StoreLoader(max_workers=3, budget_bytes=16 * 1024, chunk_size=16 * 1024)
+    sizes = _run_with_timeout(lambda: {c.path: c.size for c in loader.iter_chunks(paths) if c.last})
+    assert sizes == {p: 200 * 1024 for p in paths}
@@ -0,0 +1,22 @@
+import zlib
+
+import pytest
+
+from stream_sinks import open_sink, _Sink
+
+
+def test_gzip_output_is_readable_while_writing(tmp_path):
+    sink = open_sink(str(tmp_path / "m_cpu"), "ndjson", ["time", "cpu"], compress=True, flush_rows=100)
+    for i in range(250):
+        sink.write({"time": f"00:{i:02d}", "cpu": float(i)})
+    # 未关闭时读取已写出的部分 Read what has been written before the sink is closed
+    with open(sink.path, "rb") as f:
+        data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(f.read())
+    lines = data.decode("utf-8").splitlines()
+    assert len(lines) == 200
+    sink.close()
+
+
+def test_sink_requires_a_row_writer(tmp_path):
+    with pytest.raises(TypeError):
+        _Sink(str(tmp_path / "x"))
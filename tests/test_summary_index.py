@@ -0,0 +1,26 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from xctrace_parser import XCTraceParser
+
+
+def _save_summary(output_dir, trace_id):
+    parser = XCTraceParser("x", os.path.join(output_dir, "parse.log"), "Steam", trace_id)
+    parser.print_log = lambda message: None
+    parser.fps_values = [{"time": f"00:0{i}.000.000", "fps": 60.0} for i in range(3)]
+    parser.save_summary(output_dir)
+    return trace_id
+
+
+def test_concurrent_summaries_keep_every_index_entry(tmp_path):
+    output_dir = str(tmp_path)
+    trace_ids = [f"trace{i}" for i in range(16)]
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        list(pool.map(_save_summary, [output_dir] * len(trace_ids), trace_ids))
+
+    summary_dir = os.path.join(output_dir, "summary")
+    with open(os.path.join(summary_dir, "index.json")) as f:
+        index = json.load(f)
+    assert sorted(index) == sorted(trace_ids)
+    assert not [name for name in os.listdir(summary_dir) if name.endswith(".tmp")]
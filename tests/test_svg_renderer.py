@@ -0,0 +1,98 @@
+import math
+import zlib
+import struct
+
+from svg_renderer import StaticVisualizer, minmax_indices, _runs, _Canvas, _fmt_x, BACKGROUND, TEXT_COLOR
+
+
+class Chart:
+    def __init__(self, title, x_seq, y_seq, y_label="fps"):
+        self.title = title
+        self.x_seq = x_seq
+        self.y_seq = y_seq
+        self.y_label = y_label
+
+
+def _decode_png(data):
+    """最小的 PNG 解码：8 位 RGB，过滤类型 0 Minimal decoder for 8-bit RGB with filter type 0"""
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos = 8
+    chunks = {}
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos:pos + 4])
+        tag = data[pos + 4:pos + 8]
+        body = data[pos + 8:pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])
+        assert crc == zlib.crc32(tag + body) & 0xFFFFFFFF
+        chunks[tag] = body
+        pos += 12 + length
+    width, height, depth, color_type = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    assert (depth, color_type) == (8, 2)
+    raw = zlib.decompress(chunks[b"IDAT"])
+    stride = width * 3 + 1
+    rows = [raw[r * stride:(r + 1) * stride] for r in range(height)]
+    assert all(row[0] == 0 for row in rows)
+    return width, height, [row[1:] for row in rows]
+
+
+def _pixel(rows, x, y):
+    return tuple(rows[y][x * 3:x * 3 + 3])
+
+
+def test_minmax_indices_keeps_the_extremes_of_each_bucket():
+    values = [0, 5, 1, 9, 2, 3, -4, 7]
+    assert minmax_indices(values, 2) == [0, 3, 6, 7]
+    # 点数不超过 2 * buckets 时全部保留 Every point is kept when there are at most 2 * buckets
+    assert minmax_indices(values, 4) == list(range(8))
+
+
+def test_minmax_indices_skips_gaps():
+    values = [1, None, 3, float("nan"), 5]
+    assert minmax_indices(values, 10) == [0, 2, 4]
+
+
+def test_runs_break_at_gaps():
+    values = [1, 2, None, 4, float("nan"), float("nan"), 7, 8]
+    indices = minmax_indices(values, 10)
+    assert list(_runs(values, indices)) == [[0, 1], [3], [6, 7]]
+    assert list(_runs([], [])) == []
+
+
+def test_png_encoder_round_trips_pixels():
+    canvas = _Canvas(7, 5, BACKGROUND)
+    canvas.line(0, 2, 6, 2, (255, 0, 0))
+    canvas.line(3, 0, 3, 4, (0, 0, 255), width=1)
+    canvas.line(-10, -10, -5, -5, (0, 255, 0))
+    width, height, rows = _decode_png(canvas.to_png())
+    assert (width, height) == (7, 5)
+    assert _pixel(rows, 0, 2) == (255, 0, 0)
+    assert _pixel(rows, 6, 2) == (255, 0, 0)
+    assert _pixel(rows, 3, 0) == (0, 0, 255)
+    assert _pixel(rows, 3, 4) == (0, 0, 255)
+    assert _pixel(rows, 0, 0) == BACKGROUND
+
+
+def test_polyline_covers_every_pixel_of_a_diagonal():
+    canvas = _Canvas(10, 10, BACKGROUND)
+    canvas.polyline([(0, 0), (9, 9), (9, 0)], (1, 2, 3))
+    for i in range(10):
+        assert tuple(canvas.pixels[i, i]) == (1, 2, 3)
+        assert tuple(canvas.pixels[i, 9]) == (1, 2, 3)
+
+
+def test_snapshot_draws_titles_and_legends(tmp_path):
+    x_seq = [f"00:{i // 60:02d}:{i % 60:02d}" for i in range(600)]
+    y_seq = [60 + 20 * math.sin(i / 10) for i in range(600)]
+    sv = StaticVisualizer(snapshot_path=str(tmp_path / "r.png"), width=400, chart_height=200)
+    sv.add_parsed_data(Chart("FPS Data", x_seq, y_seq))
+    with open(sv.make_snapshot(), "rb") as f:
+        width, height, rows = _decode_png(f.read())
+    assert (width, height) == (400, 200)
+    # 标题与图例文字位于绘图区上方 Title and legend text sit above the plot area
+    header = {_pixel(rows, x, y) for y in range(0, 40) for x in range(60, 200)}
+    assert TEXT_COLOR in header
+
+
+def test_numeric_time_labels():
+    assert _fmt_x(3725.75) == "01:02:05"
+    assert _fmt_x("00:01:02") == "00:01:02"
@@ -0,0 +1,69 @@
+import tracemalloc
+
+from time_profiler import TimeProfiler
+
+THREAD = '<thread id="t1" fmt="Main Thread 0x1"><process id="p1" fmt="Steam (321)"/></thread>'
+BACKTRACE = '<backtrace id="b1"><frame id="f1" name="leaf"/><frame id="f2" name="main"/></backtrace>'
+
+
+def _write_time_profile(path, rows):
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0"?>\n<trace-query-result>\n<node xpath="x">\n<schema name="time-profile"/>\n')
+        for row in rows:
+            f.write(f"<row>{row}</row>\n")
+        f.write("</node>\n</trace-query-result>\n")
+    return str(path)
+
+
+def _profiler(tmp_path):
+    profiler = TimeProfiler("x", str(tmp_path / "parse.log"), "Steam")
+    profiler.print_log = lambda message: None
+    profiler.ROW_VALUE_CACHE = 2
+    return profiler
+
+
+def test_row_value_cache_is_lru(tmp_path):
+    rows = [
+        f'<sample-time id="s1">1000</sample-time>{THREAD}<weight id="w1">10</weight>{BACKTRACE}',
+        '<sample-time id="s2">2000</sample-time><thread ref="t1"/><weight id="w2">20</weight><backtrace ref="b1"/>',
+        '<sample-time id="s3">3000</sample-time><thread ref="t1"/><weight ref="w1"/><backtrace ref="b1"/>',
+        # w1 刚被引用过，超出上限时淘汰的是 w2 w1 was just used, so w2 is evicted
+        '<sample-time id="s4">4000</sample-time><thread ref="t1"/><weight id="w3">30</weight><backtrace ref="b1"/>',
+        '<sample-time id="s5">5000</sample-time><thread ref="t1"/><weight ref="w1"/><backtrace ref="b1"/>',
+    ]
+    profiler = _profiler(tmp_path).profile(_write_time_profile(tmp_path / "tp.xml", rows))
+    assert sum(profiler.samples.values()) == 5
+    assert sum(profiler.weights.values()) == 10 + 20 + 10 + 30 + 10
+
+
+def test_unresolved_refs_skip_the_sample(tmp_path):
+    rows = [
+        f'<sample-time id="s1">1000</sample-time>{THREAD}<weight id="w1">10</weight>{BACKTRACE}',
+        '<sample-time id="s2">2000</sample-time><thread ref="t1"/><weight ref="w9"/><backtrace ref="b1"/>',
+        '<sample-time ref="s9"/><thread ref="t1"/><weight ref="w1"/><backtrace ref="b1"/>',
+    ]
+    profiler = _profiler(tmp_path).profile(_write_time_profile(tmp_path / "tp.xml", rows), start=0, end=1e-6 * 1.5)
+    assert sum(profiler.samples.values()) == 1
+    assert sum(profiler.weights.values()) == 10
+
+
+def test_id_tables_do_not_grow_with_samples(tmp_path):
+    peaks = {}
+    for count in (2000, 8000):
+        rows = [f'<sample-time id="s0">0</sample-time>{THREAD}<weight id="w0">1</weight>{BACKTRACE}']
+        # 样本时间与权重每行都是新 id，调用栈与线程都是 ref Fresh time/weight ids per row, stacks and threads are refs
+        rows += [
+            f'<sample-time id="s{i}">{i}</sample-time><thread ref="t1"/><weight id="w{i}">1</weight><backtrace ref="b1"/>'
+            for i in range(1, count)
+        ]
+        path = _write_time_profile(tmp_path / f"tp_{count}.xml", rows)
+        profiler = _profiler(tmp_path)
+        tracemalloc.start()
+        try:
+            profiler.profile(path)
+            peaks[count] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert sum(profiler.samples.values()) == count
+        assert len(profiler.backtraces) == 1
+    assert peaks[8000] < peaks[2000] * 1.5
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+import trace_session
+from trace_session import TraceSession
+from xctrace_parser import fmt_to_seconds
+
+FAKE_XCRUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_xcrun.py")
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XCRUN", FAKE_XCRUN)
+    monkeypatch.setenv("FAKE_ROWS", "40")
+    (tmp_path / "demo.trace").mkdir()
+    return TraceSession(str(tmp_path / "demo.trace"), target_process_name="Steam", trace_id="demo")
+
+
+def _seconds(values):
+    return [fmt_to_seconds(item["time"]) for item in values]
+
+
+def test_series_are_ascending(session):
+    times = _seconds(session.fps)
+    assert times == sorted(times) and len(times) == 40
+    assert _seconds(session.cpu) == sorted(_seconds(session.cpu))
+
+
+def test_pid_follows_the_queried_process(session):
+    assert session.get_pid("backboardd") == 55
+    assert session.pid == 321
+    assert session.get_pid("backboardd") == 55
+
+
+def test_window_is_inclusive(session):
+    # fake 数据的 FPS 每 0.25 秒、sysmon 每 0.5 秒一行 The fake fps table has a row every 0.25 s, sysmon every 0.5 s
+    assert _seconds(session.get_fps(start=2, end=3)) == [2.0, 2.25, 2.5, 2.75, 3.0]
+    assert _seconds(session.get_mem(start=19)) == [19.0, 19.5]
+    assert _seconds(session.get_cpu(end=0.5, process="backboardd")) == [0.0, 0.5]
+    assert session.get_gpu(start=100) == []
+
+
+def test_window_parses_times_once(session, monkeypatch):
+    session.get_fps(start=1, end=2)
+    calls = []
+    monkeypatch.setattr(trace_session, "fmt_to_seconds", lambda fmt: calls.append(fmt))
+    assert len(session.get_fps(start=3, end=4)) == 5
+    assert not calls
+
+
+def test_cpu_mem_need_a_process(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        TraceSession(str(tmp_path / "demo.trace")).get_cpu()
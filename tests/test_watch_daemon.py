@@ -0,0 +1,131 @@
+import os
+import json
+import shutil
+
+import pytest
+
+from watch_daemon import WatchDaemon, QUEUED, RUNNING, DONE
+
+FAKE_XCRUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_xcrun.py")
+
+
+def _bundle(watch_dir, name, manifest=b"m"):
+    corespace = watch_dir / name / "corespace"
+    corespace.mkdir(parents=True, exist_ok=True)
+    (corespace / "MANIFEST.plist").write_bytes(manifest)
+    return str(watch_dir / name)
+
+
+@pytest.fixture
+def watch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    watch_dir = tmp_path / "inbox"
+    watch_dir.mkdir()
+    return watch_dir
+
+
+def _daemon(watch_dir, **kwargs):
+    kwargs.setdefault("stable_checks", 2)
+    kwargs.setdefault("poll_interval", 0.01)
+    daemon = WatchDaemon(str(watch_dir), "Steam", journal_path="./temp/journal.json", **kwargs)
+    daemon.print_log = lambda message: None
+    return daemon
+
+
+def test_vanished_bundles_are_pruned(watch):
+    trace_path = _bundle(watch, "a.trace")
+    daemon = _daemon(watch)
+    daemon.scan()
+    assert daemon._unsettled()
+    shutil.rmtree(trace_path)
+    daemon.scan()
+    # 否则 -once 会一直等待 Otherwise -once would wait forever
+    assert not daemon._unsettled()
+
+    _bundle(watch, "b.trace")
+    daemon.scan()
+    os.remove(os.path.join(str(watch), "b.trace", "corespace", "MANIFEST.plist"))
+    daemon.scan()
+    assert not daemon._unsettled()
+
+
+def test_bundle_is_queued_once_stable(watch):
+    trace_path = _bundle(watch, "a.trace")
+    daemon = _daemon(watch)
+    daemon.scan()
+    assert not daemon._pending
+    _bundle(watch, "a.trace", manifest=b"still uploading")
+    daemon.scan()
+    assert not daemon._pending
+    daemon.scan()
+    assert list(daemon._pending) == [os.path.abspath(trace_path)]
+
+
+def _finish_next(daemon):
+    trace_path, _ = daemon._pending.popitem(last=False)
+    daemon.journal.update(trace_path, state=DONE)
+
+
+def test_backpressure(watch):
+    for name in ("a.trace", "b.trace", "c.trace"):
+        _bundle(watch, name)
+    daemon = _daemon(watch, stable_checks=1, max_pending=1)
+    daemon.scan()
+    assert [os.path.basename(p) for p in daemon._pending] == ["a.trace"]
+    # 队列已满的 bundle 留待下次扫描 Bundles that did not fit wait for a later scan
+    assert daemon._unsettled()
+    _finish_next(daemon)
+    daemon.scan()
+    assert [os.path.basename(p) for p in daemon._pending] == ["b.trace"]
+    _finish_next(daemon)
+    daemon.scan()
+    assert [os.path.basename(p) for p in daemon._pending] == ["c.trace"]
+    assert not daemon._unsettled()
+
+
+def test_dedup(watch):
+    trace_path = os.path.abspath(_bundle(watch, "a.trace"))
+    daemon = _daemon(watch, stable_checks=1)
+    daemon.scan()
+    daemon.scan()
+    assert list(daemon._pending) == [trace_path]
+
+    # 已完成且未变化的 bundle 不再入队 A finished, unchanged bundle is not queued again
+    daemon._pending.clear()
+    daemon.journal.update(trace_path, state=DONE)
+    daemon.scan()
+    assert not daemon._pending
+
+    # MANIFEST 变化视为新的上传 A changed MANIFEST counts as a new upload
+    _bundle(watch, "a.trace", manifest=b"re-uploaded")
+    daemon.scan()
+    assert list(daemon._pending) == [trace_path]
+
+
+def test_journal_resume(watch):
+    journal_path = "./temp/journal.json"
+    os.makedirs("temp")
+    with open(journal_path, "w") as f:
+        json.dump({
+            "/x/running.trace": {"state": RUNNING, "trace_id": "r"},
+            "/x/queued.trace": {"state": QUEUED, "trace_id": "q"},
+            "/x/done.trace": {"state": DONE, "trace_id": "d"},
+        }, f)
+    daemon = _daemon(watch)
+    assert list(daemon._pending) == ["/x/running.trace", "/x/queued.trace"]
+    with open(journal_path) as f:
+        states = {key: job["state"] for key, job in json.load(f).items()}
+    assert states == {"/x/running.trace": QUEUED, "/x/queued.trace": QUEUED, "/x/done.trace": DONE}
+
+
+def test_once_parses_and_publishes(watch, monkeypatch):
+    monkeypatch.setenv("XCRUN", FAKE_XCRUN)
+    monkeypatch.setenv("FAKE_ROWS", "20")
+    for d in ("temp/parse", "temp/save", "temp/visualize"):
+        os.makedirs(d, exist_ok=True)
+    trace_path = os.path.abspath(_bundle(watch, "a.trace"))
+    daemon = _daemon(watch, stable_checks=1, max_workers=1, publish_dir="./temp/publish")
+    daemon.run(once=True)
+    job = daemon.journal.jobs[trace_path]
+    assert job["state"] == DONE, job
+    assert os.path.isfile(job["html"])
@@ -0,0 +1,347 @@
+import os
+import json
+import argparse
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from xctrace_parser import XCTraceParser, make_trace_id
+
+# 未解析到的 ref 的占位值 Placeholder for a ref that could not be resolved
+_MISSING = object()
+
+
+def main():
+    for d in ("./temp/parse", "./temp/save"):
+        Path(d).mkdir(parents=True, exist_ok=True)
+
+    parser = argparse.ArgumentParser(description="Time Profiler 调用栈聚合 Aggregate the time-profile table")
+    parser.add_argument(
+        "-trace_path",
+        required=True,
+        help="Path to .trace file to analyze",
+    )
+    parser.add_argument(
+        "-target_process_name",
+        default=None,
+        help="only keep samples of this process",
+    )
+    parser.add_argument(
+        "-thread",
+        default=None,
+        help="only keep threads whose name contains this text (e.g. 'Main Thread')",
+    )
+    parser.add_argument(
+        "-start",
+        type=float,
+        default=None,
+        help="window start seconds, inclusive",
+    )
+    parser.add_argument(
+        "-end",
+        type=float,
+        default=None,
+        help="window end seconds, inclusive",
+    )
+    parser.add_argument(
+        "-xml_path",
+        default=None,
+        help="use an already exported time-profile xml instead of exporting",
+    )
+    parser.add_argument(
+        "-top",
+        type=int,
+        default=20,
+        help="print the N functions with the highest self weight",
+    )
+    args = parser.parse_args()
+
+    trace_id = make_trace_id(args.trace_path)
+    profiler = TimeProfiler(
+        trace_path=args.trace_path,
+        log_path=f"./temp/parse/{trace_id}_parse.log",
+        target_process_name=args.target_process_name,
+        trace_id=trace_id,
+    )
+    profiler.profile(
+        xml_path=args.xml_path, start=args.start, end=args.end, thread=args.thread
+    )
+    profiler.save_profile()
+    for name, weight in profiler.top_functions(args.top):
+        print(f"{weight / 1e6:>12.2f} ms  {name}")
+
+
+class TimeProfiler(XCTraceParser):
+    """
+    导出并聚合 Time Profiler 的 time-profile 表。
+
+    frame、backtrace、thread 按 xctrace 的 id/ref 压缩只解析一次，
+    驻留为整数下标（与 _get_cached_element 的 id/ref 规则相同，但缓存的是
+    驻留后的值而不是 XML 元素）。样本按 (thread, backtrace) 累加权重，
+    内存只与不同调用栈的数量有关，与样本数无关。
+
+    Export and aggregate the Time Profiler time-profile table.
+
+    Frames, backtraces and threads are resolved once through the xctrace
+    id/ref compression and interned as ints. This follows the same id/ref rules
+    as _get_cached_element, but caches interned values instead of XML elements.
+    Sample weights are summed per (thread, backtrace), so memory grows with the
+    number of distinct stacks rather than the number of samples.
+
+        profiler = TimeProfiler(trace_path, log_path, "Steam")
+        profiler.profile(start=10, end=20, thread="Main Thread")
+        profiler.collapsed()      # flamegraph.pl 格式 folded stacks
+        profiler.call_tree()      # 嵌套 dict call tree
+    """
+
+    # 逐行值（时间、权重）缓存上限，超过后淘汰最久未使用的 id
+    # Cap of the per-row value tables (time, weight), the least recently used ids are evicted beyond it
+    ROW_VALUE_CACHE = 65536
+
+    def __init__(self, trace_path, log_path, target_process_name=None, trace_id=None):
+        super().__init__(trace_path, log_path, target_process_name, trace_id=trace_id)
+        # 驻留表 Intern tables
+        self.frame_names = []
+        self.backtraces = []
+        self.threads = []
+        # (thread, backtrace) -> 权重 weight (ns) / 样本数 sample count
+        self.weights = Counter()
+        self.samples = Counter()
+
+    def profile(self, xml_path=None, start=None, end=None, thread=None):
+        """
+        :param xml_path: 已导出的 time-profile xml，None 时从 trace 导出
+        :param start: 起始秒数（含） window start seconds, inclusive
+        :param end: 结束秒数（含） window end seconds, inclusive
+        :param thread: 线程名包含的文本 text contained in the thread name
+        """
+        if xml_path is None:
+            xml_path = self._export_xml(schema_name="time-profile", output_suffix="time-profile")
+        self.print_log(f"解析Time Profiler数据: {xml_path}")
+        start_ns = None if start is None else int(start * 1e9)
+        end_ns = None if end is None else int(end * 1e9)
+
+        # id -> 驻留值 interned value
+        # 这四张表不设上限：xctrace 每个不同的 frame / backtrace / thread / process 只有一个 id，
+        # 表的大小与本来就要保留的驻留表同阶，不随样本数增长；淘汰后 ref 无法解析只能丢弃样本
+        # These four tables are not capped: xctrace gives each distinct frame /
+        # backtrace / thread / process a single id, so they grow like the intern
+        # tables that are kept anyway, not with the sample count. Evicting an id
+        # would turn later refs into dropped samples.
+        frame_ids = {}
+        backtrace_ids = {}
+        thread_ids = {}
+        process_ids = {}
+        time_ids = OrderedDict()
+        weight_ids = OrderedDict()
+        frame_index = {}
+        backtrace_index = {}
+        # thread 下标 -> 是否通过过滤 thread index -> passes the filters
+        thread_ok = []
+
+        total = 0
+        kept = 0
+        missing = 0
+        for row in self._iter_rows(xml_path):
+            total += 1
+            sample_ns = None
+            weight = 1
+            thread_idx = None
+            bt_idx = None
+            for child in row:
+                tag = child.tag
+                if tag == "sample-time":
+                    sample_ns = _resolve(child, time_ids, _int_text, self.ROW_VALUE_CACHE)
+                elif tag == "weight":
+                    weight = _resolve(child, weight_ids, _int_text, self.ROW_VALUE_CACHE)
+                elif tag == "thread":
+                    thread_idx = _resolve(
+                        child,
+                        thread_ids,
+                        lambda ele: self._intern_thread(ele, process_ids, thread_ok, thread),
+                    )
+                elif tag in ("backtrace", "tagged-backtrace"):
+                    if tag == "tagged-backtrace" and "ref" not in child.attrib:
+                        inner = child.find("backtrace")
+                        if inner is not None:
+                            child = inner
+                    bt_idx = _resolve(
+                        child,
+                        backtrace_ids,
+                        lambda ele: self._intern_backtrace(ele, frame_ids, frame_index, backtrace_index),
+                    )
+
+            if _MISSING in (sample_ns, weight, thread_idx, bt_idx):
+                # 引用的 id 已被淘汰或不存在，跳过该样本 The referenced id was evicted or never seen, skip the sample
+                missing += 1
+                continue
+            if thread_idx is None or bt_idx is None or not thread_ok[thread_idx]:
+                continue
+            if sample_ns is not None:
+                if start_ns is not None and sample_ns < start_ns:
+                    continue
+                if end_ns is not None and sample_ns > end_ns:
+                    continue
+            key = (thread_idx, bt_idx)
+            self.weights[key] += weight
+            self.samples[key] += 1
+            kept += 1
+
+        if missing:
+            self.print_log(f"警告: {missing} 条样本的引用未找到，已跳过 ({missing} samples with unresolved refs skipped)")
+        self.print_log(
+            f"获取到 {total} 条样本，保留 {kept} 条；{len(self.frame_names)} 个函数，"
+            f"{len(self.backtraces)} 个调用栈 ({total} samples, {kept} kept)"
+        )
+        return self
+
+    def _intern_thread(self, ele, process_ids, thread_ok, thread_filter):
+        name = ele.attrib.get("fmt", "")
+        process_name = None
+        process_ele = ele.find("process")
+        if process_ele is not None:
+            process_name = _resolve(
+                process_ele, process_ids, lambda p: p.attrib.get("fmt", "").split(" (")[0]
+            )
+            if process_name is _MISSING:
+                process_name = None
+        ok = True
+        if self.target_process_name and process_name != self.target_process_name:
+            ok = False
+        if thread_filter and thread_filter not in name:
+            ok = False
+        self.threads.append(name)
+        thread_ok.append(ok)
+        return len(self.threads) - 1
+
+    def _intern_backtrace(self, ele, frame_ids, frame_index, backtrace_index):
+        frames = []
+        for frame in ele.iter("frame"):
+            idx = _resolve(frame, frame_ids, lambda f: self._intern_frame(f, frame_index))
+            if idx is _MISSING:
+                idx = self._intern_frame(frame, frame_index)
+            frames.append(idx)
+        # 叶子在前 leaf first
+        frames = tuple(frames)
+        idx = backtrace_index.get(frames)
+        if idx is None:
+            idx = backtrace_index[frames] = len(self.backtraces)
+            self.backtraces.append(frames)
+        return idx
+
+    def _intern_frame(self, ele, frame_index):
+        name = ele.attrib.get("name") or ele.attrib.get("addr") or "???"
+        idx = frame_index.get(name)
+        if idx is None:
+            idx = frame_index[name] = len(self.frame_names)
+            self.frame_names.append(name)
+        return idx
+
+    def collapsed(self):
+        """
+        flamegraph.pl 的 folded stacks 格式：`thread;root;...;leaf weight_ns`
+
+        Folded stacks for flamegraph.pl: `thread;root;...;leaf weight_ns`.
+        """
+        names = self.frame_names
+        lines = []
+        for (thread_idx, bt_idx), weight in self.weights.most_common():
+            stack = [self.threads[thread_idx].replace(";", ":")]
+            stack.extend(names[f].replace(";", ":") for f in reversed(self.backtraces[bt_idx]))
+            lines.append(f"{';'.join(stack)} {weight}")
+        return lines
+
+    def call_tree(self):
+        """
+        按线程聚合的调用树 Call tree per thread:
+        {"name", "total", "self", "samples", "children": [...]}，权重单位为纳秒 weights in ns
+        """
+        root = _new_node("all")
+        for (thread_idx, bt_idx), weight in self.weights.items():
+            count = self.samples[(thread_idx, bt_idx)]
+            node = root
+            _add(node, weight, count)
+            node = _child(node, self.threads[thread_idx])
+            _add(node, weight, count)
+            for f in reversed(self.backtraces[bt_idx]):
+                node = _child(node, self.frame_names[f])
+                _add(node, weight, count)
+            node["self"] += weight
+        return _finish(root)
+
+    def top_functions(self, n=20):
+        """自身权重最高的函数 Functions with the highest self weight"""
+        self_weights = Counter()
+        for (_, bt_idx), weight in self.weights.items():
+            frames = self.backtraces[bt_idx]
+            if frames:
+                self_weights[self.frame_names[frames[0]]] += weight
+        return self_weights.most_common(n)
+
+    def save_profile(self, output_dir="./temp/save"):
+        d = os.path.join(output_dir, "time_profile")
+        Path(d).mkdir(parents=True, exist_ok=True)
+        folded_path = os.path.join(d, f"{self.trace_id}_time_profile.folded")
+        with open(folded_path, "w") as f:
+            for line in self.collapsed():
+                f.write(line + "\n")
+        self.print_log(f"保存文件: {folded_path}")
+        tree_path = os.path.join(d, f"{self.trace_id}_call_tree.json")
+        with open(tree_path, "w") as f:
+            json.dump(self.call_tree(), f)
+        self.print_log(f"保存文件: {tree_path}")
+        return folded_path, tree_path
+
+
+def _resolve(ele, table, convert, maxsize=None):
+    """
+    按 id/ref 解析元素并缓存转换后的值 Resolve an element through id/ref and cache its converted value
+    :param maxsize: 缓存上限（table 需为 OrderedDict），超过时淘汰最久未使用的 id
+                    cap of the table (an OrderedDict), the least recently used id is evicted beyond it
+    :return: 转换后的值，ref 未找到时为 _MISSING the converted value, _MISSING for an unresolved ref
+    """
+    attrib = ele.attrib
+    ref_id = attrib.get("ref")
+    if ref_id is not None:
+        value = table.get(ref_id, _MISSING)
+        if maxsize is not None and value is not _MISSING:
+            table.move_to_end(ref_id)
+        return value
+    value = convert(ele)
+    ele_id = attrib.get("id")
+    if ele_id is not None:
+        table[ele_id] = value
+        if maxsize is not None and len(table) > maxsize:
+            table.popitem(last=False)
+    return value
+
+
+def _int_text(ele):
+    return int(ele.text)
+
+
+def _new_node(name):
+    return {"name": name, "total": 0, "self": 0, "samples": 0, "children": {}}
+
+
+def _add(node, weight, count):
+    node["total"] += weight
+    node["samples"] += count
+
+
+def _child(node, name):
+    child = node["children"].get(name)
+    if child is None:
+        child = node["children"][name] = _new_node(name)
+    return child
+
+
+def _finish(node):
+    # children 由 dict 转为按 total 降序的列表 Turn children into a list sorted by total
+    node["children"] = sorted(
+        (_finish(c) for c in node["children"].values()), key=lambda c: -c["total"]
+    )
+    return node
+
+
+if __name__ == "__main__":
+    main()
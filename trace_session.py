@@ -0,0 +1,164 @@
+import time
+import random
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from xctrace_parser import XCTraceParser, fmt_to_seconds, sort_by_time, reverse_order
+
+
+class TraceSession:
+    """
+    库级别的 trace 访问接口：每个指标在第一次访问时才导出并解析对应的表，
+    结果会被缓存，只需要 FPS 时不会导出 sysmon-process
+
+    Library level access to one .trace bundle. Each metric exports and parses
+    its table on first access and memoizes it, so a caller that only needs
+    FPS never pays for the sysmon-process export.
+
+        session = TraceSession("demo.trace", target_process_name="Steam")
+        session.fps                          # 导出并解析 core-animation-fps-estimate
+        session.get_cpu(start=10, end=60)    # 导出并解析 sysmon-process
+        session.get_mem(process="backboardd")
+        session.get_pid("backboardd")
+    """
+
+    FPS_SCHEMA = ("core-animation-fps-estimate", "core-animation-fps")
+    SYSMON_SCHEMA = ("sysmon-process", "sysmon-process")
+
+    def __init__(self, trace_path, target_process_name=None, trace_id=None, log_path=None):
+        trace_id = trace_id or f"{int(time.time())}_{random.randint(1000, 9999)}"
+        Path("./temp/parse").mkdir(parents=True, exist_ok=True)
+        if log_path is None:
+            log_path = f"./temp/parse/{trace_id}_parse.log"
+        self._parser = XCTraceParser(
+            trace_path=trace_path,
+            log_path=log_path,
+            target_process_name=target_process_name,
+            trace_id=trace_id,
+        )
+        self.trace_id = trace_id
+        self.trace_path = trace_path
+        self.target_process_name = target_process_name
+
+        # schema -> 已导出的 xml 路径 exported xml path
+        self._xml_paths = {}
+        # (fps, gpu)
+        self._gpu_fps = None
+        # process_name -> (cpu, mem)
+        self._cpu_mem = {}
+        # process_name -> pid
+        self._pids = {}
+
+    @property
+    def fps(self):
+        return self.get_fps()
+
+    @property
+    def gpu(self):
+        return self.get_gpu()
+
+    @property
+    def cpu(self):
+        return self.get_cpu()
+
+    @property
+    def mem(self):
+        return self.get_mem()
+
+    @property
+    def pid(self):
+        return self.get_pid()
+
+    def get_fps(self, start=None, end=None):
+        """
+        :param start: 起始秒数（含） window start seconds, inclusive
+        :param end: 结束秒数（含） window end seconds, inclusive
+        """
+        return self._load_gpu_fps()[0].window(start, end)
+
+    def get_gpu(self, start=None, end=None):
+        return self._load_gpu_fps()[1].window(start, end)
+
+    def get_cpu(self, start=None, end=None, process=None):
+        """
+        :param process: 进程名，默认为 target_process_name
+        """
+        return self._load_cpu_mem(process)[0].window(start, end)
+
+    def get_mem(self, start=None, end=None, process=None):
+        return self._load_cpu_mem(process)[1].window(start, end)
+
+    def get_pid(self, process=None):
+        """进程的 pid（来自 sysmon-process），没有记录时为 None  pid of the process from sysmon-process"""
+        process = self._process(process)
+        self._load_cpu_mem(process)
+        return self._pids[process]
+
+    def _export(self, schema):
+        schema_name, output_suffix = schema
+        if schema_name not in self._xml_paths:
+            self._xml_paths[schema_name] = self._parser._export_xml(
+                schema_name=schema_name, output_suffix=output_suffix
+            )
+        return self._xml_paths[schema_name]
+
+    def _load_gpu_fps(self):
+        if self._gpu_fps is None:
+            fps_data, gpu_data = self._parser._read_gpu_fps(self._export(self.FPS_SCHEMA))
+            self._gpu_fps = (self._series(fps_data, "fps"), self._series(gpu_data, "gpu"))
+        return self._gpu_fps
+
+    def _load_cpu_mem(self, process=None):
+        process = self._process(process)
+        if process not in self._cpu_mem:
+            # target_pid 只在为 None 时记录，每个进程单独读取
+            # The parser only records target_pid while it is None, so read it per process
+            self._parser.target_pid = None
+            cpu_data, mem_data = self._parser._read_cpu_mem(
+                self._export(self.SYSMON_SCHEMA), process_name=process
+            )
+            self._pids[process] = self._parser.target_pid
+            self._cpu_mem[process] = (self._series(cpu_data, "cpu"), self._series(mem_data, "mem"))
+        return self._cpu_mem[process]
+
+    def _process(self, process):
+        process = process or self.target_process_name
+        if not process:
+            raise ValueError("需要进程名 process name is required for cpu/mem")
+        return process
+
+    def _series(self, values, suffix):
+        # 原始数据为倒序，按检测到的顺序规整为升序 The raw data is in reverse order, normalize it to ascending
+        order = reverse_order(self._parser.time_orders.get(suffix))
+        values.reverse()
+        return _Series(sort_by_time(values, order, key=_time_key))
+
+
+class _Series:
+    """
+    升序的一条序列，时间在第一次按窗口查询时解析一次，之后二分查找
+
+    An ascending series. Its times are parsed once on the first windowed
+    query and bisected afterwards.
+    """
+
+    def __init__(self, values):
+        self.values = values
+        self._times = None
+
+    def window(self, start=None, end=None):
+        """
+        :param start: 起始秒数（含） window start seconds, inclusive
+        :param end: 结束秒数（含） window end seconds, inclusive
+        """
+        if start is None and end is None:
+            return self.values
+        if self._times is None:
+            self._times = [_time_key(item) for item in self.values]
+        lo = 0 if start is None else bisect_left(self._times, start)
+        hi = len(self._times) if end is None else bisect_right(self._times, end)
+        return self.values[lo:hi]
+
+
+def _time_key(item):
+    return fmt_to_seconds(item["time"])
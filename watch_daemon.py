@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import shutil
+import signal
+import argparse
+from collections import OrderedDict
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from xctrace_runner import parse_trace, _ignore_sigint
+
+# 任务状态 Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def main():
+    for d in ("./temp/parse", "./temp/save", "./temp/visualize"):
+        Path(d).mkdir(parents=True, exist_ok=True)
+
+    parser = argparse.ArgumentParser(description="监听目录并自动解析新上传的 .trace Watch a folder and parse incoming .trace bundles")
+    parser.add_argument(
+        "-watch_dir",
+        required=True,
+        help="directory the devices upload .trace bundles into",
+    )
+    parser.add_argument(
+        "-target_process_name",
+        required=True,
+        help="Target process name to analyze (e.g. Steam)",
+    )
+    parser.add_argument(
+        "-publish_dir",
+        default="./temp/publish",
+        help="reports of finished traces are copied here",
+    )
+    parser.add_argument(
+        "-journal_path",
+        default="./temp/watch_journal.json",
+        help="crash-safe job journal, running jobs are resumed on restart",
+    )
+    parser.add_argument(
+        "-workers",
+        type=int,
+        default=2,
+        help="max parse worker processes",
+    )
+    parser.add_argument(
+        "-max_pending",
+        type=int,
+        default=16,
+        help="max queued jobs, new bundles wait for the next scan when full",
+    )
+    parser.add_argument(
+        "-poll_interval",
+        type=float,
+        default=5.0,
+        help="seconds between two scans",
+    )
+    parser.add_argument(
+        "-stable_checks",
+        type=int,
+        default=2,
+        help="scans MANIFEST.plist must stay unchanged before a bundle counts as complete",
+    )
+    parser.add_argument(
+        "-once",
+        action="store_true",
+        help="process the bundles found and exit when idle",
+    )
+    args = parser.parse_args()
+
+    daemon = WatchDaemon(
+        watch_dir=args.watch_dir,
+        target_process_name=args.target_process_name,
+        publish_dir=args.publish_dir,
+        journal_path=args.journal_path,
+        max_workers=args.workers,
+        max_pending=args.max_pending,
+        poll_interval=args.poll_interval,
+        stable_checks=args.stable_checks,
+    )
+    daemon.run(once=args.once)
+
+
+def bundle_signature(trace_path):
+    """
+    返回 corespace/MANIFEST.plist 的 (mtime_ns, size)，不存在时返回 None
+
+    Return (mtime_ns, size) of corespace/MANIFEST.plist, None while it does not exist.
+    xctrace 在 bundle 写完时才写入 MANIFEST.plist。
+    xctrace writes MANIFEST.plist when the bundle is finished.
+    """
+    try:
+        st = os.stat(os.path.join(trace_path, "corespace", "MANIFEST.plist"))
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class JobJournal:
+    """
+    任务日志：每次状态变化都写临时文件后 os.replace，进程崩溃不会留下半个文件
+
+    Job journal. Every state change writes a temp file and os.replace()s it,
+    so a crash never leaves a half written journal.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.jobs = {}
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                self.jobs = json.load(f)
+
+    def update(self, key, **fields):
+        job = self.jobs.setdefault(key, {})
+        job.update(fields, updated=time.time())
+        self._write()
+        return job
+
+    def _write(self):
+        Path(os.path.dirname(os.path.abspath(self.path))).mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.jobs, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class WatchDaemon:
+    """
+    轮询监听目录中的 .trace bundle：MANIFEST.plist 连续 stable_checks 次扫描不变即视为完整，
+    按路径去重后入队，由有界进程池解析。进行中的任务数不超过 max_workers，
+    排队任务数不超过 max_pending（背压：队列满时新 bundle 留到下一次扫描）。
+    解析结果由 save() 写入 ./temp/save，报告复制到 publish_dir。
+    重启时 journal 中 queued/running 的任务会重新入队。
+
+    Polls the watch folder for .trace bundles. A bundle is complete once its
+    MANIFEST.plist is unchanged for `stable_checks` scans. Bundles are
+    deduplicated by path and parsed on a bounded process pool. At most
+    `max_workers` jobs run and at most `max_pending` wait (backpressure: when
+    the queue is full new bundles wait for a later scan). Results are saved
+    to ./temp/save by save() and reports are copied to `publish_dir`.
+    Queued or running jobs in the journal are requeued on restart.
+    """
+
+    def __init__(
+        self,
+        watch_dir,
+        target_process_name,
+        publish_dir="./temp/publish",
+        journal_path="./temp/watch_journal.json",
+        max_workers=2,
+        max_pending=16,
+        poll_interval=5.0,
+        stable_checks=2,
+    ):
+        self.watch_dir = watch_dir
+        self.target_process_name = target_process_name
+        self.publish_dir = publish_dir
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.stable_checks = stable_checks
+        self.journal = JobJournal(journal_path)
+
+        # trace_path -> (signature, 连续不变的扫描次数 unchanged scan count)
+        self._candidates = {}
+        # trace_path -> None，有序且去重 ordered and deduplicated
+        self._pending = OrderedDict()
+        # future -> trace_path
+        self._running = {}
+        self._stopped = False
+
+        # 崩溃恢复 Crash-safe resume
+        for key, job in self.journal.jobs.items():
+            if job.get("state") in (QUEUED, RUNNING):
+                self.print_log(f"恢复任务 Resuming job: {key}")
+                self.journal.update(key, state=QUEUED)
+                self._pending[key] = None
+
+    def print_log(self, strs):
+        print(f"[{time.strftime('%H:%M:%S')}] {strs}")
+
+    def stop(self, *args):
+        self._stopped = True
+
+    def run(self, once=False):
+        signal.signal(signal.SIGTERM, self.stop)
+        self.print_log(f"开始监听 Watching {self.watch_dir}")
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_ignore_sigint
+        ) as pool:
+            try:
+                while not self._stopped:
+                    self.scan()
+                    self._collect()
+                    self._submit(pool)
+                    if once and not self._pending and not self._running and not self._unsettled():
+                        break
+                    time.sleep(self.poll_interval)
+            except KeyboardInterrupt:
+                self.print_log("KeyboardInterrupt, 等待进行中的任务 waiting for running jobs")
+            # 未开始的任务保持 queued，下次启动时恢复
+            # Jobs not started stay queued and are resumed on the next start
+            for future in self._running:
+                future.cancel()
+        self._collect()
+        self.print_log("已停止监听 Stopped")
+
+    def scan(self):
+        """扫描监听目录，把已完整且未处理的 bundle 入队 Queue complete bundles not handled yet"""
+        try:
+            names = sorted(os.listdir(self.watch_dir))
+        except FileNotFoundError:
+            self._candidates.clear()
+            return
+        # 本次扫描中仍在等待稳定的 bundle Bundles still settling in this scan
+        settling = set()
+        for name in names:
+            if not name.endswith(".trace"):
+                continue
+            trace_path = os.path.abspath(os.path.join(self.watch_dir, name))
+            if trace_path in self._pending or trace_path in self._running.values():
+                continue
+            signature = bundle_signature(trace_path)
+            if signature is None:
+                continue
+            job = self.journal.jobs.get(trace_path)
+            if job and job.get("signature") == signature and job.get("state") in (DONE, FAILED):
+                continue
+
+            previous, count = self._candidates.get(trace_path, (None, 0))
+            count = count + 1 if previous == signature else 1
+            self._candidates[trace_path] = (signature, count)
+            settling.add(trace_path)
+            if count < self.stable_checks:
+                continue
+            if len(self._pending) >= self.max_pending:
+                # 背压 Backpressure
+                continue
+            del self._candidates[trace_path]
+            settling.discard(trace_path)
+            trace_id = f"{os.path.splitext(name)[0]}_{int(time.time())}"
+            self.journal.update(trace_path, state=QUEUED, signature=signature, trace_id=trace_id)
+            self._pending[trace_path] = None
+            self.print_log(f"入队 Queued: {trace_path}")
+        # 已删除或不再完整的 bundle 不再等待，否则 -once 会一直等下去
+        # Drop bundles that were deleted or lost their manifest, otherwise -once would wait forever
+        for trace_path in [path for path in self._candidates if path not in settling]:
+            del self._candidates[trace_path]
+
+    def _unsettled(self):
+        return bool(self._candidates)
+
+    def _submit(self, pool):
+        while self._pending and len(self._running) < self.max_workers:
+            trace_path, _ = self._pending.popitem(last=False)
+            job = self.journal.jobs[trace_path]
+            if not os.path.isdir(trace_path):
+                self.journal.update(trace_path, state=FAILED, error="bundle disappeared")
+                continue
+            self.journal.update(trace_path, state=RUNNING)
+            future = pool.submit(
+                parse_trace, trace_path, self.target_process_name, job["trace_id"]
+            )
+            self._running[future] = trace_path
+            self.print_log(f"开始解析 Parsing: {trace_path}")
+
+    def _collect(self):
+        for future in [f for f in self._running if f.done()]:
+            trace_path = self._running.pop(future)
+            if future.cancelled():
+                self.journal.update(trace_path, state=QUEUED)
+                continue
+            try:
+                html_path = future.result()
+            except Exception as e:
+                self.journal.update(trace_path, state=FAILED, error=str(e))
+                self.print_log(f"解析失败 Failed: {trace_path} {e}")
+                continue
+            published = self._publish(html_path)
+            self.journal.update(trace_path, state=DONE, html=published, error=None)
+            self.print_log(f"解析完成 Done: {trace_path} -> {published}")
+
+    def _publish(self, html_path):
+        Path(self.publish_dir).mkdir(parents=True, exist_ok=True)
+        target = os.path.join(self.publish_dir, os.path.basename(html_path))
+        tmp_path = target + ".tmp"
+        shutil.copyfile(html_path, tmp_path)
+        os.replace(tmp_path, target)
+        return target
+
+
+if __name__ == "__main__":
+    main()
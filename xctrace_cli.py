@@ -0,0 +1,62 @@
+import sys
+import argparse
+import importlib
+
+# 这些子命令转发给原有脚本的 main()，对应模块只在使用时导入
+# These subcommands forward to the main() of the existing scripts,
+# the module is only imported when the subcommand is used
+FORWARDED = {
+    "report": ("xctrace_parser", "解析 trace 并生成报告 Parse a trace and render its report"),
+    "compare": ("data_to_charts", "对比多个解析结果 Compare parsed results of several runs"),
+    "regress": ("regression_compare", "基线回归对比与判定 Gate candidate runs against a baseline"),
+    "arrow": ("parquet_sink", "导出分区的 Parquet / Arrow IPC Export a partitioned Parquet / Arrow dataset"),
+    "join": ("asof_join", "多指标按时间对齐与条件查询 Align metrics in time and query them"),
+    "record": ("xctrace_runner", "录制 trace Record traces"),
+}
+
+
+def main(argv=None):
+    """
+    xctrace_cli.py parse   -trace_path demo.trace -target_process_name Steam
+    xctrace_cli.py report  -trace_path demo.trace -target_process_name Steam
+    xctrace_cli.py compare ./temp/save -r
+    xctrace_cli.py regress -baseline ./base/save -candidate ./temp/save
+    xctrace_cli.py arrow   -output ./temp/arrow -ingest ./temp/save
+    xctrace_cli.py join    -save_dir ./temp/save -trace_id xxx -where "fps < 30"
+    xctrace_cli.py record  -device_id xxx -time_limit 60s
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in FORWARDED:
+        module = importlib.import_module(FORWARDED[argv[0]][0])
+        sys.argv = [f"{sys.argv[0]} {argv[0]}"] + argv[1:]
+        return module.main()
+
+    parser = argparse.ArgumentParser(description="XCTraceParser command line")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parse_parser = subparsers.add_parser(
+        "parse", help="只解析并保存 Json，不生成报告 Parse and save json only, no report"
+    )
+    # 与 xctrace_parser.py 共用同一组参数 Same flags as xctrace_parser.py
+    from xctrace_parser import add_parse_arguments
+
+    add_parse_arguments(parse_parser)
+    for name, (_, help_text) in FORWARDED.items():
+        subparsers.add_parser(name, help=help_text, add_help=False)
+
+    args = parser.parse_args(argv)
+    if args.command == "parse":
+        parse_only(args)
+
+
+def parse_only(args):
+    """只解析路径：不导入任何图表依赖 Parse-only path, no charting dependency is imported"""
+    from xctrace_parser import run_parse
+
+    parser = run_parse(args)
+    if parser.profiler:
+        parser.print_log(f"性能分析报告 Profile report: {parser.profiler.write_report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,26 @@ import xml.etree.ElementTree as ET
 from pathlib import Path
 import argparse
 import json
-from data_visualizer import ParsedData, DataVisualizer
 import time
 import random
+import heapq
+import fcntl
+import sqlite3
+import tempfile
+from itertools import islice
+from contextlib import nullcontext
+
+
+def xcrun_path():
+    """
+    可通过环境变量 XCRUN 替换为其他可执行文件（例如 Linux 上模拟 export 的替身脚本），
+    每次调用时读取，导入后再设置也会生效
+
+    Set the XCRUN environment variable to use a stand-in executable (e.g. on
+    Linux). It is read on every call, so setting it after import works too.
+    """
+    return os.environ.get("XCRUN", "xcrun")
+
 
 def main():
     # 确保临时目录存在
@@ -14,18 +31,27 @@ def main():
     for d in temp_dirs:
         Path(d).mkdir(parents=True, exist_ok=True)
 
-    parser = argparse.ArgumentParser(description="XCTrace File Parser and Visualizer")
-    parser.add_argument(
-        "-trace_path",
-        required=True,
-        help="Path to .trace file to analyze",
+    arg_parser = argparse.ArgumentParser(description="XCTrace File Parser and Visualizer")
+    add_parse_arguments(arg_parser)
+    arg_parser.add_argument(
+        "-jank",
+        action="store_true",
+        help="Detect FPS jank intervals, save them and mark them in the report",
     )
-    parser.add_argument(
-        "-target_process_name",
-        required=True,
-        help="Target process name to analyze (e.g. Steam)",
+    arg_parser.add_argument(
+        "-snapshot",
+        choices=["svg", "png"],
+        default=None,
+        help="Also write a static svg/png of the report without a browser",
     )
-    args = parser.parse_args()
+    arg_parser.add_argument(
+        "-report_mode",
+        choices=["default", "compact", "large"],
+        default="default",
+        help="compact: store each series once as a compressed typed array in the html; "
+        "large: compact + numeric time axis, progressive rendering and LTTB sampling",
+    )
+    args = arg_parser.parse_args()
 
     # 提取文件名（带扩展名）
     file_name_with_ext = os.path.basename(args.trace_path)
@@ -33,25 +59,26 @@ def main():
     # 提取文件名（不带扩展名）
     file_name_without_ext = os.path.splitext(file_name_with_ext)[0]
 
-    prefix = f"{int(time.time())}"
-    if "_" in file_name_without_ext:
-        prefix = file_name_without_ext.split("_")[0]
-    elif len(file_name_without_ext) < 6:
-        prefix = file_name_without_ext
-
-    # 生成唯一ID（+随机数）
-    trace_id = f"{prefix}_{random.randint(1000,9999)}"
-
     # 解析流程
-    log_path = f"./temp/parse/{trace_id}_parse.log"
-    parser = XCTraceParser(
-        trace_path=args.trace_path,
-        log_path=log_path,
-        target_process_name=args.target_process_name,
-        trace_id=trace_id
-    )
-    parser.parse()
-    parser.save()
+    parser = run_parse(args)
+    trace_id = parser.trace_id
+    profiler = parser.profiler
+    if args.stream:
+        if profiler:
+            parser.print_log(f"性能分析报告 Profile report: {profiler.write_report()}")
+        return
+
+    # 图表依赖只在出报告时导入 Charting dependencies are only imported for the report
+    from data_visualizer import DataVisualizer, CompactDataVisualizer
+
+    jank_areas = None
+    if args.jank:
+        from jank_detector import detect_jank_values
+
+        jank = detect_jank_values(parser.fps_values, parser.gpu_values, trace_id=trace_id)
+        jank_path = parser.save_jank(jank)
+        jank_areas = [(item.start, item.end, item.level) for item in jank]
+        print(f"检测到 {len(jank)} 个卡顿区间 Found {len(jank)} jank intervals: {jank_path}")
 
     # 可视化流程
     print("开始可视化 Start visualize")
@@ -63,44 +90,213 @@ def main():
 
     html_path = v_path + f"/{trace_id}_report.html"
     
+    # 大数据量报告使用未去重的完整序列 The large report gets the full, undeduplicated series
+    full_resolution = args.report_mode == "large"
+
     # 转换数据格式
-    fps_data = XCTraceVisualizer(
-        title="FPS Data",
-        trace_id=trace_id,
-        data_type=DataType.FPS,
-        data_detail=parser.fps_values
-    ).transform_data()
-
-    gpu_data = XCTraceVisualizer(
-        title="GPU Data",
-        trace_id=trace_id,
-        data_type=DataType.GPU,
-        data_detail=parser.gpu_values
-    ).transform_data()
-
-    cpu_data = XCTraceVisualizer(
-        title="CPU Usage",
-        trace_id=trace_id,
-        data_type=DataType.CPU,
-        data_detail=parser.cpu_values
-    ).transform_data()
-
-    mem_data = XCTraceVisualizer(
-        title="Memory Usage",
-        trace_id=trace_id,
-        data_type=DataType.MEM,
-        data_detail=parser.mem_values
-    ).transform_data()
+    with parser._stage("transform"):
+        fps_data = XCTraceVisualizer(
+            title="FPS Data",
+            trace_id=trace_id,
+            data_type=DataType.FPS,
+            data_detail=parser.fps_values,
+            order=parser.time_orders.get("fps"),
+            full_resolution=full_resolution,
+        ).transform_data()
+
+        gpu_data = XCTraceVisualizer(
+            title="GPU Data",
+            trace_id=trace_id,
+            data_type=DataType.GPU,
+            data_detail=parser.gpu_values,
+            order=parser.time_orders.get("gpu"),
+            full_resolution=full_resolution,
+        ).transform_data()
+
+        cpu_data = XCTraceVisualizer(
+            title="CPU Usage",
+            trace_id=trace_id,
+            data_type=DataType.CPU,
+            data_detail=parser.cpu_values,
+            order=parser.time_orders.get("cpu"),
+            full_resolution=full_resolution,
+        ).transform_data()
+
+        mem_data = XCTraceVisualizer(
+            title="Memory Usage",
+            trace_id=trace_id,
+            data_type=DataType.MEM,
+            data_detail=parser.mem_values,
+            order=parser.time_orders.get("mem"),
+            full_resolution=full_resolution,
+        ).transform_data()
 
     # 生成可视化报告
-    dv = DataVisualizer(html_path=html_path)
-    dv.add_parsed_data(fps_data)
-    dv.add_parsed_data(gpu_data)
-    dv.add_parsed_data(cpu_data)
-    dv.add_parsed_data(mem_data)
-    dv.render_html()
+    if args.report_mode == "compact":
+        dv = CompactDataVisualizer(html_path=html_path)
+    elif args.report_mode == "large":
+        dv = CompactDataVisualizer(html_path=html_path, large=True)
+    else:
+        dv = DataVisualizer(html_path=html_path)
+    with parser._stage("render"):
+        dv.add_parsed_data(fps_data, mark_areas=jank_areas)
+        dv.add_parsed_data(gpu_data)
+        dv.add_parsed_data(cpu_data)
+        dv.add_parsed_data(mem_data)
+        dv.render_html()
     
     print(f"可视化完成 Report saved to: {html_path}")
+    if args.snapshot:
+        from svg_renderer import StaticVisualizer
+
+        sv = StaticVisualizer(
+            svg_path=html_path[:-len(".html")] + ".svg",
+            snapshot_path=html_path[:-len(".html")] + ".png",
+        )
+        for chart in (fps_data, gpu_data, cpu_data, mem_data):
+            sv.add_parsed_data(chart)
+        image_path = sv.render_svg() if args.snapshot == "svg" else sv.make_snapshot()
+        print(f"静态图已生成 Static image saved to: {image_path}")
+    if profiler:
+        parser.print_log(f"性能分析报告 Profile report: {profiler.write_report()}")
+
+def add_parse_arguments(parser):
+    """
+    解析相关的命令行参数，xctrace_parser.py 与 xctrace_cli.py parse 共用
+
+    Parse-related command line arguments, shared by xctrace_parser.py and
+    `xctrace_cli.py parse`.
+    """
+    parser.add_argument(
+        "-trace_path",
+        required=True,
+        help="Path to .trace file to analyze",
+    )
+    parser.add_argument(
+        "-target_process_name",
+        required=True,
+        help="Target process name to analyze (e.g. Steam)",
+    )
+    parser.add_argument(
+        "-output_dir",
+        default="./temp/save",
+        help="save() output directory",
+    )
+    parser.add_argument(
+        "-stream",
+        choices=["ndjson", "csv"],
+        default=None,
+        help="Stream rows to NDJSON/CSV while parsing (constant memory, no report)",
+    )
+    parser.add_argument(
+        "-gzip",
+        action="store_true",
+        help="gzip the -stream output",
+    )
+    parser.add_argument(
+        "-db_path",
+        default=None,
+        help="Also ingest the parsed series into this SQLite metrics store",
+    )
+    parser.add_argument(
+        "-parquet_dir",
+        default=None,
+        help="Also write the parsed series as a Parquet dataset partitioned by trace/process/metric (needs pyarrow)",
+    )
+    parser.add_argument(
+        "-checkpoint_rows",
+        type=int,
+        default=None,
+        help="Record a resumable checkpoint every N parsed rows (not with -stream)",
+    )
+    parser.add_argument(
+        "-resume",
+        "--resume",
+        action="store_true",
+        help="Continue from the last checkpoint of this trace (implies -checkpoint_rows, not with -stream)",
+    )
+    parser.add_argument(
+        "-profile",
+        "--profile",
+        nargs="?",
+        const="all",
+        choices=["all", "cpu", "memory"],
+        default=None,
+        help="Profile each pipeline stage with cProfile and/or tracemalloc, "
+        "dumps and a report are written next to the parse log",
+    )
+
+
+def run_parse(args):
+    """
+    按 add_parse_arguments 的参数解析（或流式解析）并保存，返回解析器。
+    不导入任何图表依赖，性能分析报告由调用方在最后写出
+
+    Parse (or stream) and save as configured by add_parse_arguments, and
+    return the parser. No charting dependency is imported; the caller writes
+    the profile report once it is done.
+    """
+    if args.stream and (args.checkpoint_rows or args.resume):
+        # 流式输出不保留已输出的行，无法从断点恢复 Streamed rows are not kept, so a stream cannot resume
+        raise ValueError("-stream 不支持 -checkpoint_rows/-resume -stream cannot be combined with -checkpoint_rows/-resume")
+    Path("./temp/parse").mkdir(parents=True, exist_ok=True)
+    # 生成唯一ID（+随机数）
+    trace_id = make_trace_id(args.trace_path)
+    if args.checkpoint_rows or args.resume:
+        from parse_checkpoint import ResumableParser
+
+        if args.resume:
+            # 续用断点中的 trace_id Reuse the trace_id of the checkpoint
+            trace_id = ResumableParser.resume_trace_id(args.trace_path) or trace_id
+        parser = ResumableParser(
+            trace_path=args.trace_path,
+            log_path=f"./temp/parse/{trace_id}_parse.log",
+            target_process_name=args.target_process_name,
+            trace_id=trace_id,
+            resume=args.resume,
+            checkpoint_rows=args.checkpoint_rows or 50000,
+        )
+    else:
+        parser = XCTraceParser(
+            trace_path=args.trace_path,
+            log_path=f"./temp/parse/{trace_id}_parse.log",
+            target_process_name=args.target_process_name,
+            trace_id=trace_id
+        )
+    if args.profile:
+        from stage_profiler import StageProfiler
+
+        parser.profiler = StageProfiler.from_mode(args.profile, parser.log_path, trace_id)
+    if args.stream:
+        parser.stream(output_dir=args.output_dir, fmt=args.stream, compress=args.gzip)
+        return parser
+
+    parser.parse()
+    parser.save(output_dir=args.output_dir)
+    if args.db_path:
+        from metrics_store import MetricsStore
+
+        store = MetricsStore(args.db_path)
+        store.ingest_parser(parser)
+        store.close()
+    if args.parquet_dir:
+        from parquet_sink import ArrowSink
+
+        ArrowSink(args.parquet_dir).write_parser(parser)
+        parser.print_log(f"已导出 Parquet Exported parquet to: {args.parquet_dir}")
+    return parser
+
+
+def make_trace_id(trace_path):
+    """由 trace 文件名生成唯一ID（+随机数） Unique trace id from the file name plus a random number"""
+    file_name_without_ext = os.path.splitext(os.path.basename(trace_path))[0]
+
+    prefix = f"{int(time.time())}"
+    if "_" in file_name_without_ext:
+        prefix = file_name_without_ext.split("_")[0]
+    elif len(file_name_without_ext) < 6:
+        prefix = file_name_without_ext
+    return f"{prefix}_{random.randint(1000,9999)}"
 
 class XCTraceParser:
     def __init__(self, trace_path, log_path, target_process_name, trace_id=None):
@@ -111,17 +307,47 @@ class XCTraceParser:
         
         # 路径配置
         self.temp_path = "./temp/parse"
-        self.prefix_cmd = f'xcrun xctrace export --input "{self.trace_path}"'
+        self.prefix_cmd = f'{xcrun_path()} xctrace export --input "{self.trace_path}"'
         
         # 数据存储
         self.fps_values = None
         self.gpu_values = None
         self.cpu_values = None
         self.mem_values = None
+        # 各序列的时间排序元数据 Sort order metadata of each series
+        self.time_orders = {}
+        # 目标进程的 pid，解析 sysmon-process 时取自 "Name (pid)" The target pid, from "Name (pid)" in sysmon-process
+        self.target_pid = None
+        self._string_pool = None
+        # 可选的 stage_profiler.StageProfiler，None 时不做任何性能采集
+        # Optional stage_profiler.StageProfiler, nothing is captured when None
+        self.profiler = None
 
     def _generate_trace_id(self):
         return f"{int(time.time())}_{random.randint(1000, 9999)}"
 
+    @property
+    def string_pool(self):
+        """
+        进程名的字符串驻留表，解析中遇到的名字按需驻留。不读取 bundle 的 uniquing 表：
+        导出数据里的名字已是字符串，预先解码整张表只是额外开销
+
+        String pool of process names, interned as they are seen. The bundle's
+        uniquing table is not read: exported names are already strings, so
+        decoding the whole table up front is pure overhead.
+        """
+        if self._string_pool is None:
+            from string_pool import StringPool
+
+            self._string_pool = StringPool()
+        return self._string_pool
+
+    def _stage(self, name):
+        """流水线阶段的性能采集，未开启时为空上下文 Profile a pipeline stage, a no-op when disabled"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.stage(name)
+
     def print_log(self, message):
         log_line = f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}"
         print(log_line)
@@ -136,11 +362,16 @@ class XCTraceParser:
             self._parse_gpu_fps()
             self._parse_cpu_mem()
             
-            # 反转时间序列（原始数据为倒序）
-            self.fps_values = list(reversed(self.fps_values))
-            self.gpu_values = list(reversed(self.gpu_values))
-            self.cpu_values = list(reversed(self.cpu_values))
-            self.mem_values = list(reversed(self.mem_values))
+            # 反转时间序列（原始数据为倒序），原地反转不复制，并同步排序元数据
+            # Reverse in place (the raw data is in reverse order) and flip the order metadata
+            for suffix, values in (
+                ("fps", self.fps_values),
+                ("gpu", self.gpu_values),
+                ("cpu", self.cpu_values),
+                ("mem", self.mem_values),
+            ):
+                values.reverse()
+                self.time_orders[suffix] = reverse_order(self.time_orders.get(suffix))
             
             self.print_log("解析成功完成 Parsing completed successfully")
         except Exception as e:
@@ -148,22 +379,178 @@ class XCTraceParser:
             raise
 
     def save(self, output_dir="./temp/save"):
-        Path(output_dir).mkdir(exist_ok=True)
+        with self._stage("save"):
+            Path(output_dir).mkdir(exist_ok=True)
         
-        def _save(data, suffix):
-            filename = f"{self.trace_id}_{suffix}.json"
-            d = output_dir + f"/{suffix}"
-            if not os.path.exists(d):
-                Path(d).mkdir(parents=True, exist_ok=True)
-            path = os.path.join(d, filename)
-            with open(path, "w") as f:
-                json.dump(data, f, indent=2)
-            self.print_log(f"保存文件: {path}")
-
-        _save(self.fps_values, "fps")
-        _save(self.gpu_values, "gpu")
-        _save(self.cpu_values, "cpu")
-        _save(self.mem_values, "mem")
+            def _save(data, suffix):
+                filename = f"{self.trace_id}_{suffix}.json"
+                d = output_dir + f"/{suffix}"
+                if not os.path.exists(d):
+                    Path(d).mkdir(parents=True, exist_ok=True)
+                path = os.path.join(d, filename)
+                with open(path, "w") as f:
+                    json.dump(data, f, indent=2)
+                self.print_log(f"保存文件: {path}")
+
+            _save(self.fps_values, "fps")
+            _save(self.gpu_values, "gpu")
+            _save(self.cpu_values, "cpu")
+            _save(self.mem_values, "mem")
+            self.save_summary(output_dir)
+
+    def stream(self, output_dir="./temp/save", fmt="ndjson", compress=False):
+        """
+        边解析边写出 NDJSON/CSV，不在内存中保存完整序列，文件会逐步出现，
+        下游可在解析结束前 tail。数据保持 export 的原始行顺序（不反转）。
+
+        Write NDJSON/CSV rows while parsing instead of holding the series in
+        memory. Files grow progressively so downstream tools can tail them.
+        Rows keep the raw export order (not reversed).
+        :param fmt: "ndjson" 或 "csv"
+        :param compress: 是否 gzip 压缩 gzip the output
+        :return: {suffix: path}
+        """
+        from stream_sinks import open_sink
+
+        self.print_log("启动流式解析 Starting streaming parse")
+        paths = {}
+
+        def _open(suffix, fields):
+            d = os.path.join(output_dir, suffix)
+            Path(d).mkdir(parents=True, exist_ok=True)
+            sink = open_sink(os.path.join(d, f"{self.trace_id}_{suffix}"), fmt, fields, compress)
+            paths[suffix] = sink.path
+            self.print_log(f"保存文件: {sink.path}")
+            return sink
+
+        try:
+            self._export_toc()
+            xml_path = self._export_xml(
+                schema_name="core-animation-fps-estimate",
+                output_suffix="core-animation-fps"
+            )
+            with self._stage("parse_core-animation-fps-estimate"), \
+                    _open("fps", ["time", "fps"]) as fps_sink, _open("gpu", ["time", "gpu"]) as gpu_sink:
+                for fps_item, gpu_item in self._iter_gpu_fps(xml_path):
+                    fps_sink.write(fps_item)
+                    gpu_sink.write(gpu_item)
+                self.print_log(f"获取到 {fps_sink.count} 条FPS记录;  {gpu_sink.count} 条GPU记录")
+
+            xml_path = self._export_xml(
+                schema_name="sysmon-process",
+                output_suffix="sysmon-process"
+            )
+            with self._stage("parse_sysmon-process"), \
+                    _open("cpu", ["time", "cpu"]) as cpu_sink, \
+                    _open("mem", ["time", "memory", "resident_size"]) as mem_sink:
+                for cpu_item, mem_item in self._iter_cpu_mem(xml_path):
+                    cpu_sink.write(cpu_item)
+                    mem_sink.write(mem_item)
+                self.print_log(f"获取到 {cpu_sink.count} 条CPU记录和 {mem_sink.count} 条内存记录")
+
+            self.print_log("流式解析完成 Streaming parse completed")
+        except Exception as e:
+            self.print_log(f"解析失败! 错误信息: {str(e)}")
+            raise
+        return paths
+
+    def save_jank(self, intervals, output_dir="./temp/save"):
+        """保存卡顿区间 Save jank intervals (jank_detector.JankInterval)"""
+        d = os.path.join(output_dir, "jank")
+        Path(d).mkdir(parents=True, exist_ok=True)
+        path = os.path.join(d, f"{self.trace_id}_jank.json")
+        with open(path, "w") as f:
+            json.dump([item._asdict() for item in intervals], f, indent=2)
+        self.print_log(f"保存文件: {path}")
+        return path
+
+    def save_summary(self, output_dir="./temp/save"):
+        """
+        保存摘要 sidecar 并更新 summary/index.json，概览时无需加载完整数据
+
+        Write the per-trace summary sidecar and update summary/index.json,
+        so that overviews never need to load the full series.
+        """
+        d = os.path.join(output_dir, "summary")
+        Path(d).mkdir(parents=True, exist_ok=True)
+
+        toc_info = self._read_toc_info()
+        summary = {
+            "trace_id": self.trace_id,
+            "trace_path": self.trace_path,
+            "process": self.target_process_name,
+            "pid": self.target_pid,
+            "device": toc_info.get("device", {}),
+            "run": toc_info.get("run", 1),
+            "metrics": {
+                "fps": summarize_values(self.fps_values, "fps"),
+                "gpu": summarize_values(self.gpu_values, "gpu"),
+                "cpu": summarize_values(self.cpu_values, "cpu"),
+                "mem": summarize_values(self.mem_values, "memory"),
+                "resident": summarize_values(self.mem_values, "resident_size"),
+            },
+        }
+        path = os.path.join(d, f"{self.trace_id}_summary.json")
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+        self.print_log(f"保存文件: {path}")
+
+        entry = {
+            "summary": os.path.basename(path),
+            "process": summary["process"],
+            "device": summary["device"].get("name", ""),
+            "run": summary["run"],
+            "metrics": {
+                name: {k: m[k] for k in ("count", "min", "max", "mean", "start", "end")}
+                for name, m in summary["metrics"].items()
+            },
+        }
+        # 多个解析进程可能同时写同一个输出目录：读-改-写在文件锁内完成，
+        # 临时文件名唯一，避免互相覆盖条目或 tmp 文件
+        # Several parses may share one output directory: the read-modify-write
+        # runs under a file lock and uses a unique temporary name, so no entry
+        # or tmp file is clobbered
+        index_path = os.path.join(d, "index.json")
+        with open(index_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                index = {}
+                if os.path.isfile(index_path):
+                    with open(index_path, "r") as f:
+                        try:
+                            index = json.load(f)
+                        except json.JSONDecodeError:
+                            index = {}
+                index[self.trace_id] = entry
+                fd, tmp_path = tempfile.mkstemp(prefix="index.", suffix=".tmp", dir=d)
+                try:
+                    with os.fdopen(fd, "w") as f:
+                        json.dump(index, f, indent=2)
+                    os.replace(tmp_path, index_path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_toc_info(self):
+        """从导出的 toc 中读取设备与 run 信息 Read device and run info from the exported toc"""
+        toc_path = os.path.join(self.temp_path, f"{self.trace_id}_toc.xml")
+        if not os.path.isfile(toc_path):
+            return {}
+        try:
+            root = ET.parse(toc_path).getroot()
+        except ET.ParseError as e:
+            self.print_log(f"toc 解析失败 toc parse failed: {e}")
+            return {}
+        run = root.find(".//run")
+        if run is None:
+            return {}
+        info = {"run": int(run.attrib.get("number", 1))}
+        device = run.find(".//target/device")
+        if device is not None:
+            info["device"] = dict(device.attrib)
+        return info
 
     def _export_xml(self, schema_name, output_suffix):
         """通用XML导出方法"""
@@ -174,7 +561,8 @@ class XCTraceParser:
             f"--xpath '/trace-toc/run[@number=\"1\"]/data/table[@schema=\"{schema_name}\"]'"
         )
         self.print_log(f"执行命令: {cmd}")
-        exit_code = os.system(cmd)
+        with self._stage(f"export_{schema_name}"):
+            exit_code = os.system(cmd)
         if exit_code != 0:
             raise RuntimeError(f"命令执行失败，退出码: {exit_code}")
         return output_path
@@ -184,7 +572,8 @@ class XCTraceParser:
         output_path = os.path.join(self.temp_path, f"{self.trace_id}_toc.xml")
         cmd = f"{self.prefix_cmd} --output {output_path} --toc"
         self.print_log(f"导出目录结构: {cmd}")
-        os.system(cmd)
+        with self._stage("export_toc"):
+            os.system(cmd)
 
     def _parse_gpu_fps(self):
         """解析FPS数据"""
@@ -192,33 +581,68 @@ class XCTraceParser:
             schema_name="core-animation-fps-estimate",
             output_suffix="core-animation-fps"
         )
-        
+        with self._stage("parse_core-animation-fps-estimate"):
+            self.fps_values, self.gpu_values = self._read_gpu_fps(xml_path)
+
+    def _read_gpu_fps(self, xml_path):
+        """读取已导出的FPS数据，返回 (fps, gpu) Read an exported FPS table"""
         self.print_log(f"解析FPS数据: {xml_path}")
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        
         fps_data = []
         gpu_data = []
-        cache = {}
-        for row in root.findall(".//row"):
+        for fps_item, gpu_item in self._iter_gpu_fps(xml_path):
+            fps_data.append(fps_item)
+            gpu_data.append(gpu_item)
+        self.print_log(f"获取到 {len(fps_data)} 条FPS记录;  {len(gpu_data)} 条GPU记录")
+        return fps_data, gpu_data
+
+    def _iter_rows(self, xml_path):
+        """
+        增量解析 XML，逐个产出 row 元素，处理后清空并从父节点移除以控制内存
+        （id 缓存中保存的是紧凑副本，不引用 row 的子元素）
+
+        Parse the XML incrementally and yield each row element. It is cleared
+        and detached from its parent afterwards to keep memory flat (the id
+        cache holds compact copies, never the row's children).
+        """
+        parent = None
+        for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+            if event == "start":
+                if elem.tag == "node":
+                    parent = elem
+            elif elem.tag == "row":
+                yield elem
+                elem.clear()
+                if parent is not None:
+                    parent.remove(elem)
+
+    def _iter_gpu_fps(self, xml_path, state=None):
+        """
+        逐行产出 (fps, gpu) 数据 Yield (fps, gpu) items row by row
+        :param state: 跨行状态（id 缓存与排序），断点续解析时传入恢复的状态
+                      cross-row state (id cache and order), restored when resuming from a checkpoint
+        """
+        state = {} if state is None else state
+        cache = state.setdefault("cache", RefCache())
+        order = state.setdefault("order", OrderTracker())
+        for row in self._iter_rows(xml_path):
             time_ele = self._get_cached_element(row, ".//start-time", cache)
             fps_ele = self._get_cached_element(row, ".//fps", cache)
             gpu_ele = self._get_cached_element(row, ".//percent", cache)
-            fmt_time = time_ele.attrib["fmt"]
-
-            fps_data.append({
-                "time": fmt_time,
-                "fps": float(fps_ele.text)
-            })
-
-            gpu_data.append({
-                "time": time_ele.attrib["fmt"],
-                "gpu": float(gpu_ele.text)
-            })
-        
-        self.fps_values = fps_data
-        self.gpu_values = gpu_data
-        self.print_log(f"获取到 {len(fps_data)} 条FPS记录;  {len(gpu_data)} 条GPU记录")
+            fmt_time = time_ele.get("fmt")
+            order.update(element_time_key(time_ele))
+
+            yield (
+                {
+                    "time": fmt_time,
+                    "fps": float(fps_ele.text)
+                },
+                {
+                    "time": fmt_time,
+                    "gpu": float(gpu_ele.text)
+                },
+            )
+
+        self.time_orders["fps"] = self.time_orders["gpu"] = order.order
 
     def _parse_cpu_mem(self):
         """解析CPU和内存数据"""
@@ -226,36 +650,69 @@ class XCTraceParser:
             schema_name="sysmon-process",
             output_suffix="sysmon-process"
         )
-        
+        with self._stage("parse_sysmon-process"):
+            self.cpu_values, self.mem_values = self._read_cpu_mem(xml_path)
+
+    def _read_cpu_mem(self, xml_path, process_name=None):
+        """
+        读取已导出的CPU/内存数据，返回 (cpu, mem)
+        :param process_name: 目标进程名，默认为 target_process_name
+        """
         self.print_log(f"解析CPU/内存数据: {xml_path}")
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        
         cpu_data = []
         mem_data = []
-        cache = {}
-        last_cpu = 0.0
+        for cpu_item, mem_item in self._iter_cpu_mem(xml_path, process_name):
+            cpu_data.append(cpu_item)
+            mem_data.append(mem_item)
+        self.print_log(f"获取到 {len(cpu_data)} 条CPU记录和 {len(mem_data)} 条内存记录")
+        return cpu_data, mem_data
+
+    def _iter_cpu_mem(self, xml_path, process_name=None, state=None):
+        """
+        逐行产出目标进程的 (cpu, mem) 数据 Yield (cpu, mem) items of the target process
+        :param state: 跨行状态（id 缓存、排序与上一个 CPU 值），断点续解析时传入恢复的状态
+                      cross-row state (id cache, order and last cpu), restored when resuming from a checkpoint
+        """
+        target_process_name = process_name or self.target_process_name
+        pool = self.string_pool
+        target_id = pool.intern(target_process_name)
+        # process 的 fmt -> 进程名 id，每个进程只解码一次
+        # process fmt -> process name id, each process is decoded once
+        process_name_ids = {}
+        state = {} if state is None else state
+        cache = state.setdefault("cache", RefCache())
+        order = state.setdefault("order", OrderTracker())
+        last_cpu = state.get("last_cpu", 0.0)
+        if state.get("pid") is not None:
+            self.target_pid = state["pid"]
         mem_text = None
         resident_text = None
-        for row in root.findall(".//row"):
+        for row in self._iter_rows(xml_path):
             # 预加载所有 size-in-bytes 元素到缓存
-            for size_ele in row.findall(".//size-in-bytes"):
-                if "id" in size_ele.attrib:
-                    cache[size_ele.attrib["id"]] = size_ele
+            for size_ele in row.iter("size-in-bytes"):
+                size_id = size_ele.get("id")
+                if size_id is not None:
+                    cache[size_id] = CompactElement(size_ele.tag, size_ele.text, size_ele.get("fmt"))
             # 提取时间戳
             time_ele = self._get_cached_element(row, ".//start-time", cache)
-            timestamp = time_ele.attrib["fmt"]
+            timestamp = time_ele.get("fmt")
             
             # 检查进程名称
             process_ele = self._get_cached_element(row, ".//process", cache)
-            process_name = process_ele.attrib["fmt"].split()[0]
-            if process_name != self.target_process_name:
+            process_fmt = process_ele.get("fmt")
+            name_id = process_name_ids.get(process_fmt)
+            if name_id is None:
+                name_id = process_name_ids[process_fmt] = pool.intern(process_fmt.split()[0])
+            if name_id != target_id:
                 continue
+            if self.target_pid is None:
+                self.target_pid = state["pid"] = process_pid(process_fmt)
+            order.update(element_time_key(time_ele))
                 
             # 解析CPU
             cpu_ele = self._get_cached_element(row, ".//system-cpu-percent", cache)
             cpu_value = float(cpu_ele.text) if cpu_ele is not None else last_cpu
-            last_cpu = cpu_value
+            last_cpu = state["last_cpu"] = cpu_value
             
             # 解析内存
             mem_ele = self._get_cached_element(row, ".//size-in-bytes[3]", cache)
@@ -271,23 +728,23 @@ class XCTraceParser:
             else:
                 resident_text = "0"
 
-            cpu_data.append({"time": timestamp, "cpu": cpu_value})
-            mem_data.append({
-                "time": timestamp,
-                "memory": float(mem_text) / 1048576,  # 转换为MB
-                "resident_size": float(resident_text) / 1048576
-            })
-        
-        self.cpu_values = cpu_data
-        self.mem_values = mem_data
-        self.print_log(f"获取到 {len(cpu_data)} 条CPU记录和 {len(mem_data)} 条内存记录")
+            yield (
+                {"time": timestamp, "cpu": cpu_value},
+                {
+                    "time": timestamp,
+                    "memory": float(mem_text) / 1048576,  # 转换为MB
+                    "resident_size": float(resident_text) / 1048576
+                },
+            )
+
+        self.time_orders["cpu"] = self.time_orders["mem"] = order.order
 
     def _get_cached_element(self, row, xpath, cache):
         """
         处理XML压缩结构
         :param row: XML行元素
         :param xpath: 查找路径
-        :param cache: ID缓存字典
+        :param cache: ID缓存（RefCache 或字典），保存元素的紧凑副本 CompactElement
         :return: 第一个匹配的元素
         """
         elements = row.findall(xpath)
@@ -299,14 +756,16 @@ class XCTraceParser:
              # 处理引用逻辑
             if "ref" in ele.attrib:
                 ref_id = ele.attrib["ref"]
-                if ref_id not in cache:
+                cached = cache.get(ref_id)
+                if cached is None:
                     self.print_log(f"严重警告: 跨行引用 {ref_id} 未找到，请检查XML结构！")
                     continue
-                ele = cache[ref_id]
+                ele = cached
 
             # 处理id逻辑
-            if "id" in ele.attrib:
-                cache[ele.attrib["id"]] = ele
+            elif "id" in ele.attrib:
+                ele_id = ele.attrib["id"]
+                ele = cache[ele_id] = CompactElement(ele.tag, ele.text, ele.get("fmt"))
 
             # 记录第一个有效元素
             if first_element is None:
@@ -375,14 +834,306 @@ def duration_to_seconds(duration_str):
     #     return 3600
     return seconds
 
+# 时间序列的排序元数据，None 表示无序或未知
+# Sort order metadata of a time series, None means unsorted or unknown
+ASCENDING = "asc"
+DESCENDING = "desc"
+
+
+class CompactElement:
+    """
+    id 缓存中保存的元素副本：只保留 tag、text 与 fmt，不引用原 XML 树。
+    提供解析时用到的 Element 接口（tag、text、attrib、get）。
+
+    The copy of an element kept in the id cache: only tag, text and fmt, with
+    no reference to the XML tree. Offers the Element interface the parsers
+    use (tag, text, attrib, get).
+    """
+
+    __slots__ = ("tag", "text", "fmt")
+
+    def __init__(self, tag, text, fmt):
+        self.tag = tag
+        self.text = text
+        self.fmt = fmt
+
+    @property
+    def attrib(self):
+        return {} if self.fmt is None else {"fmt": self.fmt}
+
+    def get(self, key, default=None):
+        if key == "fmt" and self.fmt is not None:
+            return self.fmt
+        return default
+
+
+class RefCache:
+    """
+    有上限的 id -> CompactElement 缓存。内存中最多保留 max_entries 个 id，
+    超出时把最早的一半批量写入临时 SQLite 数据库（磁盘上，关闭时删除），
+    被引用时再读回，所以内存占用不随 trace 长度增长，而引用仍然都能解析。
+
+    Bounded id -> CompactElement cache. At most max_entries ids stay in
+    memory; beyond that the oldest half is written in one batch to a
+    temporary on-disk SQLite database (deleted on close) and read back when
+    referenced. Memory no longer grows with the trace while every ref still
+    resolves.
+    """
+
+    # 每个 id 在内存中大约占用的字节数 Approximate in-memory bytes per id
+    ENTRY_BYTES = 256
+
+    def __init__(self, max_entries=65536):
+        self.max_entries = max_entries
+        self.spilled = 0
+        self._hot = {}
+        self._db = None
+
+    @classmethod
+    def for_budget(cls, memory_budget):
+        """按内存预算确定上限 Size the cache from a memory budget in bytes"""
+        return cls(max(1024, memory_budget // cls.ENTRY_BYTES))
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._put(key, value)
+
+    def get(self, key, default=None):
+        value = self._hot.get(key)
+        if value is None and self._db is not None:
+            row = self._db.execute("SELECT tag, text, fmt FROM refs WHERE id = ?", (int(key),)).fetchone()
+            if row is not None:
+                # 读回的 id 放回内存，不算新增 A read-back id goes back to memory, it is not a new id
+                value = CompactElement(*row)
+                self._put(key, value)
+        return default if value is None else value
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _put(self, key, value):
+        hot = self._hot
+        hot[key] = value
+        if len(hot) > self.max_entries:
+            self._spill(len(hot) // 2)
+
+    def _spill(self, count):
+        if self._db is None:
+            # 空文件名：SQLite 的私有临时数据库，关闭时自动删除
+            # An empty name is a private temporary SQLite database, removed on close
+            self._db = sqlite3.connect("")
+            self._db.execute("PRAGMA journal_mode=OFF")
+            self._db.execute("PRAGMA synchronous=OFF")
+            # xctrace 的 id 为递增的整数，作为 rowid 写入基本是顺序追加
+            # xctrace ids are increasing integers, so as rowids the inserts are mostly appends
+            self._db.execute("CREATE TABLE refs (id INTEGER PRIMARY KEY, tag TEXT, text TEXT, fmt TEXT)")
+        hot = self._hot
+        keys = list(islice(hot, count))
+        with self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO refs VALUES (?, ?, ?, ?)",
+                ((int(key), hot[key].tag, hot[key].text, hot[key].fmt) for key in keys),
+            )
+            self.spilled += self._db.total_changes - before
+        for key in keys:
+            del hot[key]
+
+
+class OrderTracker:
+    """
+    逐个输入排序键，线性判断序列是升序、降序还是无序
+
+    Feed sort keys one by one to find out in linear time whether a series
+    is ascending, descending or unsorted.
+    """
+
+    def __init__(self):
+        self._prev = None
+        self._asc = True
+        self._desc = True
+
+    def update(self, key):
+        prev = self._prev
+        if prev is not None:
+            if key < prev:
+                self._asc = False
+            elif key > prev:
+                self._desc = False
+        self._prev = key
+
+    def to_dict(self):
+        return {"prev": self._prev, "asc": self._asc, "desc": self._desc}
+
+    @classmethod
+    def from_dict(cls, data):
+        tracker = cls()
+        tracker._prev = data["prev"]
+        tracker._asc = data["asc"]
+        tracker._desc = data["desc"]
+        return tracker
+
+    @property
+    def order(self):
+        if self._asc:
+            return ASCENDING
+        if self._desc:
+            return DESCENDING
+        return None
+
+
+def process_pid(fmt):
+    """"Name (pid)" -> pid，没有 pid 时为 None  "Name (pid)" -> pid, None without one"""
+    _, _, rest = str(fmt).rpartition(" (")
+    try:
+        return int(rest[:-1]) if rest.endswith(")") else None
+    except ValueError:
+        return None
+
+
+def element_time_key(time_ele):
+    """start-time 元素的排序键（纳秒） Sort key of a start-time element (ns)"""
+    try:
+        return int(time_ele.text)
+    except (TypeError, ValueError):
+        return fmt_to_seconds(time_ele.attrib["fmt"])
+
+
+def reverse_order(order):
+    if order == ASCENDING:
+        return DESCENDING
+    if order == DESCENDING:
+        return ASCENDING
+    return None
+
+
+def detect_order(data, key):
+    tracker = OrderTracker()
+    for item in data:
+        tracker.update(key(item))
+        if tracker.order is None:
+            break
+    return tracker.order
+
+
+def sort_by_time(data, order=None, key=None):
+    """
+    与 sorted(data, key=key) 结果一致的稳定排序，已排序时不复制也不排序：
+    升序直接返回，降序按相同键分组线性反转，只有无序时才排序
+
+    Stable sort with the same result as sorted(data, key=key), without a
+    copy or a sort when the input is already ordered: ascending input is
+    returned as is, descending input is reversed group-wise in linear time,
+    and only unsorted input is sorted.
+    :param order: 已知的排序元数据，None 时线性检测 known order, detected when None
+    """
+    if key is None:
+        key = _default_time_key
+    if order is None:
+        order = detect_order(data, key)
+    if order == ASCENDING:
+        return data
+    if order == DESCENDING:
+        result = []
+        end = len(data)
+        while end > 0:
+            begin = end - 1
+            k = key(data[begin])
+            while begin > 0 and key(data[begin - 1]) == k:
+                begin -= 1
+            result.extend(data[begin:end])
+            end = begin
+        return result
+    return sorted(data, key=key)
+
+
+def merge_sorted_series(series_list, key=None):
+    """
+    线性 k 路归并多个时间序列（多次 run 或分段），每个输入先按 sort_by_time 规整为升序
+
+    Linear k-way merge of several time series (runs or segments). Each input
+    is first normalized to ascending with sort_by_time.
+    """
+    if key is None:
+        key = _default_time_key
+    normalized = [sort_by_time(series, key=key) for series in series_list if series]
+    if len(normalized) == 1:
+        return list(normalized[0])
+    return list(heapq.merge(*normalized, key=key))
+
+
+def _default_time_key(item):
+    return item["time"]
+
+
+def summarize_values(values, field):
+    """
+    计算单个指标的摘要：数量、最值、均值、分位数与时间范围
+
+    Summarize one metric: count, min/max/mean, percentiles and time span.
+    """
+    if not values:
+        return {
+            "count": 0, "min": None, "max": None, "mean": None,
+            "p50": None, "p90": None, "p99": None, "start": None, "end": None,
+        }
+    numbers = sorted(item[field] for item in values)
+    times = [fmt_to_seconds(item["time"]) for item in values]
+    count = len(numbers)
+
+    def _percentile(p):
+        # nearest-rank
+        return numbers[min(count - 1, max(0, int(round(p / 100 * count)) - 1))]
+
+    return {
+        "count": count,
+        "min": numbers[0],
+        "max": numbers[-1],
+        "mean": round(sum(numbers) / count, 3),
+        "p50": _percentile(50),
+        "p90": _percentile(90),
+        "p99": _percentile(99),
+        "start": min(times),
+        "end": max(times),
+    }
+
+def fmt_to_seconds(fmt_time):
+    """
+    将 xctrace 的时间格式 (MM:SS.mmm.uuu) 转换为带小数的秒数
+
+    Convert an xctrace fmt time (MM:SS.mmm.uuu) to float seconds.
+    """
+    head, _, rest = str(fmt_time).partition(".")
+    seconds = duration_to_seconds(head)
+    fraction = rest.replace(".", "")
+    if fraction:
+        seconds += float(f"0.{fraction}")
+    return seconds
+
 
 
 class XCTraceVisualizer:
-    def __init__(self, title, trace_id, data_type: DataType, data_detail: list):
+    def __init__(self, title, trace_id, data_type: DataType, data_detail: list, order=None, full_resolution=False):
         self.title = title
         self.trace_id = trace_id
         self.data_type = data_type
         self.data_detail = data_detail
+        # data_detail 的时间排序元数据 Sort order metadata of data_detail
+        self.order = order
+        # True 时保留每个采样点，时间为带小数的秒数（大数据量报告用），否则按整秒去重
+        # True keeps every sample with fractional seconds as time (for the large
+        # report), otherwise samples are deduplicated to whole seconds
+        self.full_resolution = full_resolution
 
         self._y_label = None
         # list, {"time": "MM:SS", "value": number}
@@ -406,6 +1157,8 @@ class XCTraceVisualizer:
         return self._get_dv_parsed_data()
 
     def _get_dv_parsed_data(self):
+        from data_visualizer import ParsedData
+
         y_seq = []
         x_seq = []
 
@@ -436,9 +1189,9 @@ class XCTraceVisualizer:
             _value = item["fps"]
             # ts = date2timestamp(_time.split(".")[0])
             # 使用新函数计算总秒数
-            ts = duration_to_seconds(_time.split(".")[0])
+            ts = self._time_seconds(_time)
             d.append({"time": ts, "value": _value})
-        s_data = sorted(d, key=lambda item: item["time"])
+        s_data = sort_by_time(d, self.order)
         return self._remove_same_time_data(s_data)
 
     def _transform_gpu_data(self):
@@ -448,9 +1201,9 @@ class XCTraceVisualizer:
             _value = item["gpu"]
             # ts = date2timestamp(_time.split(".")[0])
             # 使用新函数计算总秒数
-            ts = duration_to_seconds(_time.split(".")[0])
+            ts = self._time_seconds(_time)
             d.append({"time": ts, "value": _value})
-        s_data = sorted(d, key=lambda item: item["time"])
+        s_data = sort_by_time(d, self.order)
         return self._remove_same_time_data(s_data)
 
     def _transform_cpu_data(self):
@@ -460,9 +1213,9 @@ class XCTraceVisualizer:
             _value = round(item["cpu"], 2)
             # ts = date2timestamp(_time.split(".")[0])
             # 使用新函数计算总秒数
-            ts = duration_to_seconds(_time.split(".")[0])
+            ts = self._time_seconds(_time)
             d.append({"time": ts, "value": _value})
-        s_data = sorted(d, key=lambda item: item["time"])
+        s_data = sort_by_time(d, self.order)
         return self._remove_same_time_data(s_data)
 
     def _transform_mem_data(self):
@@ -472,12 +1225,20 @@ class XCTraceVisualizer:
             _value = round(item["memory"], 2)
             # ts = date2timestamp(_time.split(".")[0])
             # 使用新函数计算总秒数
-            ts = duration_to_seconds(_time.split(".")[0])
+            ts = self._time_seconds(_time)
             d.append({"time": ts, "value": _value})
-        s_data = sorted(d, key=lambda item: item["time"])
+        s_data = sort_by_time(d, self.order)
         return self._remove_same_time_data(s_data)
 
+    def _time_seconds(self, _time):
+        if self.full_resolution:
+            return fmt_to_seconds(_time)
+        return duration_to_seconds(_time.split(".")[0])
+
     def _remove_same_time_data(self, data):
+        if self.full_resolution:
+            # 不去重，时间保持秒数供数值时间轴使用 No dedup, times stay seconds for the numeric axis
+            return data
         filter_data = []
         before_item = None
         for item in data:
@@ -8,7 +8,14 @@ import xml.etree.ElementTree as ET
 from pathlib import Path
 import argparse
 import json
+import math
+import heapq
+from collections import deque
+from itertools import islice
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from data_visualizer import ParsedData, DataVisualizer
+from xctrace_parser import fmt_to_seconds, sort_by_time, xcrun_path
 
 
 def main():
@@ -25,10 +32,32 @@ def main():
     )
     parser.add_argument(
         "-device_id",
-        required=True,
         help="iPhone device_id",
         default="",
     )
+    parser.add_argument(
+        "-device_ids",
+        nargs="+",
+        help="multiple iPhone device_id, record concurrently",
+        default=None,
+    )
+    parser.add_argument(
+        "-segment_length",
+        help="segmented rolling record, length of each segment，<time[ms|s|m|h]>",
+        default=None,
+    )
+    parser.add_argument(
+        "-render_every",
+        type=int,
+        help="segmented rolling record, refresh the partial report every N segments (0: only at the end)",
+        default=5,
+    )
+    parser.add_argument(
+        "-parse_workers",
+        type=int,
+        help="max parse worker processes when recording multiple devices",
+        default=None,
+    )
     parser.add_argument(
         "-target_process_name",
         help="target analyse process",
@@ -40,51 +69,141 @@ def main():
         default=None,
     )
     args = parser.parse_args()
+    if not args.device_id and not args.device_ids:
+        parser.error("-device_id or -device_ids is required")
     template_path = args.template_path
     device_id = args.device_id
     target_process_name = args.target_process_name
     time_limit = args.time_limit
 
+    if args.device_ids:
+        # 多设备并发录制 Record multiple devices concurrently
+        multi_recorder = XCTraceMultiRecorder(
+            template_path=template_path,
+            device_ids=args.device_ids,
+            target_process_name=target_process_name,
+            max_workers=args.parse_workers,
+        )
+        results = multi_recorder.run(time_limit=time_limit)
+        for device, html_path in results.items():
+            print(f"{device}: {html_path}")
+        return
+
+    if args.segment_length:
+        # 分段滚动录制 Segmented rolling record
+        segment_count = None
+        if time_limit:
+            segment_count = math.ceil(
+                time_limit_to_seconds(time_limit) / time_limit_to_seconds(args.segment_length)
+            )
+        segment_recorder = XCTraceSegmentRecorder(
+            template_path=template_path,
+            device_id=device_id,
+            target_process_name=target_process_name,
+            segment_length=args.segment_length,
+            max_workers=args.parse_workers,
+            render_every=args.render_every,
+        )
+        html_path = segment_recorder.run(segment_count=segment_count)
+        print(f"可视化完成 End visualize, render HTML path: {html_path}")
+        return
+
     # record
     recorder = XCTraceRecorder(template_path=template_path, device_id=device_id)
     recorder.record(time_limit=time_limit)
     trace_path = recorder.output_trace_path
 
-    # export
-    trace_id = recorder.id
+    # export + visualize
+    html_path = parse_trace(trace_path, target_process_name, recorder.id)
+    print(f"可视化完成 End visualize, render HTML path: {html_path}")
+
+
+def parse_trace(trace_path, target_process_name, trace_id):
+    """
+    解析单个 trace 并生成报告，返回 html 路径（可在工作进程中执行）
+
+    Parse one trace and render its report, return the html path.
+    Module level so that it can run inside a worker process.
+    """
     log_path = f"./temp/parse/{trace_id}_parse.log"
     parser = XCTraceParser(trace_path, log_path, target_process_name, trace_id=trace_id)
     parser.parse()
     parser.save()
 
     # visualize
-    print("开始可视化 Start visualize")
     html_path = f"./temp/visualize/{trace_id}_fps.html"
-    trace_id = recorder.id
+    render_report(
+        trace_id, html_path, parser.fps_values, parser.cpu_values, parser.mem_values
+    )
+    return html_path
+
+
+def parse_segment(trace_path, target_process_name, trace_id):
+    """
+    解析单个分段 trace，返回 (fps, cpu, mem, 录制开始时间) 数据（可在工作进程中执行），
+    开始时间取自 toc 的 start-date（epoch 秒），没有时为 None
+
+    Parse one segment trace and return its (fps, cpu, mem, start) values.
+    start is the toc start-date in epoch seconds, None when it is missing.
+    """
+    log_path = f"./temp/parse/{trace_id}_parse.log"
+    parser = XCTraceParser(trace_path, log_path, target_process_name, trace_id=trace_id)
+    parser.parse()
+    parser.save()
+    start = read_toc_start(f"{parser.temp_path}/{parser.id}_root.xml")
+    return parser.fps_values, parser.cpu_values, parser.mem_values, start
+
+
+def read_toc_start(toc_path):
+    """
+    读取 toc 中 run 的 start-date，返回 epoch 秒数，读取失败时返回 None
+
+    Read the run start-date from an exported toc as epoch seconds,
+    None when it cannot be read.
+    """
+    try:
+        start = ET.parse(toc_path).getroot().find(".//summary/start-date")
+    except (OSError, ET.ParseError):
+        return None
+    if start is None or not start.text:
+        return None
+    try:
+        return datetime.fromisoformat(start.text.strip().replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def render_report(trace_id, html_path, fps_values, cpu_values, mem_values):
+    print("开始可视化 Start visualize")
     fps_pd = XCTraceVisualizer(
         f"{trace_id} FPS",
         trace_id=trace_id,
         data_type=DataType.FPS,
-        data_detail=parser.fps_values,
+        data_detail=fps_values,
     ).transform_data()
     cpu_pd = XCTraceVisualizer(
         f"{trace_id} CPU",
         trace_id=trace_id,
         data_type=DataType.CPU,
-        data_detail=parser.cpu_values,
+        data_detail=cpu_values,
     ).transform_data()
     mem_pd = XCTraceVisualizer(
         f"{trace_id} MEM",
         trace_id=trace_id,
         data_type=DataType.MEM,
-        data_detail=parser.mem_values,
+        data_detail=mem_values,
     ).transform_data()
     dv = DataVisualizer(html_path=html_path)
     dv.add_parsed_data(fps_pd)
     dv.add_parsed_data(cpu_pd)
     dv.add_parsed_data(mem_pd)
     dv.render_html()
-    print(f"可视化完成 End visualize, render HTML path: {html_path}")
+
+
+def _ignore_sigint():
+    # 解析进程忽略 Ctrl-C，由主进程统一处理
+    # Parse workers ignore Ctrl-C, the main process handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
 
 
 class XCTraceRecorder:
@@ -93,10 +212,13 @@ class XCTraceRecorder:
     Only support 1 template, 1 device_id, 1 record task
     """
 
-    def __init__(self, template_path, device_id):
-        ct = int(time.time())
-        random_id = get_random_id(4)
-        self.id = f"{ct}_{random_id}"
+    def __init__(self, template_path, device_id, record_id=None):
+        if record_id is None:
+            ct = int(time.time())
+            random_id = get_random_id(4)
+            self.id = f"{ct}_{random_id}"
+        else:
+            self.id = record_id
         self.log_path = f"./temp/{self.id}_run.log"
         self.record_log_path = f"./temp/{self.id}_record.log"
 
@@ -104,6 +226,9 @@ class XCTraceRecorder:
         self.device_id = device_id
         self.output_trace_path = f"./temp/{self.id}.trace"
 
+        self.proc = None
+        self._rlog_fd = None
+
     def print_log(self, strs):
         print(strs)
         with open(self.log_path, "a") as f:
@@ -111,6 +236,24 @@ class XCTraceRecorder:
             f.write("\n")
 
     def record(self, time_limit=None):
+        proc = self.start(time_limit=time_limit)
+        try:
+            proc.wait()
+
+        except KeyboardInterrupt as e:
+            self.print_log(f"KeyboardInterrupt {e}, send SIGINT，wait `record` stop")
+            self.stop()
+        self.finish()
+
+    def start(self, time_limit=None, new_session=False):
+        """
+        启动 `record` 子进程后立即返回
+        new_session 为 True 时子进程不接收终端的 Ctrl-C，需要调用 stop 转发
+
+        Start the `record` subprocess and return immediately.
+        With new_session the child does not get the terminal Ctrl-C,
+        call `stop` to forward SIGINT.
+        """
         args_dict = {
             "template": self.template_path,
             "device": self.device_id,
@@ -118,25 +261,394 @@ class XCTraceRecorder:
         }
         if time_limit:
             args_dict["time-limit"] = time_limit
-        args_list = "xcrun xctrace record --append-run --all-process".split(" ")
+        args_list = [xcrun_path()] + "xctrace record --append-run --all-process".split(" ")
         for key, value in args_dict.items():
             args_list.append(f"--{key}")
             args_list.append(value)
         self.print_log(f"args_list: {args_list}")
         self.print_log(f"args_list join: {' '.join(args_list)}")
 
-        rlog_fd = open(self.record_log_path, "a")
-        proc = subprocess.Popen(
-            args_list, stdout=rlog_fd, stderr=rlog_fd, universal_newlines=True
-        )
-        self.print_log(f"subprocess pid {proc.pid}")
+        self._rlog_fd = open(self.record_log_path, "a")
         try:
-            proc.wait()
+            self.proc = subprocess.Popen(
+                args_list,
+                stdout=self._rlog_fd,
+                stderr=self._rlog_fd,
+                universal_newlines=True,
+                start_new_session=new_session,
+            )
+        except BaseException:
+            self._rlog_fd.close()
+            self._rlog_fd = None
+            raise
+        self.print_log(f"subprocess pid {self.proc.pid}")
+        return self.proc
+
+    def stop(self):
+        """发送 SIGINT 并等待 `record` 保存结束 Send SIGINT and wait `record` to save"""
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGINT)
+            self.proc.wait()
+
+    def finish(self):
+        if self._rlog_fd is not None:
+            self._rlog_fd.close()
+            self._rlog_fd = None
+        if self.proc is not None:
+            self.print_log(f"record exit code {self.proc.returncode}")
+            return self.proc.returncode
+        return None
+
+
+class XCTraceMultiRecorder:
+    """
+    多设备并发录制：每台设备独立的 trace 与日志，
+    Ctrl-C 会转发 SIGINT 给所有 `record` 子进程，
+    每个录制结束后立即把解析任务投递到进程池
 
-        except KeyboardInterrupt as e:
-            self.print_log(f"KeyboardInterrupt {e}, send SIGINT，wait `record` stop")
-            proc.send_signal(signal.SIGINT)
-            proc.wait()
+    Record on several devices concurrently, each with its own trace and logs.
+    Ctrl-C forwards SIGINT to every `record` child, and every finished trace
+    is queued for parsing on a process pool right away.
+    """
+
+    def __init__(self, template_path, device_ids, target_process_name, max_workers=None):
+        self.recorders = [
+            XCTraceRecorder(template_path=template_path, device_id=device_id)
+            for device_id in device_ids
+        ]
+        self.target_process_name = target_process_name
+        self.max_workers = max_workers
+        self.poll_interval = 0.2
+
+    def run(self, time_limit=None):
+        """
+        返回 {device_id: html_path}，录制或解析失败的设备值为 None
+
+        Return {device_id: html_path}, None for devices whose record or parse failed.
+        """
+        futures = {}
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_ignore_sigint
+        ) as pool:
+            self._start_all(time_limit)
+
+            pending = list(self.recorders)
+            try:
+                while pending:
+                    for recorder in list(pending):
+                        if recorder.proc.poll() is None:
+                            continue
+                        pending.remove(recorder)
+                        self._submit(pool, recorder, futures)
+                    if pending:
+                        time.sleep(self.poll_interval)
+            except KeyboardInterrupt as e:
+                print(f"KeyboardInterrupt {e}, send SIGINT to {len(pending)} `record`")
+                for recorder in pending:
+                    recorder.proc.send_signal(signal.SIGINT)
+                for recorder in pending:
+                    recorder.proc.wait()
+                    self._submit(pool, recorder, futures)
+
+            results = {}
+            for recorder in self.recorders:
+                future = futures.get(recorder.id)
+                if future is None:
+                    results[recorder.device_id] = None
+                    continue
+                try:
+                    results[recorder.device_id] = future.result()
+                except Exception as e:
+                    recorder.print_log(f"解析失败 Parse failed: {e}")
+                    results[recorder.device_id] = None
+        return results
+
+    def _start_all(self, time_limit):
+        """
+        启动所有设备的 `record`，任一设备启动失败时结束已启动的子进程后再抛出
+
+        Start `record` on every device. If one fails to start, the children
+        already started are stopped before the error is raised.
+        """
+        started = []
+        try:
+            for recorder in self.recorders:
+                recorder.start(time_limit=time_limit, new_session=True)
+                started.append(recorder)
+        except BaseException as e:
+            for recorder in started:
+                recorder.print_log(f"设备启动失败，结束录制 Another device failed to start, stop recording: {e}")
+                recorder.stop()
+                recorder.finish()
+            raise
+
+    def _submit(self, pool, recorder, futures):
+        exit_code = recorder.finish()
+        if exit_code != 0 or not os.path.exists(recorder.output_trace_path):
+            recorder.print_log(f"录制失败 Record failed: {recorder.device_id}")
+            return
+        futures[recorder.id] = pool.submit(
+            parse_trace,
+            recorder.output_trace_path,
+            self.target_process_name,
+            recorder.id,
+        )
+
+
+class XCTraceSegmentRecorder:
+    """
+    分段滚动录制：连续录制固定时长的分段，
+    录制第 N+1 段的同时在后台进程中导出并解析第 N 段。
+    每段解析完成后按 toc 的开始时间计算偏移，归并进合并结果，
+    每 render_every 段刷新一次部分报告，录制过程中即可查看；
+    合并结果中已不会再变化的行（早于最新分段起点的行）按时间顺序追加到
+    {id}_{fps|cpu|mem}.ndjson，与最终的 json 顺序一致。
+    合并的 json 与完整报告在录制结束时生成
+
+    Segmented rolling record: record back-to-back fixed-length segments.
+    While segment N+1 records, segment N is exported and parsed in the
+    background, shifted by its offset from the toc start date and merged
+    into the combined result. The partial report is refreshed every
+    render_every segments so it can be watched while recording goes on.
+    Combined rows that can no longer change (those before the start of the
+    newest segment) are appended in time order to
+    {id}_{fps|cpu|mem}.ndjson, in the same order as the final json. The
+    combined json and the full report are written when recording ends.
+    A crash only loses the segments not yet appended.
+    """
+
+    def __init__(
+        self,
+        template_path,
+        device_id,
+        target_process_name,
+        segment_length,
+        max_workers=None,
+        render_every=5,
+    ):
+        ct = int(time.time())
+        random_id = get_random_id(4)
+        self.id = f"{ct}_{random_id}"
+        self.template_path = template_path
+        self.device_id = device_id
+        self.target_process_name = target_process_name
+        self.segment_length = segment_length
+        self.max_workers = max_workers
+        # 每 N 段刷新一次部分报告，0 表示只在结束时生成 Refresh the partial report every N segments, 0 for only at the end
+        self.render_every = render_every
+        self.html_path = f"./temp/visualize/{self.id}_fps.html"
+
+        self.fps_values = []
+        self.cpu_values = []
+        self.mem_values = []
+        self.segment_count = 0
+        # 第 0 段开始时刻的 epoch 秒数，由第一个带 start-date 的分段确定
+        # Epoch seconds of the start of segment 0, from the first segment with a start-date
+        self._start = None
+        # 各序列已追加到 ndjson 的行数 Rows of each series already appended to the ndjson
+        self._appended = {"fps": 0, "cpu": 0, "mem": 0}
+
+    def run(self, segment_count=None):
+        """
+        segment_count 为 None 时一直录制直到 Ctrl-C，返回合并报告的 html 路径
+
+        Record until `segment_count` segments are done (or Ctrl-C when None),
+        return the html path of the combined report.
+        """
+        # 按录制顺序保存 (启动前的墙钟偏移秒数, future)，偏移只在 toc 没有 start-date 时使用
+        # (wall clock offset before start, future) in record order, the offset
+        # is only used when the toc has no start-date
+        pending = deque()
+        t0 = time.time()
+        index = 0
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_ignore_sigint
+        ) as pool:
+            try:
+                while segment_count is None or index < segment_count:
+                    recorder = XCTraceRecorder(
+                        template_path=self.template_path,
+                        device_id=self.device_id,
+                        record_id=f"{self.id}_seg{index}",
+                    )
+                    offset = time.time() - t0
+                    recorder.start(time_limit=self.segment_length, new_session=True)
+                    try:
+                        while recorder.proc.poll() is None:
+                            self._collect(pending, block=False)
+                            time.sleep(0.2)
+                    except KeyboardInterrupt as e:
+                        recorder.print_log(f"KeyboardInterrupt {e}, send SIGINT，wait `record` stop")
+                        recorder.stop()
+                        self._submit(pool, recorder, offset, pending)
+                        raise
+                    self._submit(pool, recorder, offset, pending)
+                    index += 1
+            except KeyboardInterrupt:
+                pass
+            while pending:
+                self._collect(pending, block=True)
+        if self.segment_count:
+            self._append()
+            self.save()
+            self.render()
+        return self.html_path
+
+    def render(self):
+        """按当前的合并结果生成报告，返回 html 路径 Render the report of the combined result so far"""
+        render_report(
+            self.id, self.html_path, self.fps_values, self.cpu_values, self.mem_values
+        )
+        return self.html_path
+
+    def _submit(self, pool, recorder, offset, pending):
+        exit_code = recorder.finish()
+        if exit_code != 0 or not os.path.exists(recorder.output_trace_path):
+            recorder.print_log(f"录制失败 Record failed: {recorder.output_trace_path}")
+            return
+        future = pool.submit(
+            parse_segment,
+            recorder.output_trace_path,
+            self.target_process_name,
+            recorder.id,
+        )
+        pending.append((offset, future))
+
+    def _collect(self, pending, block):
+        # 只按录制顺序追加，保证合并结果时间有序
+        # Append strictly in record order so that the combined result stays sorted
+        while pending and (block or pending[0][1].done()):
+            offset, future = pending.popleft()
+            try:
+                fps_values, cpu_values, mem_values, start = future.result()
+            except Exception as e:
+                print(f"分段解析失败 Segment parse failed: {e}")
+                continue
+            offset = self._segment_offset(offset, start)
+            fps_values = shift_values(fps_values, offset)
+            cpu_values = shift_values(cpu_values, offset)
+            mem_values = shift_values(mem_values, offset)
+            # 只把新分段归并进合并结果的尾部 Only merge the new segment into the tail of the combined result
+            merge_into(self.fps_values, fps_values, key=_time_key)
+            merge_into(self.cpu_values, cpu_values, key=_time_key)
+            merge_into(self.mem_values, mem_values, key=_time_key)
+            self.segment_count += 1
+            # 之后的分段都从 offset 之后开始，早于它的行已是最终结果
+            # Later segments all start after this offset, rows before it are final
+            self._append(final_before=int(round(offset)))
+            if self.render_every and self.segment_count % self.render_every == 0:
+                self.render()
+
+    def _segment_offset(self, wall_offset, start):
+        """
+        分段相对第 0 段的偏移秒数：优先用 toc 的 start-date，不包含 `record` 的启动耗时
+
+        Offset of a segment from segment 0. The toc start-date is preferred,
+        since the wall clock taken before start() includes the `record` startup latency.
+        """
+        if start is None:
+            return wall_offset
+        if self._start is None:
+            self._start = start - wall_offset
+        return start - self._start
+
+    def _append(self, final_before=None):
+        """
+        把合并结果中时间早于 final_before 秒的新行追加到 ndjson，None 时追加全部剩余行
+
+        Append the combined rows earlier than final_before seconds that are not
+        in the ndjson yet, or every remaining row when final_before is None.
+        """
+        for suffix, values in (
+            ("fps", self.fps_values),
+            ("cpu", self.cpu_values),
+            ("mem", self.mem_values),
+        ):
+            begin = self._appended[suffix]
+            end = len(values)
+            if final_before is not None:
+                while end > begin and _time_key(values[end - 1]) >= final_before:
+                    end -= 1
+            if end <= begin:
+                continue
+            with open(f"./temp/save/{self.id}_{suffix}.ndjson", "a") as f:
+                for item in islice(values, begin, end):
+                    f.write(json.dumps(item, separators=(",", ":")))
+                    f.write("\n")
+            self._appended[suffix] = end
+        print(f"已追加 {self.segment_count} 个分段 Appended {self.segment_count} segments")
+
+    def save(self, indent=2):
+        for suffix, values in (
+            ("fps", self.fps_values),
+            ("cpu", self.cpu_values),
+            ("mem", self.mem_values),
+        ):
+            path = f"./temp/save/{self.id}_{suffix}.json"
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(json.dumps(values, indent=indent))
+            os.replace(tmp_path, path)
+        print(f"已合并 {self.segment_count} 个分段 Combined {self.segment_count} segments")
+
+
+def shift_values(values, offset):
+    """
+    将分段内的相对时间加上分段起始偏移（按整秒）
+
+    Shift segment relative times by the segment start offset (whole seconds).
+    """
+    offset = int(round(offset))
+    shifted = []
+    for item in values:
+        head, sep, rest = item["time"].partition(".")
+        new_item = dict(item)
+        new_item["time"] = timestamp2date(date2timestamp(head) + offset) + sep + rest
+        shifted.append(new_item)
+    return shifted
+
+
+def merge_into(combined, segment, key):
+    """
+    把一个分段原地归并进升序的合并结果。只有时间上与分段重叠的尾部参与归并，
+    分段在合并结果之后时直接追加，所以每段的代价与分段长度相关，而与已合并的总长度无关
+
+    Merge one segment into the ascending combined result in place. Only the
+    tail that overlaps the segment in time takes part in the merge, and a
+    segment after the combined result is simply appended, so each segment
+    costs time in its own length rather than in the combined length.
+    """
+    segment = sort_by_time(segment, key=key)
+    if not segment:
+        return combined
+    first = key(segment[0])
+    pos = len(combined)
+    while pos and key(combined[pos - 1]) > first:
+        pos -= 1
+    if pos == len(combined):
+        combined.extend(segment)
+    else:
+        tail = combined[pos:]
+        del combined[pos:]
+        combined.extend(heapq.merge(tail, segment, key=key))
+    return combined
+
+
+def _time_key(item):
+    return fmt_to_seconds(item["time"])
+
+
+def time_limit_to_seconds(time_limit):
+    """
+    将 `xctrace record --time-limit` 格式转换为秒数
+
+    Convert a `--time-limit` value <time[ms|s|m|h]> to seconds.
+    """
+    units = (("ms", 0.001), ("s", 1), ("m", 60), ("h", 3600))
+    for unit, multiplier in units:
+        if time_limit.endswith(unit):
+            return float(time_limit[: -len(unit)]) * multiplier
+    return float(time_limit)
 
 
 class XCTraceParser:
@@ -154,7 +666,7 @@ class XCTraceParser:
         self.temp_path = "./temp/parse"
         os.makedirs(self.temp_path, exist_ok=True)  # 确保目录存在
         os.makedirs("./temp/save", exist_ok=True)
-        self.prefix_cmd = f'xcrun xctrace export --input "{trace_path}" '  # 转义路径
+        self.prefix_cmd = f'{xcrun_path()} xctrace export --input "{trace_path}" '  # 转义路径
         self.target_process_name = target_process_name
 
         self.fps_values = None